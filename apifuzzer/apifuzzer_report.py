@@ -1,4 +1,3 @@
-import six
 from kitty.data.report import Report
 
 from apifuzzer.utils import try_b64encode
@@ -19,7 +18,8 @@ class Apifuzzer_Report(Report):
         """
         res = {}
         for k, v in self._data_fields.items():
-            if isinstance(v, (bytes, bytearray, six.string_types)):
+            # b64encode accepts only bytes like values, strings would be returned unchanged after a TypeError
+            if isinstance(v, (bytes, bytearray)):
                 v = try_b64encode(v)
             res[k] = v
         for k, v in self._sub_reports.items():
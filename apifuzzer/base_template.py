@@ -1,6 +1,8 @@
 from __future__ import print_function
 
-from kitty.model import Static, Template, Container
+from kitty.model import Static
+
+from apifuzzer.custom_fuzzers import SkippableContainer, SkippableTemplate
 
 
 class BaseTemplate(object):
@@ -9,6 +11,7 @@ class BaseTemplate(object):
         self.name = name
         self.method = None
         self.url = None
+        self.content_type = None
         self.params = list()
         self.data = list()
         self.headers = list()
@@ -37,8 +40,11 @@ class BaseTemplate(object):
     def compile_template(self):
         _url = Static(name='url', value=self.url)
         _method = Static(name='method', value=self.method)
-        template = Template(name=self.name, fields=[_url, _method])
+        template = SkippableTemplate(name=self.name, fields=[_url, _method])
+        if self.content_type is not None:
+            # not fuzzed, it selects the encoder of the body
+            template.append_fields([Static(name='content_type', value=self.content_type)])
         for name, field in self.field_to_param.items():
             if list(field):
-                template.append_fields([Container(name=name, fields=field)])
+                template.append_fields([SkippableContainer(name=name, fields=field)])
         return template
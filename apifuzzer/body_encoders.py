@@ -0,0 +1,306 @@
+"""
+Encoding of the request bodies by the content type of the operation. A JSON body parameter is fuzzed leaf by leaf of
+its schema, the fields of the leaves are named by their path in the document, e.g. '$.owner.tags[0]'. The encoders
+serialize the document without the values of the fields once per template and only splice the encoded values into it
+for each test, the value of a field is encoded again only when it changes.
+"""
+import hashlib
+import json
+import re
+from urllib.parse import quote_plus
+
+from apifuzzer.utils import get_sample_data_by_type
+
+JSON = 'application/json'
+FORM = 'application/x-www-form-urlencoded'
+MULTIPART = 'multipart/form-data'
+JSON_ROOT = '$'
+# the containers deeper than this are fuzzed as a single leaf
+MAX_SCHEMA_DEPTH = 8
+# the values which are spliced into a JSON document as they are, everything else is a string
+JSON_SCALAR = re.compile(r'-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?|true|false|null')
+PATH_TOKEN = re.compile(r'\.((?:[^.\[~]|~\d)*)|\[(\d+)\]')
+_ESCAPES = (('~', '~0'), ('.', '~1'), ('[', '~2'), ('|', '~3'), ('/', '~4'))
+
+
+def escape_key(key):
+    """
+    :param key: property name
+    :return: the property name as a token of a path, kitty field names can't contain '/' and the field names are split
+        at '|'
+    """
+    for char, escaped in _ESCAPES:
+        key = key.replace(char, escaped)
+    return key
+
+
+def unescape_key(token):
+    for char, escaped in reversed(_ESCAPES):
+        token = token.replace(escaped, char)
+    return token
+
+
+def parse_path(path):
+    """
+    :param path: path of a leaf, e.g. '$.owner.tags[0]'
+    :return: property names and array indices of the path
+    :rtype: list
+    """
+    if not path.startswith(JSON_ROOT):
+        raise ValueError('Invalid JSON path: {}'.format(path))
+    tokens = list()
+    position = len(JSON_ROOT)
+    while position < len(path):
+        match = PATH_TOKEN.match(path, position)
+        if match is None:
+            raise ValueError('Invalid JSON path: {}'.format(path))
+        tokens.append(unescape_key(match.group(1)) if match.group(2) is None else int(match.group(2)))
+        position = match.end()
+    return tokens
+
+
+def sample_value(schema):
+    """
+    :param schema: resolved schema of a leaf
+    :return: the example, default or first enum value of the schema, a sample of its type otherwise
+    """
+    for key in 'example', 'default':
+        if key in schema:
+            return schema[key]
+    if schema.get('enum'):
+        return schema['enum'][0]
+    return get_sample_data_by_type(schema.get('type'))
+
+
+def sample_text(value):
+    """
+    :param value: sample value of a leaf
+    :return: the default rendered value of the field of the leaf
+    :rtype: bytes
+    """
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode()
+    return json.dumps(value).encode()
+
+
+def schema_leaves(schema, resolver, path=JSON_ROOT, depth=0, parents=()):
+    """
+    :param schema: schema of a body parameter
+    :param resolver: resolver of the $ref pointers of the definition
+    :type resolver: apifuzzer.spec_loader.RefResolver
+    :return: path and schema of every leaf of the document, an array has a single item, a recursive schema or a too
+        deep container is a leaf
+    :rtype: list of tuple
+    """
+    schema = resolver.resolve(schema)
+    if not isinstance(schema, dict) or id(schema) in parents or depth >= MAX_SCHEMA_DEPTH:
+        return [(path, dict())]
+    parents = parents + (id(schema),)
+    properties = dict()
+    for part in schema.get('allOf', ()):
+        part = resolver.resolve(part)
+        if isinstance(part, dict):
+            properties.update(part.get('properties', {}))
+    properties.update(schema.get('properties', {}))
+    if properties:
+        leaves = list()
+        for name, property_schema in properties.items():
+            leaves.extend(schema_leaves(property_schema, resolver, '{}.{}'.format(path, escape_key(name)),
+                                        depth + 1, parents))
+        return leaves
+    if schema.get('type') == 'array' and 'items' in schema:
+        return schema_leaves(schema['items'], resolver, '{}[0]'.format(path), depth + 1, parents)
+    for key in 'oneOf', 'anyOf':
+        if schema.get(key):
+            return schema_leaves(schema[key][0], resolver, path, depth, parents)
+    return [(path, schema)]
+
+
+class SplicedEncoder(object):
+    """
+    The body is the static segments with the encoded values of the fields between them
+    """
+    content_type = None
+
+    def __init__(self, keys):
+        """
+        :param keys: names of the fields, the keys of the data of the requests
+        :type keys: list
+        """
+        self.keys, self._segments = self.skeleton(list(keys))
+        self._encoded = [(None, b'')] * len(self.keys)
+
+    def skeleton(self, keys):
+        """
+        :param keys: names of the fields
+        :return: the fields in the order of the body and the static segments around them
+        :rtype: tuple
+        """
+        raise NotImplementedError
+
+    def encode_value(self, value):
+        """
+        :type value: str
+        :rtype: bytes
+        """
+        raise NotImplementedError
+
+    def encode(self, data):
+        """
+        :param data: value of every field by name
+        :type data: dict
+        :return: the body
+        :rtype: bytes
+        """
+        parts = [self._segments[0]]
+        for position, key in enumerate(self.keys):
+            value = data.get(key, '')
+            encoded = self._encoded[position]
+            if encoded[0] != value:
+                encoded = self._encoded[position] = (value, self.encode_value(value))
+            parts.append(encoded[1])
+            parts.append(self._segments[position + 1])
+        return b''.join(parts)
+
+
+class FormEncoder(SplicedEncoder):
+    """
+    The same body as urllib.parse.urlencode of the data
+    """
+    content_type = FORM
+
+    def skeleton(self, keys):
+        segments = [b'']
+        for position, key in enumerate(keys):
+            segments[-1] += '{}{}='.format('&' if position else '', quote_plus(key)).encode()
+            segments.append(b'')
+        return keys, segments
+
+    def encode_value(self, value):
+        return quote_plus(value).encode()
+
+
+class MultipartEncoder(SplicedEncoder):
+
+    def __init__(self, keys, boundary):
+        """
+        :param keys: names of the fields
+        :param boundary: boundary of the parts, it is fixed for the template
+        """
+        self.boundary = boundary
+        self.content_type = '{}; boundary={}'.format(MULTIPART, boundary)
+        super(MultipartEncoder, self).__init__(keys)
+
+    def skeleton(self, keys):
+        segments = [b'']
+        for key in keys:
+            segments[-1] += '--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n'.format(
+                self.boundary, key.replace('"', '%22')).encode()
+            segments.append(b'\r\n')
+        segments[-1] += '--{}--\r\n'.format(self.boundary).encode()
+        return keys, segments
+
+    def encode_value(self, value):
+        return value.encode('utf-8', errors='surrogateescape')
+
+
+class JsonEncoder(SplicedEncoder):
+    """
+    The fields are the leaves of the document by their path, a value which is a JSON number, boolean or null is
+    spliced as it is, anything else as a string
+    """
+    content_type = JSON
+
+    def skeleton(self, keys):
+        root = None
+        for key in keys:
+            root = self._insert(root, parse_path(key), key)
+        pieces = list()
+        self._serialize(root, pieces)
+        ordered = list()
+        segments = [b'']
+        for piece in pieces:
+            if isinstance(piece, _Leaf):
+                ordered.append(piece.key)
+                segments.append(b'')
+            else:
+                segments[-1] += piece
+        return ordered, segments
+
+    def _insert(self, node, tokens, key):
+        if not tokens:
+            # a leaf replaces a container at the same path, e.g. a scalar body
+            return _Leaf(key)
+        token = tokens[0]
+        if isinstance(token, int):
+            node = node if isinstance(node, list) else list()
+            node.extend([None] * (token + 1 - len(node)))
+        else:
+            node = node if isinstance(node, dict) else dict()
+            node.setdefault(token, None)
+        node[token] = self._insert(node[token], tokens[1:], key)
+        return node
+
+    def _serialize(self, node, pieces):
+        if isinstance(node, _Leaf):
+            pieces.append(node)
+        elif isinstance(node, dict):
+            pieces.append(b'{')
+            for position, (name, child) in enumerate(node.items()):
+                pieces.append('{}{}:'.format(',' if position else '', json.dumps(name)).encode())
+                self._serialize(child, pieces)
+            pieces.append(b'}')
+        elif isinstance(node, list):
+            pieces.append(b'[')
+            for position, child in enumerate(node):
+                if position:
+                    pieces.append(b',')
+                self._serialize(child, pieces)
+            pieces.append(b']')
+        else:
+            pieces.append(b'null')
+
+    def encode_value(self, value):
+        if JSON_SCALAR.fullmatch(value):
+            return value.encode()
+        return json.dumps(value).encode()
+
+
+class _Leaf(object):
+
+    def __init__(self, key):
+        self.key = key
+
+
+class BodyEncoders(object):
+    """
+    Encoder of every template, created at the first request of the template
+    """
+
+    def __init__(self):
+        self._encoders = dict()
+
+    def encode(self, endpoint, content_type, data):
+        """
+        :param endpoint: template name of the request
+        :param content_type: content type of the body, form by default
+        :param data: value of every field of the body by name
+        :type data: dict
+        :return: content type header and the body
+        :rtype: tuple
+        """
+        encoder = self._encoders.get(endpoint)
+        if encoder is None:
+            encoder = self._encoders[endpoint] = self.create(endpoint, content_type, data.keys())
+        return encoder.content_type, encoder.encode(data)
+
+    @staticmethod
+    def create(endpoint, content_type, keys):
+        if content_type == JSON:
+            return JsonEncoder(keys)
+        if content_type == MULTIPART:
+            boundary = 'apifuzzer{}'.format(hashlib.sha1(endpoint.encode()).hexdigest()[:16])
+            return MultipartEncoder(keys, boundary)
+        return FormEncoder(keys)
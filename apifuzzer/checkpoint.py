@@ -0,0 +1,147 @@
+"""
+Checkpoints of long fuzzing sessions. The state file records the last test which was completed together with every
+test before it, so a resumed session continues after it and doesn't render the earlier mutations again.
+"""
+import hashlib
+import json
+import os
+from time import monotonic, time
+
+from apifuzzer.utils import set_class_logger
+
+STATE_VERSION = 1
+
+
+def parse_test_list(test_list_str):
+    """
+    :param test_list_str: kitty test list, e.g. '0-9,15,20-', None or empty for every test
+    :return: (start, end) tuples of the ranges, end is inclusive and None for an open range
+    :rtype: list of tuple
+    """
+    ranges = list()
+    for entry in (test_list_str or '0-').split(','):
+        start, separator, end = entry.strip().partition('-')
+        start = int(start) if start else 0
+        if not separator:
+            end = start
+        else:
+            end = int(end) if end else None
+        ranges.append((start, end))
+    return sorted(ranges)
+
+
+def remaining_test_list(test_list_str, last_completed):
+    """
+    :param test_list_str: kitty test list of the session
+    :param last_completed: every test of the list up to this index is completed
+    :return: kitty test list of the tests after last_completed, empty string if there is none
+    :rtype: str
+    """
+    remaining = list()
+    for start, end in parse_test_list(test_list_str):
+        if end is not None and end <= last_completed:
+            continue
+        start = max(start, last_completed + 1)
+        remaining.append('{}-{}'.format(start, end if end is not None else ''))
+    return ','.join(remaining)
+
+
+def completed_count(test_list_str, last_completed):
+    """
+    :param test_list_str: kitty test list of the session
+    :param last_completed: every test of the list up to this index is completed
+    :return: number of tests of the list up to last_completed
+    :rtype: int
+    """
+    count = 0
+    for start, end in parse_test_list(test_list_str):
+        if start > last_completed:
+            continue
+        end = last_completed if end is None else min(end, last_completed)
+        count += end - start + 1
+    return count
+
+
+def model_fingerprint(model):
+    """
+    The hash of kitty models is salted with the per process str hash seed, so it can't be compared across runs
+    :param model: kitty model of the session
+    :type model: kitty.model.GraphModel
+    :return: hex digest of the names, mutation counts and default values of the templates
+    :rtype: str
+    """
+    templates = [connection.dst for connections in model._graph.values() for connection in connections]
+    digest = hashlib.sha256()
+    for template in sorted(templates, key=lambda t: t.get_name()):
+        digest.update(json.dumps([template.get_name(), template.num_mutations()]).encode())
+        digest.update(template._default_rendered.tobytes())
+    return digest.hexdigest()
+
+
+@set_class_logger
+class Checkpoint(object):
+    """
+    State file of a fuzzing session. It is replaced atomically, a reader finds either the previous or the new state.
+    """
+
+    def __init__(self, path, interval=30.0):
+        """
+        :param path: state file path
+        :type path: str
+        :param interval: minimum time between two periodic saves (seconds)
+        :type interval: float
+        """
+        self.path = path
+        self.interval = interval
+        self._saved = monotonic()
+
+    def due(self):
+        """
+        :return: True if the interval elapsed since the last save
+        :rtype: bool
+        """
+        return monotonic() - self._saved >= self.interval
+
+    def load(self):
+        """
+        :return: the saved state or None if there is no state file
+        :rtype: dict
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r') as f:
+            state = json.loads(f.read())
+        if state.get('version') != STATE_VERSION:
+            raise ValueError('{} is not an APIFuzzer state file'.format(self.path))
+        return state
+
+    def save(self, test_list_str, last_completed, session_info, report_sink_position, fingerprint,
+             finished=False):
+        """
+        :param test_list_str: kitty test list of the whole session, None for every test
+        :param last_completed: every test of the list up to this index is completed, -1 if none
+        :param session_info: kitty session info
+        :type session_info: kitty.data.data_manager.SessionInfo
+        :param report_sink_position: position of the report sink after the reports of the completed tests
+        :param fingerprint: fingerprint of the model, see model_fingerprint
+        :param finished: every test of the list is completed
+        """
+        state = {
+            'version': STATE_VERSION,
+            'test_list_str': test_list_str,
+            'last_completed': last_completed,
+            'tested': completed_count(test_list_str, last_completed),
+            'session_info': session_info.as_dict(),
+            'report_sink': report_sink_position,
+            'model_fingerprint': fingerprint,
+            'finished': finished,
+            'time': time(),
+        }
+        tmp_path = '{}.tmp'.format(self.path)
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._saved = monotonic()
+        self.logger.debug('Checkpoint saved to %s, last completed test: %d', self.path, last_completed)
@@ -0,0 +1,184 @@
+import time
+
+import pycurl
+
+from apifuzzer.utils import set_class_logger
+
+
+class InFlightRequest(object):
+
+    def __init__(self, request, context):
+        self.request = request
+        self.context = context
+        self.response = None
+        self.error = None
+        self.attempts = 0
+
+
+@set_class_logger
+class ConcurrentTransmitter(object):
+    """
+    Keeps up to `concurrency` requests of the target in flight on a single pycurl.CurlMulti handle.
+    Everything runs on the caller's thread, completed requests are handed back by poll() and drain().
+    """
+
+    def __init__(self, target, concurrency, select_timeout=1.0):
+        """
+        :param target: target which prepares the Curl handles and builds the responses
+        :type target: apifuzzer.fuzzer_target.FuzzerTarget
+        :param concurrency: maximum number of requests in flight
+        :type concurrency: int
+        :param select_timeout: maximum time to wait for socket activity in one poll (seconds)
+        :type select_timeout: float
+        """
+        self.target = target
+        self.concurrency = concurrency
+        self.select_timeout = select_timeout
+        self._multi = pycurl.CurlMulti()
+        self._in_flight = 0
+        self._active = 0
+        self._retries = list()
+
+    def in_flight(self):
+        return self._in_flight
+
+    def has_capacity(self):
+        return self._in_flight < self.target.rate_controller.concurrency_limit(self.concurrency)
+
+    def submit(self, request, context=None):
+        """
+        Starts sending a request prepared by the target
+        :param request: request returned by FuzzerTarget.prepare_request
+        :param context: arbitrary object returned together with the response
+        :return: the in flight request
+        :rtype: InFlightRequest
+        """
+        in_flight = InFlightRequest(request, context)
+        _curl = self.target.curl_pool.acquire(request.url)
+        _curl.in_flight = in_flight
+        try:
+            self.target.setup_curl(_curl, request, *self.target.response_buffers(_curl))
+        except Exception as e:
+            self.target.curl_pool.release(_curl, broken=True)
+            in_flight.error = e
+            raise
+        self._add(_curl)
+        return in_flight
+
+    def run(self, requests, on_complete):
+        """
+        Sends the requests with as many of them in flight as the capacity allows and waits for all of them. The
+        requests are taken one at a time, when there is room for the next one.
+        :param requests: iterable of the requests prepared by the target and their context
+        :param on_complete: called with every list of completed requests, a request which fails to start is completed
+            with its error
+        """
+        for request, context in requests:
+            try:
+                self.submit(request, context)
+            except Exception as e:
+                failed = InFlightRequest(request, context)
+                failed.error = e
+                on_complete([failed])
+            while not self.has_capacity():
+                on_complete(self.poll())
+        on_complete(self.drain())
+
+    def _add(self, _curl):
+        self._in_flight += 1
+        self._start(_curl)
+
+    def _start(self, _curl):
+        self._wait_for_token()
+        _curl.in_flight.attempts += 1
+        self._multi.add_handle(_curl)
+        self._active += 1
+
+    def _remove(self, _curl, done=True):
+        self._multi.remove_handle(_curl)
+        self._active -= 1
+        if done:
+            self._in_flight -= 1
+
+    def _wait_for_token(self):
+        """
+        Waits until the rate controller lets the next request go, the transfers in flight are driven meanwhile,
+        so their timings don't include the wait
+        """
+        while True:
+            wait = self.target.rate_controller.reserve()
+            if not wait:
+                return
+            if self._active:
+                self._multi.select(wait)
+                self._perform()
+            else:
+                time.sleep(wait)
+
+    def _perform(self):
+        while True:
+            ret, _ = self._multi.perform()
+            if ret != pycurl.E_CALL_MULTI_PERFORM:
+                break
+
+    def poll(self):
+        """
+        Drives the transfers until at least one of them completes
+        :return: completed requests, with either response or error set
+        :rtype: list of InFlightRequest
+        """
+        completed = list()
+        while self._in_flight and not completed:
+            while self._retries:
+                self._start(self._retries.pop(0))
+            self._perform()
+            completed.extend(self._collect())
+            if not completed and self._in_flight:
+                self._multi.select(self.select_timeout)
+        return completed
+
+    def drain(self):
+        """
+        Waits for every request in flight
+        :rtype: list of InFlightRequest
+        """
+        completed = list()
+        while self._in_flight:
+            completed.extend(self.poll())
+        return completed
+
+    def _collect(self):
+        completed = list()
+        while True:
+            num_queued, ok_list, err_list = self._multi.info_read()
+            for _curl in ok_list:
+                self._remove(_curl)
+                self.target.rate_controller.record_transfer(_curl)
+                in_flight = _curl.in_flight
+                in_flight.response = self.target.build_response(_curl, in_flight.request, _curl.resp_buff_hdrs,
+                                                                  _curl.resp_buff_body)
+                self.target.curl_pool.release(_curl)
+                completed.append(in_flight)
+            for _curl, errno, errmsg in err_list:
+                in_flight = _curl.in_flight
+                retry = in_flight.attempts < self.target.retries
+                self._remove(_curl, done=not retry)
+                self.target.rate_controller.record_transfer(_curl, failed=True)
+                self.logger.error('pycurl.error: ({}, {})'.format(errno, errmsg))
+                if retry:
+                    self.logger.error('Retrying... ({})'.format(self.target.retries - in_flight.attempts))
+                    self.target.metrics.request_retried(in_flight.request.endpoint)
+                    _curl.resp_buff_hdrs.reset()
+                    _curl.resp_buff_body.reset()
+                    # restarted by the next poll, after the rate controller let it go
+                    self._retries.append(_curl)
+                    continue
+                in_flight.error = pycurl.error(errno, errmsg)
+                self.target.curl_pool.release(_curl, broken=True)
+                completed.append(in_flight)
+            if not num_queued:
+                break
+        return completed
+
+    def close(self):
+        self._multi.close()
@@ -0,0 +1,194 @@
+"""
+Mutation corpus: every rendered test payload of a model in one file, so a regression run can replay them without
+building and walking the kitty model.
+
+File layout (little endian):
+    header: magic (8 bytes), version (uint32), number of records (uint64), offset of the index (uint64)
+    records: compact JSON of {"fuzz_path": str, "payload": dict}, the bytes values (url, method) are latin-1 decoded
+    index: (test number (int64), record offset (uint64), record length (uint32)) per record
+"""
+import json
+import mmap
+import struct
+
+from apifuzzer.apifuzzer_report import Apifuzzer_Report as Report
+from apifuzzer.concurrent_transmitter import ConcurrentTransmitter
+from apifuzzer.server_fuzzer import OpenApiServerFuzzer
+from apifuzzer.utils import set_class_logger
+
+CORPUS_MAGIC = b'APIFZCRP'
+CORPUS_VERSION = 1
+HEADER = struct.Struct('<8sIQQ')
+INDEX_ENTRY = struct.Struct('<qQI')
+BYTES_KEYS = ('url', 'method')
+
+
+def encode_record(fuzz_path, payload):
+    """
+    :param fuzz_path: kitty sequence string of the test
+    :param payload: rendered payload, keyword arguments of FuzzerTarget.transmit
+    :rtype: bytes
+    """
+    payload = dict(payload)
+    for key in BYTES_KEYS:
+        if isinstance(payload.get(key), bytes):
+            payload[key] = payload[key].decode('latin-1')
+    return json.dumps({'fuzz_path': fuzz_path, 'payload': payload}, separators=(',', ':')).encode()
+
+
+def decode_record(data):
+    """
+    :param data: record created by encode_record
+    :return: fuzz path and payload
+    :rtype: tuple
+    """
+    record = json.loads(data.decode())
+    payload = record['payload']
+    for key in BYTES_KEYS:
+        if key in payload:
+            payload[key] = payload[key].encode('latin-1')
+    return record['fuzz_path'], payload
+
+
+def export_corpus(model, path, logger):
+    """
+    Renders every mutation of the model into a corpus file
+    :param model: compiled kitty model
+    :type model: kitty.model.GraphModel
+    :param path: corpus file path
+    :param logger: logger of the caller
+    :return: number of exported tests
+    :rtype: int
+    """
+    index = list()
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, 0, 0))
+        while model.mutate():
+            node = model.get_sequence()[-1].dst
+            record = encode_record(model.get_sequence_str(), OpenApiServerFuzzer.render_payload(node, logger))
+            index.append(INDEX_ENTRY.pack(model.current_index(), f.tell(), len(record)))
+            f.write(record)
+        index_offset = f.tell()
+        f.write(b''.join(index))
+        f.seek(0)
+        f.write(HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, len(index), index_offset))
+    logger.info('Exported %d tests to %s', len(index), path)
+    return len(index)
+
+
+class Corpus(object):
+    """
+    Memory mapped corpus file, the records are decoded only when they are read
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, index_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != CORPUS_MAGIC or version != CORPUS_VERSION:
+            self.close()
+            raise ValueError('{} is not an APIFuzzer corpus file'.format(path))
+        self._count = count
+        self._index_offset = index_offset
+
+    def __len__(self):
+        return self._count
+
+    def entry(self, position):
+        """
+        :param position: position of the record in the corpus
+        :return: test number, offset and length of the record
+        :rtype: tuple
+        """
+        return INDEX_ENTRY.unpack_from(self._mmap, self._index_offset + position * INDEX_ENTRY.size)
+
+    def read(self, position):
+        """
+        :param position: position of the record in the corpus
+        :return: test number, fuzz path and payload
+        :rtype: tuple
+        """
+        test_number, offset, length = self.entry(position)
+        fuzz_path, payload = decode_record(self._mmap[offset:offset + length])
+        return test_number, fuzz_path, payload
+
+    def __iter__(self):
+        for position in range(self._count):
+            yield self.read(position)
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+@set_class_logger
+class CorpusReplayer(object):
+    """
+    Sends the tests of a corpus to the target and reports them like the fuzzer does
+    """
+
+    def __init__(self, target, corpus, concurrency=1):
+        """
+        :param target: target of the tests
+        :type target: apifuzzer.fuzzer_target.FuzzerTarget
+        :param corpus: corpus to replay
+        :type corpus: Corpus
+        :param concurrency: number of requests kept in flight
+        :type concurrency: int
+        """
+        self.target = target
+        self.corpus = corpus
+        self.concurrency = concurrency
+        self.tested = 0
+        self.failure_count = 0
+
+    def _post_test(self, test_number, fuzz_path):
+        self.target.report.add('fuzz_path', fuzz_path)
+        self.target.post_test(test_number)
+        self.tested += 1
+        if self.target.report.get_status() != Report.PASSED:
+            self.failure_count += 1
+
+    def run(self):
+        """
+        :return: number of tests and failures
+        :rtype: tuple
+        """
+        if self.concurrency > 1:
+            self._run_concurrent()
+        else:
+            for test_number, fuzz_path, payload in self.corpus:
+                self.target.pre_test(test_number)
+                self.target.transmit(**payload)
+                self._post_test(test_number, fuzz_path)
+        self.logger.info('Replayed %d tests of %s, %d failed', self.tested, self.corpus.path, self.failure_count)
+        return self.tested, self.failure_count
+
+    def _run_concurrent(self):
+        transmitter = ConcurrentTransmitter(self.target, self.concurrency)
+        try:
+            transmitter.run(self._requests(), self._complete_tests)
+        finally:
+            transmitter.close()
+
+    def _requests(self):
+        for test_number, fuzz_path, payload in self.corpus:
+            self.target.pre_test(test_number)
+            try:
+                request = self.target.prepare_request(**payload)
+            except (UnicodeDecodeError, UnicodeEncodeError) as e:
+                self.target.report_add_basic_msg(('Failed to parse http response code, exception occurred: %s', e))
+                self._post_test(test_number, fuzz_path)
+                continue
+            yield request, (self.target.save_test_context(), fuzz_path)
+
+    def _complete_tests(self, completed):
+        for in_flight in completed:
+            target_context, fuzz_path = in_flight.context
+            self.target.restore_test_context(target_context)
+            if in_flight.error is not None:
+                self.target.request_failed(in_flight.request, in_flight.error)
+            else:
+                self.target.process_response(in_flight.response)
+            self._post_test(self.target.test_number, fuzz_path)
@@ -0,0 +1,76 @@
+import pycurl
+
+from apifuzzer.utils import set_class_logger
+
+
+@set_class_logger
+class CurlHandlePool(object):
+    """
+    Per host pool of reusable Curl handles. Handles are reset between tests, but the connections, TLS sessions and
+    DNS entries they have built up stay alive, so consecutive tests don't pay for a new connection.
+    """
+
+    def __init__(self, max_size=1):
+        """
+        :param max_size: maximum number of idle handles kept per host
+        :type max_size: int
+        """
+        self.max_size = max_size
+        self._idle = dict()
+        self._share = pycurl.CurlShare()
+        self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+        if hasattr(pycurl, 'LOCK_DATA_CONNECT'):
+            # libcurl >= 7.57 can share the connection cache as well, so an evicted handle doesn't lose them
+            self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_CONNECT)
+
+    @staticmethod
+    def host_key(url):
+        """
+        :param url: request url
+        :return: scheme and host part of the url, used as pool key
+        :rtype: str
+        """
+        return '/'.join(url.split('/', 3)[:3]).lower()
+
+    def acquire(self, url):
+        """
+        Gets an idle handle of the url's host or creates a new one
+        :param url: url the handle will be used for
+        :rtype: pycurl.Curl
+        """
+        key = self.host_key(url)
+        idle = self._idle.get(key)
+        if idle:
+            _curl = idle.pop()
+            # keeps the connections and the share
+            _curl.reset()
+        else:
+            self.logger.debug('Creating new Curl handle for %s', key)
+            _curl = pycurl.Curl()
+            _curl.setopt(pycurl.SHARE, self._share)
+        _curl.pool_key = key
+        # cookies survive reset(), but every test has to start with an empty cookie jar
+        _curl.setopt(pycurl.COOKIELIST, 'ALL')
+        return _curl
+
+    def release(self, _curl, broken=False):
+        """
+        Gives back a handle to the pool
+        :param _curl: handle returned by acquire
+        :param broken: the handle failed, so it is closed instead of reused
+        :type broken: bool
+        """
+        idle = self._idle.setdefault(_curl.pool_key, list())
+        if broken or len(idle) >= self.max_size:
+            if broken:
+                self.logger.debug('Evicting broken Curl handle of %s', _curl.pool_key)
+            _curl.close()
+        else:
+            idle.append(_curl)
+
+    def close(self):
+        for idle in self._idle.values():
+            for _curl in idle:
+                _curl.close()
+        self._idle = dict()
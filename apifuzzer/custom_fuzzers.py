@@ -1,4 +1,6 @@
-from kitty.model import RandomBits, String
+from random import Random
+
+from kitty.model import Container, RandomBits, String, Template
 
 
 # https://lcamtuf.blogspot.hu/2014/08/binary-fuzzing-strategies-what-works.html
@@ -14,6 +16,63 @@ class RandomBitsField(RandomBits):
         super(RandomBitsField, self).__init__(name=name, value=value, min_length=20, max_length=100, fuzzable=fuzzable,
                                               num_mutations=80)
 
+    def _mutate(self):
+        # every mutation has its own seed, so a mutation doesn't depend on the ones generated before it
+        self._random.seed((self._seed << 32) | self._current_index)
+        super(RandomBitsField, self)._mutate()
+
+    def __getstate__(self):
+        # the state of the generator is bigger than the rest of the field and it is reseeded before every mutation
+        state = self.__dict__.copy()
+        state['_random'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._random = Random(self._seed)
+
+    def skip(self, count):
+        self._initialize()
+        skipped = 0
+        if not self._exhausted():
+            skipped = min(count, self._last_index() - self._current_index)
+            self._current_index += skipped
+        return skipped
+
+
+def skip_fields(container, count):
+    """
+    Skips the mutations of a container field by field, the fields are not mutated one by one
+    :param container: container to skip in
+    :type container: kitty.model.Container
+    :param count: number of mutations to skip
+    :return: number of mutations skipped
+    """
+    container._initialize()
+    skipped = 0
+    while skipped < count and container._field_idx < len(container._fields):
+        field = container._fields[container._field_idx]
+        skipped += field.skip(count - skipped)
+        if skipped < count:
+            field.reset()
+            container._field_idx += 1
+    container._current_index += skipped
+    return skipped
+
+
+class SkippableContainer(Container):
+    """Container which skips the mutations of its fields without generating them"""
+
+    def skip(self, count):
+        return skip_fields(self, count)
+
+
+class SkippableTemplate(Template):
+    """Template which skips the mutations of its fields without generating them"""
+
+    def skip(self, count):
+        return skip_fields(self, count)
+
 
 class UnicodeStrings(String):
 
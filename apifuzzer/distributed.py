@@ -0,0 +1,484 @@
+"""
+Distributed fuzzing over TCP. The coordinator splits the tests of the model into ranges and leases them to the workers,
+which can run on other hosts. A worker runs the fuzzer on its range in a child process, then streams the failure
+reports and the stats of the range back and asks for the next one. The coordinator writes the reports of every worker
+into its own report store.
+
+A lease is issued again if its worker disconnects or doesn't send a heartbeat within the lease timeout. The reports of
+a test already written are dropped, so a range run twice is reported once. Every worker saves the first reports of a
+failure bucket, the coordinator keeps the first ones of the session and drops the others.
+
+Protocol: one JSON object per line in both directions. The worker sends hello, lease, heartbeat, report, release and
+complete messages, the coordinator answers hello with welcome or error, lease with lease, wait or done and complete
+with ok.
+"""
+import hmac
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import socketserver
+import threading
+from collections import deque
+from time import monotonic, sleep
+
+from apifuzzer.failure_buckets import FAILURE_BUCKETS_FILE, FailureBuckets, merge_bucket_summaries
+from apifuzzer.report_sink import iter_reports
+from apifuzzer.sharding import split_test_range
+from apifuzzer.user_interface import NullInterface
+from apifuzzer.utils import set_class_logger
+
+DEFAULT_LEASE_SIZE = 1000
+DEFAULT_LEASE_TIMEOUT = 60.0
+# a waiting worker asks for a lease again after this time (seconds)
+WAIT_SECONDS = 1.0
+CONNECT_ATTEMPTS = 10
+
+
+def parse_address(address):
+    """
+    :param address: host:port, the host is optional
+    :return: host and port
+    :rtype: tuple
+    """
+    host, _, port = address.rpartition(':')
+    try:
+        return host or '127.0.0.1', int(port)
+    except ValueError:
+        raise ValueError('Invalid address: {}, host:port is expected'.format(address))
+
+
+def send_message(stream, message):
+    stream.write(json.dumps(message).encode() + b'\n')
+    stream.flush()
+
+
+def receive_message(stream):
+    """
+    :return: the next message, None at the end of the stream
+    :rtype: dict
+    """
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line.decode())
+
+
+class LeaseTable(object):
+    """
+    Ranges of the tests and their leases. Not thread safe, the coordinator holds its lock.
+    """
+
+    def __init__(self, test_lists, lease_timeout=DEFAULT_LEASE_TIMEOUT):
+        """
+        :param test_lists: kitty test lists of the ranges
+        :type test_lists: list of str
+        :param lease_timeout: a lease without a heartbeat for this time is issued again (seconds)
+        :type lease_timeout: float
+        """
+        self.test_lists = test_lists
+        self.lease_timeout = lease_timeout
+        self._pending = deque(range(len(test_lists)))
+        # lease id: [range, worker, deadline] of the active leases
+        self._active = dict()
+        # the range of every lease ever issued, an expired lease can still complete its range
+        self._lease_ranges = dict()
+        self._done = set()
+        self._next_id = 0
+        self.reissued = 0
+
+    def acquire(self, worker, now):
+        """
+        :param worker: name of the worker
+        :param now: monotonic time
+        :return: lease id and test list of the next pending range, None if no range is pending
+        :rtype: tuple
+        """
+        self.expire(now)
+        if not self._pending:
+            return None
+        range_id = self._pending.popleft()
+        lease_id = self._next_id
+        self._next_id += 1
+        self._active[lease_id] = [range_id, worker, now + self.lease_timeout]
+        self._lease_ranges[lease_id] = range_id
+        return lease_id, self.test_lists[range_id]
+
+    def renew(self, lease_id, now):
+        """
+        :return: False if the lease isn't active anymore
+        :rtype: bool
+        """
+        lease = self._active.get(lease_id)
+        if lease is None:
+            return False
+        lease[2] = now + self.lease_timeout
+        return True
+
+    def release(self, lease_id):
+        """
+        Gives the range of an active lease to the next worker
+        """
+        lease = self._active.pop(lease_id, None)
+        if lease is None:
+            return
+        range_id = lease[0]
+        if range_id not in self._done and range_id not in self._pending and \
+                not any(active[0] == range_id for active in self._active.values()):
+            self._pending.appendleft(range_id)
+            self.reissued += 1
+
+    def release_worker(self, worker):
+        """
+        Releases the leases of a disconnected worker
+        """
+        for lease_id in [lease_id for lease_id, lease in self._active.items() if lease[1] == worker]:
+            self.release(lease_id)
+
+    def expire(self, now):
+        """
+        Releases the leases past their deadline
+        :return: the expired lease ids
+        :rtype: list
+        """
+        expired = [lease_id for lease_id, lease in self._active.items() if lease[2] < now]
+        for lease_id in expired:
+            self.release(lease_id)
+        return expired
+
+    def complete(self, lease_id):
+        """
+        :return: True if the range of the lease is done by this lease, False if it was done already
+        :rtype: bool
+        """
+        self._active.pop(lease_id, None)
+        range_id = self._lease_ranges.get(lease_id)
+        if range_id is None or range_id in self._done:
+            return False
+        self._done.add(range_id)
+        if range_id in self._pending:
+            self._pending.remove(range_id)
+        return True
+
+    def finished(self):
+        return len(self._done) == len(self.test_lists)
+
+    def progress(self):
+        """
+        :return: number of done, leased and pending ranges
+        :rtype: dict
+        """
+        return {'done': len(self._done), 'leased': len(self._active), 'pending': len(self._pending)}
+
+
+@set_class_logger
+class Coordinator(object):
+    """
+    Leases the test ranges of a model to the workers and merges their reports and stats
+    """
+
+    def __init__(self, num_mutations, fingerprint, report_sink, report_dir, address, lease_size=DEFAULT_LEASE_SIZE,
+                 lease_timeout=DEFAULT_LEASE_TIMEOUT, token=None, failure_exemplars=None):
+        """
+        :param num_mutations: number of tests of the model
+        :param fingerprint: fingerprint of the model, the workers have to compile the same one
+        :param report_sink: store of the reports of the workers
+        :type report_sink: apifuzzer.report_sink.ReportSink
+        :param report_dir: directory of the merged stats and failure buckets
+        :param address: host and port to listen on, port 0 picks a free one
+        :type address: tuple
+        :param lease_size: number of tests of a range
+        :param lease_timeout: a lease without a heartbeat for this time is issued again (seconds)
+        :param token: shared secret of the workers, not checked if not set
+        :param failure_exemplars: number of reports saved per failure bucket of all the workers, not capped if not set
+        """
+        self.fingerprint = fingerprint
+        self.report_sink = report_sink
+        self.report_dir = report_dir
+        self.token = token
+        self.leases = LeaseTable(split_test_range(num_mutations, -(-num_mutations // lease_size)), lease_timeout)
+        self._lock = threading.Lock()
+        self._reported = set()
+        self._bucket_summaries = list()
+        self.failure_buckets = None
+        if failure_exemplars is not None:
+            self.failure_buckets = FailureBuckets(report_dir, exemplars=failure_exemplars)
+        self._connections = 0
+        self.stats = {
+            'shards': list(),
+            'tested': 0,
+            'failure_count': 0,
+            'start_time': None,
+            'workers': dict(),
+        }
+        self._server = socketserver.ThreadingTCPServer(address, _coordinator_handler(self))
+        self._server.daemon_threads = True
+        self.address = self._server.server_address
+
+    def serve(self, poll_interval=0.5):
+        """
+        Serves the workers until every range is done
+        :return: merged session stats
+        :rtype: dict
+        """
+        thread = threading.Thread(target=self._server.serve_forever, name='coordinator', daemon=True)
+        thread.start()
+        self.logger.info('Coordinator listens on %s:%d, %d test ranges', self.address[0], self.address[1],
+                         len(self.leases.test_lists))
+        try:
+            while True:
+                with self._lock:
+                    for lease_id in self.leases.expire(monotonic()):
+                        self.logger.warning('Lease %d expired, its range is issued again', lease_id)
+                    if self.leases.finished():
+                        break
+                sleep(poll_interval)
+            # the waiting workers are told that the session is over
+            deadline = monotonic() + 2 * WAIT_SECONDS
+            while self._connections and monotonic() < deadline:
+                sleep(poll_interval / 10)
+        finally:
+            self._server.shutdown()
+            self._server.server_close()
+        return self.finish()
+
+    def finish(self):
+        """
+        Saves the merged session stats and failure buckets to the report directory
+        :rtype: dict
+        """
+        self.report_sink.close()
+        stats = dict(self.stats, reissued_leases=self.leases.reissued)
+        stats['test_list_str'] = ','.join(stats['shards'])
+        if self.failure_buckets is not None:
+            self.failure_buckets.merge(self._bucket_summaries)
+            self.failure_buckets.close()
+        elif self._bucket_summaries:
+            with open(os.path.join(self.report_dir, FAILURE_BUCKETS_FILE), 'w') as f:
+                f.write(json.dumps(merge_bucket_summaries(self._bucket_summaries)))
+        with open(os.path.join(self.report_dir, 'session_stats.json'), 'w') as f:
+            f.write(json.dumps(stats))
+        self.logger.info('Distributed session finished, session stats: {}'.format(stats))
+        return stats
+
+    def handle(self, worker, message):
+        """
+        :param worker: name of the worker
+        :param message: message of the worker
+        :type message: dict
+        :return: the answer, None if the message has none
+        :rtype: dict
+        """
+        message_type = message.get('type')
+        with self._lock:
+            if message_type == 'lease':
+                if self.leases.finished():
+                    return {'type': 'done'}
+                lease = self.leases.acquire(worker, monotonic())
+                if lease is None:
+                    return {'type': 'wait', 'seconds': WAIT_SECONDS}
+                self.logger.info('Lease %d of tests %s to %s', lease[0], lease[1], worker)
+                return {'type': 'lease', 'lease_id': lease[0], 'test_list': lease[1]}
+            if message_type == 'heartbeat':
+                self.leases.renew(message['lease_id'], monotonic())
+            elif message_type == 'report':
+                self.leases.renew(message['lease_id'], monotonic())
+                test_number = message['report'].get('test_number')
+                if test_number not in self._reported:
+                    self._reported.add(test_number)
+                    # every worker saves the exemplars of a bucket, the ones past the cap of the session are dropped
+                    if self.failure_buckets is None or self.failure_buckets.add_saved(test_number, message['report']):
+                        self.report_sink.write(test_number, message['report'])
+            elif message_type == 'release':
+                self.leases.release(message['lease_id'])
+            elif message_type == 'complete':
+                if self.leases.complete(message['lease_id']):
+                    self._merge_stats(worker, message)
+                return {'type': 'ok'}
+            else:
+                self.logger.warning('Unknown message from %s: %s', worker, message_type)
+        return None
+
+    def _merge_stats(self, worker, message):
+        stats = message.get('stats') or {}
+        self.stats['shards'].append(stats.get('test_list_str'))
+        self.stats['tested'] += stats.get('tested', 0)
+        self.stats['failure_count'] += stats.get('failure_count', 0)
+        self.stats['workers'][worker] = self.stats['workers'].get(worker, 0) + stats.get('tested', 0)
+        if stats.get('start_time') and (self.stats['start_time'] is None or
+                                        stats['start_time'] < self.stats['start_time']):
+            self.stats['start_time'] = stats['start_time']
+        if message.get('buckets'):
+            self._bucket_summaries.append(message['buckets'])
+        self.logger.info('Range %s done by %s, %s', stats.get('test_list_str'), worker, self.leases.progress())
+
+    def welcome(self, message):
+        """
+        :param message: hello message of a worker
+        :return: the answer, error if the worker has an other model or token
+        :rtype: dict
+        """
+        # compare_digest takes only ASCII strings, any token can be compared as bytes
+        if self.token is not None and not hmac.compare_digest(str(message.get('token')).encode(), self.token.encode()):
+            return {'type': 'error', 'reason': 'invalid token'}
+        if message.get('fingerprint') != self.fingerprint:
+            return {'type': 'error', 'reason': 'the model of the worker differs from the one of the coordinator'}
+        return {'type': 'welcome', 'lease_timeout': self.leases.lease_timeout}
+
+    def connected(self):
+        with self._lock:
+            self._connections += 1
+
+    def disconnected(self, worker):
+        """
+        :param worker: name of the worker, None if it wasn't welcomed
+        """
+        with self._lock:
+            self._connections -= 1
+            if worker is not None:
+                self.leases.release_worker(worker)
+
+
+def _coordinator_handler(coordinator):
+
+    class CoordinatorHandler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            coordinator.connected()
+            worker = None
+            try:
+                hello = receive_message(self.rfile)
+                if hello is None or hello.get('type') != 'hello':
+                    return
+                answer = coordinator.welcome(hello)
+                send_message(self.wfile, answer)
+                if answer['type'] != 'welcome':
+                    coordinator.logger.warning('Worker %s rejected: %s', hello.get('worker'), answer['reason'])
+                    return
+                worker = '{} ({}:{})'.format(hello.get('worker'), *self.client_address[:2])
+                coordinator.logger.info('Worker %s connected', worker)
+                while True:
+                    message = receive_message(self.rfile)
+                    if message is None:
+                        break
+                    answer = coordinator.handle(worker, message)
+                    if answer is not None:
+                        send_message(self.wfile, answer)
+            except (OSError, ValueError) as e:
+                coordinator.logger.warning('Connection of worker %s failed: %s', worker, e)
+            finally:
+                if worker is not None:
+                    coordinator.logger.info('Worker %s disconnected', worker)
+                coordinator.disconnected(worker)
+
+    return CoordinatorHandler
+
+
+@set_class_logger
+class Worker(object):
+    """
+    Runs the ranges leased by a coordinator, one at a time, each in a child process of the fuzzer
+    """
+
+    def __init__(self, fuzzer, address, token=None, heartbeat_interval=None, name=None):
+        """
+        :param fuzzer: configured fuzzer, its model has to be the one of the coordinator
+        :type fuzzer: fuzzer.Fuzzer
+        :param address: host and port of the coordinator
+        :type address: tuple
+        :param token: shared secret of the coordinator
+        :param heartbeat_interval: time between two heartbeats of a running range (seconds), a quarter of the lease
+        timeout of the coordinator by default
+        :param name: name of the worker, host name and process id by default
+        """
+        self.fuzzer = fuzzer
+        self.address = address
+        self.token = token
+        self.heartbeat_interval = heartbeat_interval
+        self.name = name or '{}-{}'.format(socket.gethostname(), os.getpid())
+        self.ranges = 0
+
+    def connect(self):
+        for attempt in range(CONNECT_ATTEMPTS):
+            try:
+                return socket.create_connection(self.address)
+            except OSError as e:
+                if attempt == CONNECT_ATTEMPTS - 1:
+                    raise
+                self.logger.warning('Failed to connect to the coordinator: %s, retrying', e)
+                sleep(WAIT_SECONDS)
+
+    def run(self, fingerprint):
+        """
+        :param fingerprint: fingerprint of the model of the worker
+        :return: number of ranges run
+        :rtype: int
+        """
+        connection = self.connect()
+        stream = connection.makefile('rwb')
+        try:
+            send_message(stream, {'type': 'hello', 'worker': self.name, 'fingerprint': fingerprint,
+                                  'token': self.token})
+            answer = receive_message(stream)
+            if answer is None or answer['type'] != 'welcome':
+                raise ValueError('The coordinator rejected the worker: {}'.format(
+                    answer.get('reason') if answer else 'connection closed'))
+            if self.heartbeat_interval is None:
+                self.heartbeat_interval = answer.get('lease_timeout', DEFAULT_LEASE_TIMEOUT) / 4
+            while True:
+                send_message(stream, {'type': 'lease'})
+                answer = receive_message(stream)
+                if answer is None or answer['type'] == 'done':
+                    break
+                if answer['type'] == 'wait':
+                    sleep(answer['seconds'])
+                    continue
+                self.run_lease(stream, answer['lease_id'], answer['test_list'])
+                self.ranges += 1
+        finally:
+            stream.close()
+            connection.close()
+        self.logger.info('Worker %s finished after %d ranges', self.name, self.ranges)
+        return self.ranges
+
+    def run_lease(self, stream, lease_id, test_list_str):
+        """
+        Runs the fuzzer on the range of the lease, then sends its reports and stats
+        """
+        shard_dir = os.path.join(self.fuzzer.report_dir, 'lease_{}'.format(lease_id))
+        os.makedirs(shard_dir, exist_ok=True)
+        stats_file = os.path.join(self.fuzzer.report_dir, 'lease_{}_stats.json'.format(lease_id))
+        child = multiprocessing.Process(target=self.fuzzer.run_fuzzer,
+                                        kwargs={'report_dir': shard_dir,
+                                                'test_list_str': test_list_str,
+                                                'stats_file': stats_file,
+                                                'interface': NullInterface()})
+        child.start()
+        while True:
+            child.join(self.heartbeat_interval)
+            if not child.is_alive():
+                break
+            send_message(stream, {'type': 'heartbeat', 'lease_id': lease_id})
+        try:
+            try:
+                with open(stats_file, 'r') as f:
+                    stats = json.loads(f.read())
+            except (OSError, ValueError):
+                self.logger.error('The fuzzer of tests %s exited with %s, the range is released', test_list_str,
+                                  child.exitcode)
+                send_message(stream, {'type': 'release', 'lease_id': lease_id})
+                return
+            buckets = None
+            buckets_file = os.path.join(shard_dir, FAILURE_BUCKETS_FILE)
+            if os.path.exists(buckets_file):
+                with open(buckets_file, 'r') as f:
+                    buckets = json.loads(f.read())
+            for report in iter_reports(shard_dir):
+                send_message(stream, {'type': 'report', 'lease_id': lease_id, 'report': report})
+            send_message(stream, {'type': 'complete', 'lease_id': lease_id, 'stats': stats, 'buckets': buckets})
+            receive_message(stream)
+        finally:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+            if os.path.exists(stats_file):
+                os.remove(stats_file)
@@ -0,0 +1,170 @@
+"""
+Selection of the endpoints to fuzz and their test budgets. The filters decide which operations of the API definition
+get a template, the budgets limit the number of tests and the time spent on an endpoint while fuzzing.
+"""
+import bisect
+import fnmatch
+from math import ceil
+from time import monotonic
+
+from kitty.fuzzers.test_list import StartEndList
+
+from apifuzzer.utils import set_class_logger
+
+
+class EndpointFilter(object):
+    """
+    Include and exclude filters of the operations. An operation is fuzzed if it matches every include filter which is
+    set and none of the exclude filters.
+    """
+
+    def __init__(self, include_paths=None, exclude_paths=None, methods=None, include_tags=None, exclude_tags=None):
+        """
+        :param include_paths: glob patterns of the paths as in the definition, e.g. '/pets/*', * matches / too
+        :param exclude_paths: glob patterns of the paths to leave out
+        :param methods: HTTP methods to fuzz
+        :param include_tags: fuzz the operations which have any of these tags
+        :param exclude_tags: leave out the operations which have any of these tags
+        :type include_paths: list of str
+        """
+        self.include_paths = sorted(include_paths or [])
+        self.exclude_paths = sorted(exclude_paths or [])
+        self.methods = sorted(method.lower() for method in methods or [])
+        self.include_tags = sorted(include_tags or [])
+        self.exclude_tags = sorted(exclude_tags or [])
+
+    def options(self):
+        """
+        :return: the filters, e.g. for the template cache key
+        :rtype: dict
+        """
+        return {
+            'include_paths': self.include_paths,
+            'exclude_paths': self.exclude_paths,
+            'methods': self.methods,
+            'include_tags': self.include_tags,
+            'exclude_tags': self.exclude_tags,
+        }
+
+    def matches(self, operation):
+        """
+        :param operation: operation of the API definition
+        :type operation: apifuzzer.spec_loader.Operation
+        :rtype: bool
+        """
+        if self.include_paths and not any(fnmatch.fnmatchcase(operation.path, p) for p in self.include_paths):
+            return False
+        if any(fnmatch.fnmatchcase(operation.path, p) for p in self.exclude_paths):
+            return False
+        if self.methods and operation.method not in self.methods:
+            return False
+        if self.include_tags and not set(operation.tags).intersection(self.include_tags):
+            return False
+        return not set(operation.tags).intersection(self.exclude_tags)
+
+
+def skip_test_list_to(test_list, index):
+    """
+    Advances a kitty test list to its first test at or after index, without stepping through the tests in between
+    :param test_list: kitty test list of the fuzzer, a single range without a test list string
+    :type test_list: kitty.fuzzers.test_list.RangesList or kitty.fuzzers.test_list.StartEndList
+    :param index: mutation index
+    """
+    if isinstance(test_list, StartEndList):
+        if test_list.current() is not None and test_list.current() < index:
+            test_list.skip(index - test_list.current())
+        return
+    while test_list.current() is not None and test_list.current() < index:
+        ranges = test_list._lists[test_list._list_idx]
+        count = min(index, ranges._end) - ranges._current
+        ranges.skip(count)
+        test_list._idx += count
+        if ranges.current() is None:
+            test_list._list_idx += 1
+
+
+@set_class_logger
+class EndpointBudget(object):
+    """
+    Limits the tests of every endpoint (template) of the model. The test count limit keeps evenly spread tests of the
+    endpoint, so every parameter is fuzzed and the selected tests don't depend on the test list or on a resume. The
+    time limit stops the endpoint after the given seconds since its first test.
+    """
+
+    def __init__(self, model, max_tests=None, max_time=None):
+        """
+        :param model: kitty model of the session
+        :type model: apifuzzer.mutation_index.IndexedGraphModel
+        :param max_tests: maximum number of tests per endpoint
+        :type max_tests: int
+        :param max_time: maximum time spent on an endpoint (seconds)
+        :type max_time: float
+        """
+        self.max_tests = max_tests
+        self.max_time = max_time
+        self._starts = list()
+        self._ends = list()
+        self._names = list()
+        index = model.mutation_index
+        for template, (start, end) in zip(index.templates, index.template_ranges):
+            if end > start:
+                self._starts.append(start)
+                self._ends.append(end)
+                self._names.append(template.get_name())
+        self._started = dict()
+        self.tested = dict()
+        self.stopped = set()
+
+    def _endpoint(self, index):
+        position = bisect.bisect_right(self._starts, index) - 1
+        if position < 0 or index >= self._ends[position]:
+            return None
+        return position
+
+    def next_test(self, index):
+        """
+        :param index: index of the next test of the test list
+        :return: the first index at or after index which is within the budget of its endpoint
+        :rtype: int
+        """
+        position = self._endpoint(index)
+        if position is None:
+            return index
+        start, end = self._starts[position], self._ends[position]
+        if position in self.stopped:
+            return end
+        if self.max_time is not None and position in self._started and \
+                monotonic() - self._started[position] >= self.max_time:
+            self.logger.info('Time budget of %s is used up after %d tests', self._names[position],
+                             self.tested.get(position, 0))
+            self.stopped.add(position)
+            return end
+        if self.max_tests is not None:
+            stride = max(1, int(ceil((end - start) / float(self.max_tests))))
+            offset = (index - start) % stride
+            if offset:
+                index = index + stride - offset
+                if index >= end:
+                    return end
+        return index
+
+    def started(self, index):
+        """
+        Counts the test of the given index
+        :param index: index of the test being started
+        """
+        position = self._endpoint(index)
+        if position is None:
+            return
+        self._started.setdefault(position, monotonic())
+        self.tested[position] = self.tested.get(position, 0) + 1
+
+    def summary(self):
+        """
+        :return: number of tests by endpoint name and the endpoints stopped by the time limit
+        :rtype: dict
+        """
+        return {
+            'tested': {self._names[position]: count for position, count in self.tested.items()},
+            'stopped': sorted(self._names[position] for position in self.stopped),
+        }
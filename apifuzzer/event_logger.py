@@ -0,0 +1,56 @@
+import json
+from time import time
+
+
+class EventLogger(object):
+    """
+    Writes one JSON object per line for every fuzzing event, so a session can be analysed without parsing the
+    human readable log
+    """
+    enabled = True
+
+    def __init__(self, path):
+        """
+        :param path: file the events are appended to
+        :type path: str
+        """
+        self.path = path
+        self._file = open(path, 'a')
+
+    def emit(self, event, **fields):
+        """
+        :param event: name of the event, e.g. 'request', 'response'
+        :type event: str
+        :param fields: event attributes, not JSON serializable values are converted to str
+        """
+        fields['event'] = event
+        fields['time'] = time()
+        self._file.write(json.dumps(fields, default=str))
+        self._file.write('\n')
+
+    def close(self):
+        self._file.close()
+
+
+class NullEventLogger(object):
+    """
+    Drops every event. Callers check `enabled` before collecting the event attributes, so throughput runs don't pay
+    for them at all.
+    """
+    enabled = False
+
+    def emit(self, event, **fields):
+        pass
+
+    def close(self):
+        pass
+
+
+def get_event_logger(path=None):
+    """
+    :param path: event log file, events are switched off if not set
+    :rtype: EventLogger or NullEventLogger
+    """
+    if path:
+        return EventLogger(path)
+    return NullEventLogger()
@@ -0,0 +1,210 @@
+"""
+Groups the failed tests by their endpoint and a signature of their responses. Most mutations of a broken endpoint fail
+the same way, so only the first few reports of a signature are worth saving, the others are only counted. The endpoint
+is part of the signature, as frameworks often return the same error page from every route.
+"""
+import hashlib
+import json
+import os
+import re
+
+FAILURE_BUCKETS_FILE = 'failure_buckets.json'
+# response headers which tell apart the error pages of different components, e.g. the proxy and the application
+KEY_HEADERS = ('content-type', 'server')
+BODY_SAMPLE_SIZE = 1024
+
+NON_PRINTABLE = re.compile(r'[^\x20-\x7e\n]+')
+QUOTED = re.compile(r'(?:\'(?:[^\'\\\n]|\\.)*\'|"(?:[^"\\\n]|\\.)*")(\s*:)?')
+VOLATILE = re.compile(r'[0-9a-fA-F]{8}(?:-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}|\b[0-9a-fA-F]{16,}\b|\d+')
+
+
+def _mask_quoted(match):
+    # the keys of JSON objects are kept
+    return match.group(0) if match.group(1) else '<str>'
+
+
+def normalize_body(body):
+    """
+    Removes the parts of the response body which differ from test to test: ids, numbers and quoted values, as the
+    error messages usually quote the invalid input
+    :param body: response body
+    :type body: str
+    :rtype: str
+    """
+    if not body:
+        return ''
+    body = NON_PRINTABLE.sub('', body[:BODY_SAMPLE_SIZE])
+    body = QUOTED.sub(_mask_quoted, body)
+    return VOLATILE.sub('0', body)
+
+
+def failure_signature(report):
+    """
+    :param report: report of a failed test
+    :type report: apifuzzer.apifuzzer_report.Apifuzzer_Report
+    :return: hashable signature of the failure
+    :rtype: tuple
+    """
+    headers = report.get('response_headers') or {}
+    error = report.get('request_error')
+    return (report.get('endpoint'),
+            report.get('request_method'),
+            report.get('parsed_status_code'),
+            normalize_body(report.get('response')),
+            tuple(headers.get(name) for name in KEY_HEADERS),
+            error[:BODY_SAMPLE_SIZE] if error else None)
+
+
+class FailureBucket(object):
+    """Failed tests with the same signature"""
+
+    def __init__(self, signature, test_number):
+        self.id = hashlib.sha1(repr(signature).encode()).hexdigest()[:16]
+        self.signature = signature
+        self.first_test = test_number
+        self.count = 0
+        self.exemplars = list()
+
+    @classmethod
+    def from_dict(cls, bucket_dict):
+        signature = (bucket_dict.get('endpoint'), bucket_dict['request_method'], bucket_dict['status_code'],
+                     bucket_dict['body'], tuple(bucket_dict['headers'].get(name) for name in KEY_HEADERS),
+                     bucket_dict['request_error'])
+        bucket = cls(signature, bucket_dict['first_test'])
+        bucket.count = bucket_dict['count']
+        bucket.exemplars = list(bucket_dict['exemplars'])
+        return bucket
+
+    def to_dict(self):
+        endpoint, method, status_code, body, headers, error = self.signature
+        return {
+            'id': self.id,
+            'count': self.count,
+            'first_test': self.first_test,
+            'exemplars': self.exemplars,
+            'endpoint': endpoint,
+            'request_method': method,
+            'status_code': status_code,
+            'body': body,
+            'headers': dict(zip(KEY_HEADERS, headers)),
+            'request_error': error,
+        }
+
+
+class FailureBuckets(object):
+    """
+    In memory index of the failure buckets. The first `exemplars` reports of a bucket are saved, the rest are counted.
+    The buckets of an earlier session saved to the same report directory are continued, e.g. after a resume.
+    """
+
+    def __init__(self, report_dir, exemplars=3):
+        """
+        :param report_dir: the bucket summary is saved here at close
+        :param exemplars: number of reports saved per bucket
+        :type exemplars: int
+        """
+        self.report_dir = report_dir
+        self.exemplars = exemplars
+        self.buckets = dict()
+        # saved reports of the buckets by bucket id, the buckets of other sessions are only known by id until merged
+        self.saved = dict()
+        path = os.path.join(report_dir, FAILURE_BUCKETS_FILE)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for bucket_dict in json.loads(f.read()):
+                    bucket = FailureBucket.from_dict(bucket_dict)
+                    self.buckets[bucket.signature] = bucket
+                    self.saved[bucket.id] = bucket.exemplars
+
+    def add(self, test_number, report):
+        """
+        Counts the failed test in its bucket and marks its report with the bucket id
+        :param test_number: number of the failed test
+        :param report: report of the failed test
+        :type report: apifuzzer.apifuzzer_report.Apifuzzer_Report
+        :return: True if the report should be saved
+        :rtype: bool
+        """
+        signature = failure_signature(report)
+        bucket = self.buckets.get(signature)
+        if bucket is None:
+            bucket = self.buckets[signature] = FailureBucket(signature, test_number)
+        bucket.count += 1
+        if len(bucket.exemplars) >= self.exemplars:
+            return False
+        bucket.exemplars.append(test_number)
+        report.add('failure_bucket', bucket.id)
+        return True
+
+    def add_saved(self, test_number, report):
+        """
+        Caps the reports of the buckets of other sessions, e.g. the workers, which save up to their own cap each
+        :param test_number: number of the failed test
+        :param report: report saved by the other session, marked with its bucket id
+        :type report: dict
+        :return: True if the report should be saved, the reports without a bucket always are
+        :rtype: bool
+        """
+        bucket_id = report.get('failure_bucket')
+        if bucket_id is None:
+            return True
+        saved = self.saved.setdefault(bucket_id, list())
+        if len(saved) >= self.exemplars:
+            return False
+        saved.append(test_number)
+        return True
+
+    def merge(self, summaries):
+        """
+        Adds the bucket summaries of other sessions, the exemplars of a bucket are its reports kept by add_saved
+        :param summaries: bucket summaries of the other sessions
+        :type summaries: list of list
+        """
+        for bucket_dict in merge_bucket_summaries(summaries):
+            bucket = FailureBucket.from_dict(bucket_dict)
+            known = self.buckets.get(bucket.signature)
+            if known is None:
+                bucket.exemplars = self.saved.setdefault(bucket.id, list())
+                self.buckets[bucket.signature] = bucket
+                continue
+            known.count += bucket.count
+            known.first_test = min(known.first_test, bucket.first_test)
+
+    def summary(self):
+        """
+        :return: the buckets, the most frequent first
+        :rtype: list of dict
+        """
+        return sorted((bucket.to_dict() for bucket in self.buckets.values()), key=lambda b: -b['count'])
+
+    def close(self):
+        """
+        Saves the summary of the buckets to failure_buckets.json in the report directory
+        """
+        os.makedirs(self.report_dir, exist_ok=True)
+        with open(os.path.join(self.report_dir, FAILURE_BUCKETS_FILE), 'w') as f:
+            f.write(json.dumps(self.summary()))
+
+
+def merge_bucket_summaries(summaries, exemplars=None):
+    """
+    :param summaries: bucket summaries of several sessions, e.g. the workers
+    :type summaries: list of list
+    :param exemplars: number of exemplars kept per bucket, all of them if not set
+    :return: merged summary, the buckets with the same id are summed up
+    :rtype: list of dict
+    """
+    merged = dict()
+    for summary in summaries:
+        for bucket in summary:
+            if bucket['id'] not in merged:
+                merged[bucket['id']] = dict(bucket, exemplars=list(bucket['exemplars']))
+                continue
+            known = merged[bucket['id']]
+            known['count'] += bucket['count']
+            known['first_test'] = min(known['first_test'], bucket['first_test'])
+            known['exemplars'].extend(bucket['exemplars'])
+    if exemplars is not None:
+        for bucket in merged.values():
+            del bucket['exemplars'][exemplars:]
+    return sorted(merged.values(), key=lambda b: -b['count'])
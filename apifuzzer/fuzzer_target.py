@@ -1,9 +1,8 @@
 import json
-import os
+import logging
 import re
-import urllib.parse
-from io import BytesIO
-from time import time
+import codecs
+from time import monotonic
 
 import pycurl
 import requests
@@ -11,6 +10,15 @@ from bitstring import Bits
 from kitty.targets.server import ServerTarget
 
 from apifuzzer.apifuzzer_report import Apifuzzer_Report as Report
+from apifuzzer.body_encoders import BodyEncoders
+from apifuzzer.curl_pool import CurlHandlePool
+from apifuzzer.event_logger import NullEventLogger
+from apifuzzer.metrics import NullMetrics
+from apifuzzer.rate_control import RateController
+from apifuzzer.report_sink import FileReportSink
+from apifuzzer.response_buffer import DEFAULT_MAX_RESPONSE_BYTES, MAX_HEADER_BYTES, ResponseBuffer, \
+    parse_headers
+from apifuzzer.sanitizer import dict_to_query_string, sanitize_headers, sanitize_query_params, sanitize_url
 from apifuzzer.utils import set_class_logger, try_b64encode
 
 
@@ -23,7 +31,9 @@ class FuzzerTarget(ServerTarget):
     def not_implemented(self, func_name):
         pass
 
-    def __init__(self, name, base_url, report_dir, auth_headers, logger):
+    def __init__(self, name, base_url, report_dir, auth_headers, logger, curl_pool_size=1, event_logger=None,
+                 report_sink=None, rate_controller=None, failure_buckets=None, metrics=None,
+                 max_response_bytes=DEFAULT_MAX_RESPONSE_BYTES):
         super(FuzzerTarget, self).__init__(name, logger)
         self.base_url = base_url
         self._last_sent_request = None
@@ -32,7 +42,17 @@ class FuzzerTarget(ServerTarget):
         self.report_dir = report_dir
         self.logger = logger
         self.logger.info('Logger initialized')
-        self.resp_headers = dict()
+        self.retries = 3
+        self.curl_pool = CurlHandlePool(max_size=curl_pool_size)
+        self.event_logger = event_logger if event_logger else NullEventLogger()
+        self.report_sink = report_sink if report_sink else FileReportSink(report_dir)
+        self.rate_controller = rate_controller if rate_controller else RateController()
+        self.failure_buckets = failure_buckets
+        self.metrics = metrics if metrics else NullMetrics()
+        self.max_response_bytes = max_response_bytes
+        # the bodies of the passed tests are dropped unless they are needed, e.g. by the novelty scheduler
+        self.keep_responses = False
+        self.body_encoders = BodyEncoders()
 
     def pre_test(self, test_num):
         """
@@ -62,7 +82,7 @@ class FuzzerTarget(ServerTarget):
         if isinstance(fuzz_header, dict):
             for k, v in fuzz_header.items():
                 fuzz_header_name = k.split('|')[-1]
-                self.logger.debug('Adding fuzz header: {}->{}'.format(fuzz_header_name, v))
+                self.logger.debug('Adding fuzz header: %s->%s', fuzz_header_name, v)
                 _header[fuzz_header_name] = v
         if isinstance(self.auth_headers, list):
             for auth_header_part in self.auth_headers:
@@ -76,13 +96,6 @@ class FuzzerTarget(ServerTarget):
         self.logger.warning(msg)
         self.report.failed(msg)
 
-    def header_function(self, header_line):
-        header_line = header_line.decode('iso-8859-1')
-        if ':' not in header_line:
-            return
-        name, value = header_line.split(':', 1)
-        self.resp_headers[name.strip().lower()] = value.strip()
-
     @staticmethod
     def dict_to_query_string(query_strings):
         """
@@ -92,10 +105,7 @@ class FuzzerTarget(ServerTarget):
         :return: query string
         :rtype: str
         """
-        _tmp_list = list()
-        for query_string_key in query_strings.keys():
-            _tmp_list.append('{}={}'.format(query_string_key, query_strings[query_string_key]))
-        return '?' + '&'.join(_tmp_list)
+        return dict_to_query_string(query_strings)
 
     def format_pycurl_query_param(self, url, query_params):
         """
@@ -106,31 +116,9 @@ class FuzzerTarget(ServerTarget):
         :type query_params: dict
         :rtype: str
         """
-        _dummy_curl = pycurl.Curl()
-        _tmp_query_params = dict()
-        for k, v in query_params.items():
-            iteration = 0
-            while True:
-                iteration = iteration + 1
-                _test_query_params = _tmp_query_params.copy()
-                _query_param_name = k.split('|')[-1]
-                _test_query_params[_query_param_name] = v
-                try:
-                    _dummy_curl.setopt(pycurl.URL, '{}{}'.format(url, self.dict_to_query_string(_test_query_params)))
-                    _tmp_query_params[_query_param_name] = v
-                    break
-                except (UnicodeEncodeError, ValueError)  as e:
-                    self.logger.exception(e)
-                    self.logger.debug('{} Problem adding ({}) as query param. Issue was:{}'.format(iteration, k, e))
-                    if len(v):
-                        self.logger.debug('Removing last character from query param, current length: %s', len(v))
-                        v = v[:-1]
-                    else:
-                        self.logger.info('The whole query param was removed, using empty string instead')
-                        _tmp_query_params[_query_param_name] = ""
-                        break
-
-        return self.dict_to_query_string(_tmp_query_params)
+        _return = sanitize_query_params(url, query_params)
+        self.logger.debug('Query string to be used: %s', _return)
+        return _return
 
     def format_pycurl_url(self, url):
         """
@@ -140,34 +128,7 @@ class FuzzerTarget(ServerTarget):
         :return: pycurl compliant URL
         """
         self.logger.debug('URL to process: %s', url)
-        _dummy_curl = pycurl.Curl()
-        url_fields = url.split('/')
-        _tmp_url_list = list()
-        for part in url_fields:
-            self.logger.debug('Processing URL part: {}'.format(part))
-            iteration = 0
-            while True:
-                iteration = iteration + 1
-                try:
-                    _test_list = list()
-                    _test_list = _tmp_url_list[::]
-                    _test_list.append(part)
-                    _dummy_curl.setopt(pycurl.URL, '/'.join(_test_list))
-                    self.logger.debug('Adding %s to the url: %s', part, _tmp_url_list)
-                    _tmp_url_list.append(part)
-                    break
-                except (UnicodeEncodeError, ValueError) as e:
-                    self.logger.debug('{} Problem adding ({}) to the url. Issue was:{}'.format(iteration, part, e))
-                    if len(part):
-                        self.logger.debug('Removing first character from part, current length: %s', len(part))
-                        part = part[1:]
-                    else:
-                        self.logger.info('The whole url part was removed, using empty string instead')
-                        _tmp_url_list.append("-")
-                        break
-                # except Exception as e:
-                #   self.logger.exception(e)
-        _return = '/'.join(_tmp_url_list)
+        _return = sanitize_url(url)
         self.logger.info('URL to be used: %s', _return)
         return _return
 
@@ -178,152 +139,265 @@ class FuzzerTarget(ServerTarget):
         :return: http headers
         :rtype: list of dicts
         """
-        _dummy_curl = pycurl.Curl()
-        _tmp = dict()
-        _return = list()
-        for k, v in headers.items():
-            original_value = v
-            iteration = 0
-            chop_left = True
-            chop_right = True
-            while True:
+        return sanitize_headers(headers)
 
-                iteration = iteration + 1
-                try:
-                    _dummy_curl.setopt(pycurl.HTTPHEADER, ['{}: {}'.format(k, v).encode()])
-                    _tmp[k] = v
-                    break
-                except ValueError as e:
-                    self.logger.debug('{} Problem at adding {} to the header. Issue was:{}'.format(iteration, k, e))
-                    if len(v):
-                        if chop_left:
-                            self.logger.debug('Removing first character from value, current length: %s', len(v))
-                            v = v[1:]
-                            if len(v) == 0:
-                                chop_left = False
-                                v = original_value
-                        elif chop_right:
-                            self.logger.debug('Removing last character from value, current length: %s', len(v))
-                            v = v[:-1]
-                            if len(v) == 1:
-                                chop_left = False
-                    else:
-                        self.logger.info('The whole header value was removed, using empty string instead')
-                        _tmp[k] = ""
-                        break
-        for k, v in _tmp.items():
-            _return.append('{}: {}'.format(k, v).encode())
+    def prepare_request(self, **kwargs):
+        """
+        Compiles the fuzz HTTP request from the rendered payload and records it in the current report
+        :param kwargs: url, method, params, querystring, etc
+        :return: request with url, method, headers and data attributes
+        """
+        self.logger.debug('Transmit: %s', kwargs)
+        _req_url = list()
+        for url_part in self.base_url, kwargs['url']:
+            if isinstance(url_part, Bits):
+                url_part = url_part.tobytes()
+            if isinstance(url_part, bytes):
+                url_part = url_part.decode()
+            _req_url.append(url_part.strip('/'))
+        kwargs.pop('url')
+        # Replace back the placeholder for '/'
+        # (this happens in expand_path_variables,
+        # but if we don't have any path_variables, it won't)
+        request_url = '/'.join(_req_url).replace('+', '/')
+        query_params = None
+        if kwargs.get('params') is not None:
+            query_params = self.format_pycurl_query_param(request_url, kwargs.get('params', {}))
+            kwargs.pop('params')
+        if kwargs.get('path_variables') is not None:
+            request_url = self.expand_path_variables(request_url, kwargs.get('path_variables'))
+            kwargs.pop('path_variables')
+        if kwargs.get('data') is not None:
+            kwargs['data'] = self.fix_data(kwargs.get('data'))
+        if query_params is not None:
+            request_url = '{}{}'.format(request_url, query_params)
+        method = kwargs['method']
+        self.logger.info('Request URL : %s %s', method, request_url)
+        if kwargs.get('data') is not None and self.logger.isEnabledFor(logging.INFO):
+            self.logger.info('Request data:%s', json.dumps(dict(kwargs.get('data'))))
+        if isinstance(method, Bits):
+            method = method.tobytes()
+        if isinstance(method, bytes):
+            method = method.decode()
+        kwargs.pop('method')
+        # the url and the method are static, together they are the name of the template
+        endpoint = '{}|{}'.format(_req_url[1], method.lower())
+        content_type = kwargs.pop('content_type', None)
+        kwargs['headers'] = self.compile_headers(kwargs.get('headers'))
+        content_type, body = self.body_encoders.encode(endpoint, content_type, kwargs.get('data') or {})
+        if body:
+            # a fuzzed or configured content type is sent as it is
+            kwargs['headers'].setdefault('Content-Type', content_type)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('Request url:%s\nRequest method: %s\nRequest headers: %s\nRequest body: %s',
+                              request_url, method, json.dumps(dict(kwargs.get('headers', {})), indent=2),
+                              kwargs.get('data'))
+        self.report.set_status(Report.PASSED)
+        self.report.add('request_url', request_url)
+        self.report.add('request_method', method)
+        self.report.add('endpoint', endpoint)
+        self.report.add('request_headers', json.dumps(dict(kwargs.get('headers', {}))))
+        # a failed request is saved with its body too, so it can be replayed
+        self.report.add('request_body', kwargs.get('data', {}))
+        _request = Return()
+        _request.url = request_url
+        _request.method = method
+        _request.headers = kwargs.get('headers', {})
+        _request.data = kwargs.get('data', {})
+        _request.body = body
+        _request.endpoint = endpoint
+        if self.event_logger.enabled:
+            self.event_logger.emit('request', test_number=self.test_number, method=method, url=request_url)
+        return _request
+
+    def response_buffers(self, _curl):
+        """
+        :param _curl: handle of the request
+        :type _curl: pycurl.Curl
+        :return: the emptied header and body buffers of the handle, created at its first use
+        :rtype: tuple of apifuzzer.response_buffer.ResponseBuffer
+        """
+        if getattr(_curl, 'resp_buff_body', None) is None:
+            _curl.resp_buff_hdrs = ResponseBuffer(MAX_HEADER_BYTES)
+            _curl.resp_buff_body = ResponseBuffer(self.max_response_bytes)
+        _curl.resp_buff_hdrs.reset()
+        _curl.resp_buff_body.reset()
+        return _curl.resp_buff_hdrs, _curl.resp_buff_body
+
+    def setup_curl(self, _curl, request, resp_buff_hdrs, resp_buff_body):
+        """
+        Applies the prepared request to a Curl handle
+        :param _curl: handle to configure
+        :type _curl: pycurl.Curl
+        :param request: request returned by prepare_request
+        :param resp_buff_hdrs: buffer collecting the response headers
+        :param resp_buff_body: buffer collecting the response body
+        """
+        if request.url.startswith('https'):
+            _curl.setopt(pycurl.SSL_OPTIONS, pycurl.SSLVERSION_TLSv1_2)
+            _curl.setopt(pycurl.SSL_VERIFYPEER, False)
+            _curl.setopt(pycurl.SSL_VERIFYHOST, False)
+        # libcurl's own trace is only worth its cost when debug logs are written anyway
+        _curl.setopt(pycurl.VERBOSE, self.logger.isEnabledFor(logging.DEBUG))
+        _curl.setopt(pycurl.TIMEOUT, 10)
+        _curl.setopt(pycurl.URL, self.format_pycurl_url(request.url))
+        _curl.setopt(pycurl.HTTPHEADER, self.format_pycurl_header(request.headers))
+        _curl.setopt(pycurl.COOKIEFILE, "")
+        _curl.setopt(pycurl.USERAGENT, 'APIFuzzer')
+        _curl.setopt(pycurl.POST, len(request.data.items()))
+        _curl.setopt(pycurl.CUSTOMREQUEST, request.method)
+        _curl.setopt(pycurl.POSTFIELDS, request.body)
+        _curl.setopt(pycurl.HEADERFUNCTION, resp_buff_hdrs.write)
+        _curl.setopt(pycurl.WRITEFUNCTION, resp_buff_body.write)
+
+    def build_response(self, _curl, request, resp_buff_hdrs, resp_buff_body):
+        """
+        Collects the outcome of a performed Curl handle
+        :param _curl: handle which performed the request
+        :param request: request returned by prepare_request
+        :param resp_buff_hdrs: buffer collected the response headers
+        :param resp_buff_body: buffer collected the response body
+        :return: response with status_code, headers, content and request attributes
+        """
+        _return = Return()
+        _return.status_code = _curl.getinfo(pycurl.RESPONSE_CODE)
+        _return.headers = parse_headers(resp_buff_hdrs.getvalue())
+        _return.content = resp_buff_body.getvalue()
+        _return.content_length = resp_buff_body.received
+        _return.truncated = resp_buff_body.truncated
+        _return.total_time = _curl.getinfo(pycurl.TOTAL_TIME)
+        _return.request = Return()
+        _return.request.headers = request.headers
+        _return.request.body = request.data
+        if self.metrics.enabled:
+            self.metrics.request_completed(request.endpoint, _curl, _return.status_code)
         return _return
 
-    def transmit(self, **kwargs):
+    def request_failed(self, request, e):
         """
-        Prepares fuzz HTTP request, sends and processes the response
-        :param kwargs: url, method, params, querystring, etc
-        :return:
+        Records in the current report that the request could not be sent
+        :param request: request returned by prepare_request
+        :param e: exception raised while sending
+        """
+        self.logger.exception(e)
+        self.report.set_status(Report.FAILED)
+        self.logger.error('Request failed, reason: {}'.format(e))
+        # self.report.add('request_sending_failed', e.msg if hasattr(e, 'msg') else e)
+        self.report.add('request_method', request.method)
+        self.report.add('request_error', str(e))
+        self.metrics.request_failed(request.endpoint)
+        if self.event_logger.enabled:
+            self.event_logger.emit('request_failed', test_number=self.test_number, error=repr(e))
+
+    def process_response(self, _return):
+        """
+        Evaluates the response and records it in the current report
+        :param _return: response returned by build_response
+        :return: the processed response
         """
-        self.logger.debug('Transmit: {}'.format(kwargs))
         try:
-            _req_url = list()
-            for url_part in self.base_url, kwargs['url']:
-                if isinstance(url_part, Bits):
-                    url_part = url_part.tobytes()
-                if isinstance(url_part, bytes):
-                    url_part = url_part.decode()
-                _req_url.append(url_part.strip('/'))
-            kwargs.pop('url')
-            # Replace back the placeholder for '/'
-            # (this happens in expand_path_variables,
-            # but if we don't have any path_variables, it won't)
-            request_url = '/'.join(_req_url).replace('+', '/')
-            query_params = None
-            if kwargs.get('params') is not None:
-                query_params = self.format_pycurl_query_param(request_url, kwargs.get('params', {}))
-                kwargs.pop('params')
-            if kwargs.get('path_variables') is not None:
-                request_url = self.expand_path_variables(request_url, kwargs.get('path_variables'))
-                kwargs.pop('path_variables')
-            if kwargs.get('data') is not None:
-                kwargs['data'] = self.fix_data(kwargs.get('data'))
-            if query_params is not None:
-                request_url = '{}{}'.format(request_url, query_params)
-            method = kwargs['method']
-            self.logger.info('Request URL : {} {}'.format(method, request_url))
-            if kwargs.get('data') is not None:
-                self.logger.info('Request data:{}'.format(json.dumps(dict(kwargs.get('data')))))
-            if isinstance(method, Bits):
-                method = method.tobytes()
-            if isinstance(method, bytes):
-                method = method.decode()
-            kwargs.pop('method')
-            kwargs['headers'] = self.compile_headers(kwargs.get('headers'))
-            self.logger.debug('Request url:{}\nRequest method: {}\nRequest headers: {}\nRequest body: {}'.format(
-                request_url, method, json.dumps(dict(kwargs.get('headers', {})), indent=2), kwargs.get('data')))
-            self.report.set_status(Report.PASSED)
-            self.report.add('request_url', request_url)
-            self.report.add('request_method', method)
-            self.report.add('request_headers', json.dumps(dict(kwargs.get('headers', {}))))
-            try:
-                resp_buff_hdrs = BytesIO()
-                resp_buff_body = BytesIO()
-                _curl = pycurl.Curl()
-                b = BytesIO()
-                if request_url.startswith('https'):
-                    _curl.setopt(pycurl.SSL_OPTIONS, pycurl.SSLVERSION_TLSv1_2)
-                    _curl.setopt(pycurl.SSL_VERIFYPEER, False)
-                    _curl.setopt(pycurl.SSL_VERIFYHOST, False)
-                _curl.setopt(pycurl.VERBOSE, True)
-                _curl.setopt(pycurl.TIMEOUT, 10)
-                _curl.setopt(pycurl.URL, self.format_pycurl_url(request_url))
-                _curl.setopt(pycurl.HEADERFUNCTION, self.header_function)
-                _curl.setopt(pycurl.HTTPHEADER, self.format_pycurl_header(kwargs.get('headers', {})))
-                _curl.setopt(pycurl.COOKIEFILE, "")
-                _curl.setopt(pycurl.USERAGENT, 'APIFuzzer')
-                _curl.setopt(pycurl.POST, len(kwargs.get('data', {}).items()))
-                _curl.setopt(pycurl.CUSTOMREQUEST, method)
-                _curl.setopt(pycurl.POSTFIELDS, urllib.parse.urlencode(kwargs.get('data', {})))
-                _curl.setopt(pycurl.HEADERFUNCTION, resp_buff_hdrs.write)
-                _curl.setopt(pycurl.WRITEFUNCTION, resp_buff_body.write)
-                for retries in reversed(range(3)):
-                    try:
-                        _curl.perform()
-                    except Exception as e:
-                        # pycurl.error usually
-                        self.logger.error('{}: {}'.format(e.__class__.__name__, e))
-                        if retries:
-                            self.logger.error('Retrying... ({})'.format(retries))
-                        else:
-                            raise e
-                _return = Return()
-                _return.status_code = _curl.getinfo(pycurl.RESPONSE_CODE)
-                _return.headers = self.resp_headers
-                _return.content = b.getvalue()
-                _return.request = Return()
-                _return.request.headers = kwargs.get('headers', {})
-                _return.request.body = kwargs.get('data', {})
-                _curl.close()
-            except Exception as e:
-                self.logger.exception(e)
-                self.report.set_status(Report.FAILED)
-                self.logger.error('Request failed, reason: {}'.format(e))
-                # self.report.add('request_sending_failed', e.msg if hasattr(e, 'msg') else e)
-                self.report.add('request_method', method)
-                return
             # overwrite request headers in report, add auto generated ones
             self.report.add('request_headers', try_b64encode(json.dumps(dict(_return.request.headers))))
-            self.logger.debug('Response code:{}\nResponse headers: {}\nResponse body: {}'.format(
-                _return.status_code, json.dumps(dict(_return.headers), indent=2), _return.content))
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug('Response code:%s\nResponse headers: %s\nResponse body: %s',
+                                  _return.status_code, json.dumps(dict(_return.headers), indent=2), _return.content)
             self.report.add('request_body', _return.request.body)
-            self.report.add('response', _return.content.decode())
+            self.report.add('response_headers', dict(_return.headers))
+            self.report.add('response_time', _return.total_time)
             status_code = _return.status_code
+            if self.event_logger.enabled:
+                self.event_logger.emit('response', test_number=self.test_number, status_code=status_code,
+                                       total_time=_return.total_time, response_length=_return.content_length)
+            if status_code:
+                self.report.add('parsed_status_code', status_code)
             if not status_code:
                 self.report_add_basic_msg('Failed to parse http response code')
             elif status_code not in self.accepted_status_codes:
-                self.report.add('parsed_status_code', status_code)
                 self.report_add_basic_msg(('Return code %s is not in the expected list:', status_code))
+            if _return.truncated:
+                self.report.add('response_truncated', True)
+                self.report.add('response_length', _return.content_length)
+            # the body of a passed test isn't reported, it isn't decoded either
+            if self.keep_responses or self.report.get_status() != Report.PASSED:
+                self.report.add('response', self.decode_content(_return))
             return _return
         except (UnicodeDecodeError, UnicodeEncodeError) as e:  # request failure such as InvalidHeader
             self.report_add_basic_msg(('Failed to parse http response code, exception occurred: %s', e))
 
+    @staticmethod
+    def decode_content(_return):
+        """
+        :param _return: response returned by build_response
+        :return: the response body, without the last incomplete character if it is truncated
+        :rtype: str
+        """
+        if _return.truncated:
+            return codecs.getincrementaldecoder('utf-8')().decode(_return.content, final=False)
+        return _return.content.decode()
+
+    def transmit(self, **kwargs):
+        """
+        Prepares fuzz HTTP request, sends and processes the response
+        :param kwargs: url, method, params, querystring, etc
+        :return:
+        """
+        try:
+            request = self.prepare_request(**kwargs)
+        except (UnicodeDecodeError, UnicodeEncodeError) as e:  # request failure such as InvalidHeader
+            self.report_add_basic_msg(('Failed to parse http response code, exception occurred: %s', e))
+            return
+        _curl = self.curl_pool.acquire(request.url)
+        try:
+            resp_buff_hdrs, resp_buff_body = self.response_buffers(_curl)
+            self.setup_curl(_curl, request, resp_buff_hdrs, resp_buff_body)
+            for retries in reversed(range(self.retries)):
+                self.rate_controller.acquire()
+                try:
+                    _curl.perform()
+                    self.rate_controller.record_transfer(_curl)
+                    break
+                except Exception as e:
+                    # pycurl.error usually
+                    self.rate_controller.record_transfer(_curl, failed=True)
+                    self.logger.error('{}: {}'.format(e.__class__.__name__, e))
+                    if retries:
+                        self.logger.error('Retrying... ({})'.format(retries))
+                        self.metrics.request_retried(request.endpoint)
+                        resp_buff_hdrs.reset()
+                        resp_buff_body.reset()
+                    else:
+                        raise e
+            _return = self.build_response(_curl, request, resp_buff_hdrs, resp_buff_body)
+        except Exception as e:
+            self.curl_pool.release(_curl, broken=True)
+            self.request_failed(request, e)
+            return
+        self.curl_pool.release(_curl)
+        return self.process_response(_return)
+
+    def teardown(self):
+        self.curl_pool.close()
+        self.event_logger.close()
+        self.report_sink.close()
+        self.metrics.close()
+        if self.failure_buckets is not None:
+            self.failure_buckets.close()
+        super(FuzzerTarget, self).teardown()
+
+    def save_test_context(self):
+        """
+        Detaches the state of the current test, so an other test can be started while this one is in flight
+        :return: opaque test context
+        """
+        return self.test_number, self.report
+
+    def restore_test_context(self, context):
+        """
+        Makes a test detached by save_test_context the current test again
+        :param context: test context returned by save_test_context
+        """
+        self.test_number, self.report = context
+
     @staticmethod
     def fix_data(data):
         new_data = {}
@@ -337,22 +411,23 @@ class FuzzerTarget(ServerTarget):
         if self.report.get('report') is None:
             self.report.add('reason', self.report.get_status())
         super(FuzzerTarget, self).post_test(test_num)
+        if self.event_logger.enabled:
+            self.event_logger.emit('test_completed', test_number=test_num, status=self.report.get_status())
         if self.report.get_status() != Report.PASSED:
-            self.save_report_to_disc()
+            # only the first reports of a failure signature are saved if the failures are bucketed
+            if self.failure_buckets is None or self.failure_buckets.add(test_num, self.report):
+                self.save_report_to_disc()
+        self.metrics.test_completed(self.report.get_status())
 
     def save_report_to_disc(self):
-        self.logger.info('Report: {}'.format(self.report.to_dict()))
-        try:
-            if not os.path.exists(os.path.dirname(self.report_dir)):
-                try:
-                    os.makedirs(os.path.dirname(self.report_dir))
-                except OSError:
-                    pass
-            with open('{}/{}_{}.json'.format(self.report_dir, self.test_number, time()), 'w') as report_dump_file:
-                report_dump_file.write(json.dumps(self.report.to_dict()))
-        except Exception as e:
-            self.logger.error(
-                'Failed to save report "{}" to {} because: {}'.format(self.report.to_dict(), self.report_dir, e))
+        report = self.report.to_dict()
+        self.logger.info('Report: %s', report)
+        if self.metrics.enabled:
+            started = monotonic()
+            self.report_sink.write(self.test_number, report)
+            self.metrics.report_written(monotonic() - started)
+        else:
+            self.report_sink.write(self.test_number, report)
 
     def expand_path_variables(self, url, path_parameters):
         if not isinstance(path_parameters, dict):
@@ -361,7 +436,7 @@ class FuzzerTarget(ServerTarget):
             return url
         formattedUrl = url
         for path_key, path_value in path_parameters.items():
-            self.logger.debug('Processing: path_key: {} , path_variable: {}'.format(path_key, path_value))
+            self.logger.debug('Processing: path_key: %s , path_variable: %s', path_key, path_value)
             path_parameter = path_key.split('|')[-1]
             url_path_paramter = '{%PATH_PARAM%}'.replace('%PATH_PARAM%', path_parameter)
             tmpUrl = formattedUrl.replace(url_path_paramter, path_value)
@@ -369,5 +444,5 @@ class FuzzerTarget(ServerTarget):
                 self.logger.warn('{} was not in the url: {}, adding it'.format(url_path_paramter, url))
                 tmpUrl += '&{}={}'.format(path_parameter,path_value)
             formattedUrl = tmpUrl
-        self.logger.info('Compiled url in {}, out: {}'.format(url, formattedUrl))
+        self.logger.info('Compiled url in %s, out: %s', url, formattedUrl)
         return formattedUrl.replace("{", "").replace("}", "").replace("+", "/")
@@ -0,0 +1,288 @@
+"""
+In process metrics of the fuzzer in the OpenMetrics text format: request rate, curl timing phases, status code classes,
+retries and report write latency by endpoint. They are served over HTTP for a Prometheus scraper or rewritten to a file
+periodically, so the fuzzer can be watched together with the service under test.
+"""
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import monotonic
+
+import pycurl
+
+from apifuzzer.utils import set_class_logger
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    http.server.ThreadingHTTPServer, which needs Python 3.7
+    """
+    daemon_threads = True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = ['{}="{}"'.format(name, _escape(value)) for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append('{}="{}"'.format(*extra))
+    return '{{{}}}'.format(','.join(pairs)) if pairs else ''
+
+
+class Counter(object):
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        :param name: metric family name, the sample is name_total
+        :param documentation: help text
+        :param labelnames: names of the labels, the values are given in the same order to inc
+        :type labelnames: tuple
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = dict()
+
+    def inc(self, labels=(), amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = ['# TYPE {} counter'.format(self.name), '# HELP {} {}'.format(self.name, self.documentation)]
+        # the copy of a dict is atomic, the fuzzer thread can add labels while the metrics are served
+        for labels, value in sorted(list(self._values.items())):
+            lines.append('{}_total{} {}'.format(self.name, _format_labels(self.labelnames, labels), value))
+        return lines
+
+
+class Histogram(object):
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        """
+        :param name: metric family name
+        :param documentation: help text
+        :param labelnames: names of the labels
+        :type labelnames: tuple
+        :param buckets: upper bounds of the buckets, increasing, +Inf is added
+        :type buckets: tuple
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = dict()
+
+    def observe(self, value, labels=()):
+        """
+        :param value: observed value
+        :param labels: label values
+        :type labels: tuple
+        """
+        state = self._values.get(labels)
+        if state is None:
+            # counts of the buckets and of +Inf, then the sum
+            state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def count(self, labels=()):
+        state = self._values.get(labels)
+        return sum(state[:-1]) if state else 0
+
+    def render(self):
+        lines = ['# TYPE {} histogram'.format(self.name), '# HELP {} {}'.format(self.name, self.documentation)]
+        for labels, state in sorted(list(self._values.items())):
+            state = list(state)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), state):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(self.name, _format_labels(self.labelnames, labels,
+                                                                               ('le', bound)), cumulative))
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append('{}_count{} {}'.format(self.name, label_str, cumulative))
+            lines.append('{}_sum{} {}'.format(self.name, label_str, state[-1]))
+        return lines
+
+
+@set_class_logger
+class FuzzerMetrics(object):
+    """
+    Metrics of the requests and tests of a fuzzer target. The target checks `enabled` before collecting the values,
+    as the NullMetrics does.
+    """
+    enabled = True
+
+    def __init__(self, port=None, path=None, interval=5.0, host='127.0.0.1'):
+        """
+        :param port: port of the HTTP endpoint serving the metrics on /metrics, not served if not set
+        :type port: int
+        :param path: file the metrics are rewritten to, not written if not set
+        :param interval: minimum time between two rewrites of the file (seconds)
+        :type interval: float
+        :param host: address of the HTTP endpoint
+        """
+        self.path = path
+        self.interval = interval
+        self._started = monotonic()
+        self._written = None
+        self.requests = Counter('apifuzzer_requests', 'Requests sent, retries not included', ('endpoint',))
+        self.responses = Counter('apifuzzer_responses', 'Responses by status code class', ('endpoint', 'code_class'))
+        self.errors = Counter('apifuzzer_request_errors', 'Requests failed without a response', ('endpoint',))
+        self.retries = Counter('apifuzzer_request_retries', 'Requests sent again after an error', ('endpoint',))
+        self.tests = Counter('apifuzzer_tests', 'Completed tests by status', ('status',))
+        self.phases = Histogram('apifuzzer_request_phase_seconds', 'Duration of dns, connect and tls, time to the '
+                                'first byte and total time of the requests', ('endpoint', 'phase'))
+        self.report_writes = Histogram('apifuzzer_report_write_seconds', 'Time of saving a report')
+        self._server = None
+        if port is not None:
+            self._server = ThreadingHTTPServer((host, port), _metrics_handler(self))
+            self._server.daemon_threads = True
+            thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+            thread.start()
+            self.logger.info('Metrics are served on http://%s:%d/metrics', host, self._server.server_port)
+
+    def request_completed(self, endpoint, _curl, status_code):
+        """
+        :param endpoint: template name of the request
+        :param _curl: handle which performed the request
+        :type _curl: pycurl.Curl
+        :param status_code: HTTP status code of the response
+        """
+        self.requests.inc((endpoint,))
+        self.responses.inc((endpoint, '{}xx'.format(status_code // 100) if status_code else 'none'))
+        dns = _curl.getinfo(pycurl.NAMELOOKUP_TIME)
+        connect = _curl.getinfo(pycurl.CONNECT_TIME)
+        tls = _curl.getinfo(pycurl.APPCONNECT_TIME)
+        # dns, connect and tls are the durations of the phases, ttfb and total are measured from the start, a reused
+        # connection has no connect and tls phase
+        self.phases.observe(dns, (endpoint, 'dns'))
+        if connect:
+            self.phases.observe(max(0.0, connect - dns), (endpoint, 'connect'))
+        if tls:
+            self.phases.observe(max(0.0, tls - connect), (endpoint, 'tls'))
+        self.phases.observe(_curl.getinfo(pycurl.STARTTRANSFER_TIME), (endpoint, 'ttfb'))
+        self.phases.observe(_curl.getinfo(pycurl.TOTAL_TIME), (endpoint, 'total'))
+
+    def request_failed(self, endpoint):
+        self.requests.inc((endpoint,))
+        self.errors.inc((endpoint,))
+
+    def request_retried(self, endpoint):
+        self.retries.inc((endpoint,))
+
+    def report_written(self, seconds):
+        self.report_writes.observe(seconds)
+
+    def test_completed(self, status):
+        """
+        Counts the test and rewrites the metrics file if it is due
+        :param status: status of the test report
+        """
+        self.tests.inc((status,))
+        if self.path and (self._written is None or monotonic() - self._written >= self.interval):
+            self.write()
+
+    def render(self):
+        """
+        :return: the metrics in the OpenMetrics text format
+        :rtype: str
+        """
+        lines = list()
+        for metric in self.requests, self.responses, self.errors, self.retries, self.tests:
+            lines.extend(metric.render())
+        elapsed = monotonic() - self._started
+        requests = sum(list(self.requests._values.values()))
+        lines.append('# TYPE apifuzzer_requests_per_second gauge')
+        lines.append('# HELP apifuzzer_requests_per_second Average request rate since the start')
+        lines.append('apifuzzer_requests_per_second {}'.format(round(requests / elapsed, 3) if elapsed else 0))
+        for metric in self.phases, self.report_writes:
+            lines.extend(metric.render())
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        """
+        Rewrites the metrics file, a reader never sees a partly written file
+        """
+        self._written = monotonic()
+        tmp_path = '{}.tmp'.format(self.path)
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(self.render())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.error('Failed to write the metrics to %s: %s', self.path, e)
+
+    def close(self):
+        if self.path:
+            self.write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _metrics_handler(metrics):
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+class NullMetrics(object):
+    """
+    Drops every metric, the target doesn't collect them at all
+    """
+    enabled = False
+
+    def request_completed(self, endpoint, _curl, status_code):
+        pass
+
+    def request_failed(self, endpoint):
+        pass
+
+    def request_retried(self, endpoint):
+        pass
+
+    def report_written(self, seconds):
+        pass
+
+    def test_completed(self, status):
+        pass
+
+    def close(self):
+        pass
+
+
+def get_metrics(port=None, path=None, interval=5.0):
+    """
+    :param port: port of the HTTP endpoint of the metrics
+    :param path: metrics file
+    :param interval: minimum time between two rewrites of the metrics file (seconds)
+    :rtype: FuzzerMetrics or NullMetrics
+    """
+    if port is not None or path:
+        return FuzzerMetrics(port=port, path=path, interval=interval)
+    return NullMetrics()
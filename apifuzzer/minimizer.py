@@ -0,0 +1,304 @@
+"""
+Minimization of a failing test. The request of a failure report is shrunk by delta debugging while its response keeps
+the failure signature of the report: first the query parameters, headers and body fields which don't matter are
+dropped, then the remaining path segments and values are shrunk one by one. The candidates of a round are sent
+concurrently and the outcome of every candidate is remembered, so no request is sent twice.
+"""
+import json
+import os
+
+from apifuzzer.concurrent_transmitter import ConcurrentTransmitter
+from apifuzzer.failure_buckets import failure_signature
+from apifuzzer.replay import URL_ORIGIN, ReportReplayer, decode_field
+from apifuzzer.report_sink import iter_reports
+from apifuzzer.utils import set_class_logger
+
+# the headers of every request, they are not fuzzed
+STATIC_HEADERS = ('user-agent', 'accept', 'accept-encoding', 'connection', 'content-type', 'content-length')
+DEFAULT_MAX_REQUESTS = 2000
+# the keys of a report which are replaced by the outcome of the minimized request
+OUTCOME_KEYS = ('parsed_status_code', 'response', 'response_headers', 'response_time', 'response_truncated',
+                'response_length', 'request_error')
+
+
+def load_report(path, test_number=None):
+    """
+    :param path: report file, or report directory of the report files or ndjson sinks
+    :param test_number: test number of the report in a report directory, the first report if not set
+    :type test_number: int
+    :rtype: dict
+    """
+    if not os.path.isdir(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.loads(f.read())
+    for report in iter_reports(path):
+        if test_number is None or report.get('test_number') == test_number:
+            return report
+    raise ValueError('No report of test {} in {}'.format(test_number, path))
+
+
+def _chunks(items, n):
+    size, rest = divmod(len(items), n)
+    start = 0
+    for position in range(n):
+        end = start + size + (1 if position < rest else 0)
+        yield start, end
+        start = end
+
+
+def ddmin(items, still_fails):
+    """
+    Delta debugging of a sequence, the subsets and complements of a round are tested together
+    :param items: sequence which fails
+    :type items: list or str
+    :param still_fails: tells of every candidate whether it still fails
+    :type still_fails: function of a list of candidates returning a list of bool
+    :return: a 1-minimal failing subsequence
+    """
+    if items and still_fails([items[:0]])[0]:
+        return items[:0]
+    n = 2
+    while len(items) >= 2:
+        n = min(n, len(items))
+        chunks = list(_chunks(items, n))
+        subsets = [items[start:end] for start, end in chunks]
+        complements = [items[:start] + items[end:] for start, end in chunks] if n > 2 else list()
+        results = still_fails(subsets + complements)
+        failing = [position for position, fails in enumerate(results) if fails]
+        if failing and failing[0] < n:
+            items, n = subsets[failing[0]], 2
+        elif failing:
+            items, n = complements[failing[0] - n], max(n - 1, 2)
+        elif n == len(items):
+            break
+        else:
+            n = min(len(items), 2 * n)
+    return items
+
+
+class _Candidate(object):
+    """
+    Request of a test split to the parts the minimizer shrinks
+    """
+
+    def __init__(self, origin, segments, query, params, headers, data):
+        self.origin = origin
+        self.segments = tuple(segments)
+        self.query = query
+        self.params = tuple(params)
+        self.headers = tuple(headers)
+        self.data = tuple(data)
+
+    @classmethod
+    def from_report(cls, report):
+        url = report['request_url']
+        origin = URL_ORIGIN.match(url)
+        origin = origin.group(0) if origin else ''
+        path, query, query_string = url[len(origin):].partition('?')
+        params = [(pair.partition('=')[0], pair.partition('=')[2]) for pair in query_string.split('&') if pair]
+        headers = decode_field(report.get('request_headers'))
+        headers = headers.items() if isinstance(headers, dict) else ()
+        data = report.get('request_body')
+        data = data.items() if isinstance(data, dict) else ()
+        return cls(origin, path.split('/'), query, params, headers, data)
+
+    def key(self):
+        return self.segments, self.params, self.headers, self.data
+
+    def url(self):
+        params = '&'.join('{}={}'.format(name, value) for name, value in self.params)
+        return '{}{}{}{}'.format(self.origin, '/'.join(self.segments), self.query if params else '', params)
+
+    def size(self):
+        """
+        :return: number of characters of the path, the parameters, the fuzzed headers and the body fields
+        :rtype: int
+        """
+        headers = [(name, value) for name, value in self.headers if name.lower() not in STATIC_HEADERS]
+        return sum(len(segment) for segment in self.segments) + \
+            sum(len(name) + len(str(value)) for part in (self.params, headers, self.data) for name, value in part)
+
+    def removable(self):
+        """
+        :return: the parameters, fuzzed headers and body fields as (part, name) pairs
+        :rtype: list of tuple
+        """
+        items = [('params', name) for name, _ in self.params]
+        items.extend(('headers', name) for name, _ in self.headers if name.lower() not in STATIC_HEADERS)
+        items.extend(('data', name) for name, _ in self.data)
+        return items
+
+    def keep(self, removable, kept):
+        """
+        :return: the candidate without the removable items which are not kept
+        :rtype: _Candidate
+        """
+        dropped = set(removable) - set(kept)
+        parts = dict()
+        for part in 'params', 'headers', 'data':
+            parts[part] = [(name, value) for name, value in getattr(self, part) if (part, name) not in dropped]
+        return _Candidate(self.origin, self.segments, self.query, parts['params'], parts['headers'], parts['data'])
+
+    def replace(self, part, position, value):
+        """
+        :param part: segments, params, headers or data
+        :param position: position of the value in the part
+        :param value: new value
+        :rtype: _Candidate
+        """
+        parts = {name: list(getattr(self, name)) for name in ('segments', 'params', 'headers', 'data')}
+        if part == 'segments':
+            parts[part][position] = value
+        else:
+            parts[part][position] = (parts[part][position][0], value)
+        return _Candidate(self.origin, parts['segments'], self.query, parts['params'], parts['headers'], parts['data'])
+
+    def values(self):
+        """
+        :return: position and value of every shrinkable value by part
+        :rtype: list of tuple
+        """
+        values = [('segments', position, segment) for position, segment in enumerate(self.segments)]
+        for part in 'params', 'headers', 'data':
+            for position, (name, value) in enumerate(getattr(self, part)):
+                if isinstance(value, str) and not (part == 'headers' and name.lower() in STATIC_HEADERS):
+                    values.append((part, position, value))
+        return values
+
+
+@set_class_logger
+class ReportMinimizer(object):
+    """
+    Shrinks the request of a failure report to a minimal request with the same failure signature
+    """
+
+    def __init__(self, target, report, url=None, concurrency=1, max_requests=DEFAULT_MAX_REQUESTS):
+        """
+        :param target: target which sends the requests
+        :type target: apifuzzer.fuzzer_target.FuzzerTarget
+        :param report: failure report of the test
+        :type report: dict
+        :param url: base url of the requests, the url of the report if not set
+        :param concurrency: number of candidates sent at once
+        :type concurrency: int
+        :param max_requests: the minimization stops after this many requests, the smallest failing request is kept
+        :type max_requests: int
+        """
+        self.target = target
+        self.report = report
+        self.concurrency = concurrency
+        self.max_requests = max_requests
+        self.replayer = ReportReplayer(target, None, url=url)
+        self.signature = None
+        self.requests = 0
+        self.cache_hits = 0
+        self._outcomes = dict()
+        self._transmitter = None
+
+    def _request(self, candidate):
+        return self.replayer.build_request({
+            'request_url': candidate.url(),
+            'request_method': self.report['request_method'],
+            'request_headers': dict(candidate.headers),
+            'request_body': dict(candidate.data),
+        })
+
+    def _outcome(self, in_flight):
+        outcome = {'request_method': self.report['request_method']}
+        if in_flight.error is not None:
+            outcome['request_error'] = str(in_flight.error)
+            return outcome
+        response = in_flight.response
+        outcome['parsed_status_code'] = response.status_code
+        outcome['response_headers'] = dict(response.headers)
+        try:
+            outcome['response'] = self.target.decode_content(response)
+        except UnicodeDecodeError:
+            outcome['response'] = response.content.decode('utf-8', errors='replace')
+        return outcome
+
+    def send(self, candidates):
+        """
+        Sends the candidates which were not sent yet, at most concurrency of them at once
+        :param candidates: candidate requests
+        :type candidates: list of _Candidate
+        :return: outcome of every candidate, None if the request budget was used up before it
+        :rtype: list of dict
+        """
+        self._transmitter.run(self._requests(candidates), self._complete)
+        return [self._outcomes.get(candidate.key()) for candidate in candidates]
+
+    def _requests(self, candidates):
+        for candidate in candidates:
+            key = candidate.key()
+            if key in self._outcomes:
+                self.cache_hits += 1
+                continue
+            if self.requests >= self.max_requests:
+                continue
+            self.requests += 1
+            self._outcomes[key] = None
+            yield self._request(candidate), key
+
+    def _complete(self, completed):
+        for in_flight in completed:
+            self._outcomes[in_flight.context] = self._outcome(in_flight)
+
+    def still_fails(self, candidates):
+        """
+        :return: whether the failure signature of every candidate is the one of the test
+        :rtype: list of bool
+        """
+        return [outcome is not None and failure_signature(outcome) == self.signature
+                for outcome in self.send(candidates)]
+
+    def run(self):
+        """
+        :return: report of the minimal failing request, None if the failure doesn't reproduce
+        :rtype: dict
+        """
+        candidate = _Candidate.from_report(self.report)
+        original_size = candidate.size()
+        self._transmitter = ConcurrentTransmitter(self.target, self.concurrency)
+        try:
+            outcome = self.send([candidate])[0]
+            if outcome.get('parsed_status_code') in self.target.accepted_status_codes:
+                self.logger.warning('The failure of test %s doesn\'t reproduce, status code: %s',
+                                    self.report.get('test_number'), outcome.get('parsed_status_code'))
+                return None
+            self.signature = failure_signature(outcome)
+            removable = candidate.removable()
+            kept = ddmin(removable, lambda subsets: self.still_fails([candidate.keep(removable, subset)
+                                                                     for subset in subsets]))
+            candidate = candidate.keep(removable, kept)
+            for part, position, value in candidate.values():
+                current = candidate
+                value = ddmin(value, lambda values: self.still_fails([current.replace(part, position, v)
+                                                                     for v in values]))
+                candidate = candidate.replace(part, position, value)
+        finally:
+            self._transmitter.close()
+        if self.requests >= self.max_requests:
+            self.logger.warning('The minimization stopped after %d requests', self.requests)
+        return self.reproducer(candidate, original_size)
+
+    def reproducer(self, candidate, original_size):
+        """
+        :return: the report of the test with the minimized request and its outcome
+        :rtype: dict
+        """
+        request = self._request(candidate)
+        reproducer = {key: value for key, value in self.report.items() if key not in OUTCOME_KEYS}
+        reproducer.update(self._outcomes[candidate.key()])
+        reproducer['request_url'] = request.url
+        reproducer['request_headers'] = json.dumps(request.headers)
+        reproducer['request_body'] = dict(candidate.data)
+        reproducer['minimization'] = {
+            'requests': self.requests,
+            'cached': self.cache_hits,
+            'original_size': original_size,
+            'minimized_size': candidate.size(),
+        }
+        self.logger.info('Test %s is minimized from %d to %d characters with %d requests',
+                         self.report.get('test_number'), original_size, candidate.size(), self.requests)
+        return reproducer
@@ -0,0 +1,210 @@
+"""
+Random access to the mutations of a kitty model. kitty reaches test N by stepping the model, template by template and
+field by field, from its current test. The index maps N to its template, the containers around the field and the
+mutation of the field from the offsets computed once at the start, then sets the state of only these, so the cost of a
+seek doesn't depend on N or on the size of the templates.
+
+A mutation of a RandomBitsField is generated from its seed and its mutation index, the tests before it don't change
+it, so a test is rendered the same way however it is reached.
+
+The models are IndexedGraphModels, so the skips of kitty, e.g. to the first test of the test list at the start, seek
+too.
+"""
+import bisect
+
+from kitty.model import Container, GraphModel
+from kitty.model.low_level.field import BaseField
+
+
+class MutationAddress(object):
+    """
+    Location of a mutation index in the model
+    """
+
+    def __init__(self, index, template_position, template, path, field, mutation):
+        """
+        :param index: mutation index in the model
+        :param template_position: position of the template in the model
+        :param template: the mutated template
+        :type template: kitty.model.Template
+        :param path: container, position of the next container or of the field in it and the first mutation index of
+            the container, from the template to the field
+        :type path: tuple of tuple
+        :param field: the mutated field, None if the template has mutations of its own and is mutated as a whole
+        :param mutation: mutation index of the field, of the template if the field is None
+        """
+        self.index = index
+        self.template_position = template_position
+        self.template = template
+        self.path = path
+        self.field = field
+        self.mutation = mutation
+
+    @property
+    def seed(self):
+        """
+        :return: seed the mutation is generated from, None if the field isn't random
+        :rtype: int
+        """
+        seed = getattr(self.field, '_seed', None)
+        if seed is None:
+            return None
+        return (seed << 32) | self.mutation
+
+
+def _leaves(container, start, path):
+    """
+    :param start: first mutation index of the container
+    :return: generator of the path, the field and the first mutation index of the fields with mutations
+    """
+    field_start = start
+    for position, field in enumerate(container._fields):
+        field_path = path + ((container, position, start),)
+        if isinstance(field, Container):
+            for leaf in _leaves(field, field_start, field_path):
+                yield leaf
+        elif field.num_mutations():
+            yield field_path, field, field_start
+        field_start += field.num_mutations()
+
+
+class MutationIndex(object):
+    """
+    Maps the mutation indices of a model to its fields and moves the model to any of them
+    """
+
+    def __init__(self, model):
+        """
+        :param model: compiled kitty model
+        :type model: kitty.model.GraphModel
+        """
+        self.model = model
+        self.num_mutations = model.num_mutations()
+        # the templates by position and the first and last + 1 mutation index of each
+        self.templates = list()
+        self.template_ranges = list()
+        # one entry per field with mutations, ordered by their first mutation index
+        self._starts = list()
+        self._templates = list()
+        self._paths = list()
+        self._fields = list()
+        start = 0
+        for position, sequence in enumerate(model._sequences):
+            template = sequence[-1].dst
+            self.templates.append(template)
+            self.template_ranges.append((start, start + template.num_mutations()))
+            leaves = list(_leaves(template, start, ()))
+            if sum(field.num_mutations() for _, field, _ in leaves) != template.num_mutations():
+                # a container with mutations of its own, the template is skipped in as a whole
+                leaves = [((), None, start)] if template.num_mutations() else []
+            for path, field, field_start in leaves:
+                self._starts.append(field_start)
+                self._templates.append(position)
+                self._paths.append(path)
+                self._fields.append(field)
+            start += template.num_mutations()
+
+    def fields(self):
+        """
+        :return: generator of the first and last + 1 mutation index, the template position and the field of the fields
+            with mutations, in the order of their indices. The field is the template if it is mutated as a whole.
+        """
+        for start, position, field in zip(self._starts, self._templates, self._fields):
+            if field is None:
+                field = self.templates[position]
+            yield start, start + field.num_mutations(), position, field
+
+    def locate(self, index):
+        """
+        :param index: mutation index
+        :rtype: MutationAddress
+        """
+        if not 0 <= index < self.num_mutations:
+            raise ValueError('Mutation index {} is out of the model of {} mutations'.format(index,
+                                                                                        self.num_mutations))
+        entry = bisect.bisect_right(self._starts, index) - 1
+        position = self._templates[entry]
+        return MutationAddress(index, position, self.templates[position], self._paths[entry],
+                               self._fields[entry], index - self._starts[entry])
+
+    def seek(self, index):
+        """
+        Moves the model, so its next mutation is the given index, backwards too
+        :param index: mutation index of the next test
+        """
+        address = self.locate(index)
+        model = self.model
+        current_index = model.current_index()
+        if model._current_node is not None and 0 <= current_index < self.num_mutations:
+            self._reset(self.locate(current_index))
+        model._update_state(address.template_position)
+        template = model._get_node()
+        template._initialize()
+        if address.field is None:
+            template.reset()
+            template.skip(address.mutation)
+        else:
+            for container, position, start in address.path:
+                container._field_idx = position
+                container._current_index = index - start - 1
+            address.field._current_index = address.mutation - 1
+        model._current_index = index - 1
+
+    def apply(self, index):
+        """
+        Moves the model to the given index and mutates it
+        :param index: mutation index
+        :return: the template of the index with the mutation applied
+        :rtype: kitty.model.Template
+        """
+        self.seek(index)
+        self.model.mutate()
+        return self.model._get_node()
+
+    @staticmethod
+    def _reset(address):
+        """
+        Resets the fields mutated by the test of the address, only the fields on its path are mutated
+        """
+        if address.field is None:
+            address.template.reset()
+            return
+        for container, _, _ in address.path:
+            BaseField.reset(container)
+            container._field_idx = 0
+        address.field.reset()
+
+
+class IndexedGraphModel(GraphModel):
+    """
+    GraphModel which moves to a test with a seek of its mutation index. kitty skips to the first test of the test list
+    and between its tests with GraphModel.skip, which steps through every test in between.
+    """
+
+    _mutation_index = None
+
+    @property
+    def mutation_index(self):
+        """
+        :rtype: MutationIndex
+        """
+        if self._mutation_index is None:
+            self._mutation_index = MutationIndex(self)
+        return self._mutation_index
+
+    def seek(self, index):
+        """
+        Moves the model, so its next mutation is the given index, backwards too
+        :param index: mutation index of the next test
+        """
+        self.mutation_index.seek(index)
+
+    def skip(self, count):
+        self._get_ready()
+        if count <= 0:
+            return 0
+        index = self.current_index() + count + 1
+        if index >= self.num_mutations():
+            return super(IndexedGraphModel, self).skip(count)
+        self.seek(index)
+        return count
@@ -0,0 +1,233 @@
+"""
+Feedback driven order of the tests. The mutation space of a kitty model is split into arms, the mutations of a field
+of a template, and the tests are scheduled in small batches to the arms whose responses were new recently: a new
+status code of the template, a response body not seen before or a latency outlier. Endpoints and fields which return
+the same response over and over get less of the run.
+"""
+import bisect
+from collections import deque
+from math import log, sqrt
+
+from apifuzzer.checkpoint import parse_test_list
+from apifuzzer.failure_buckets import normalize_body
+from apifuzzer.utils import set_class_logger
+
+# a latency is an outlier above mean + LATENCY_OUTLIER_SIGMA * standard deviation of its template
+LATENCY_OUTLIER_SIGMA = 3.0
+LATENCY_MIN_SAMPLES = 10
+
+
+class MutationSpace(object):
+    """
+    Maps the mutation indices of a model to its templates and fields. The containers mutate their fields one after
+    the other, so the mutations of a field are a contiguous range of indices.
+    """
+
+    def __init__(self, model):
+        """
+        :param model: compiled kitty model
+        :type model: apifuzzer.mutation_index.IndexedGraphModel
+        """
+        index = model.mutation_index
+        self.num_mutations = index.num_mutations
+        self.template_names = [template.get_name() for template in index.templates]
+        # arms: the mutations of a field, ordered by their start
+        self.arm_starts = list()
+        self.arm_ends = list()
+        self.arm_templates = list()
+        self.arm_names = list()
+        for start, end, position, field in index.fields():
+            self.arm_starts.append(start)
+            self.arm_ends.append(end)
+            self.arm_templates.append(position)
+            self.arm_names.append(field.get_name())
+
+    def arm(self, index):
+        """
+        :param index: mutation index
+        :return: the arm of the index, None if it is out of the model
+        :rtype: int
+        """
+        position = bisect.bisect_right(self.arm_starts, index) - 1
+        if position < 0 or index >= self.arm_ends[position]:
+            return None
+        return position
+
+    def arms_of_template(self, template):
+        """
+        :param template: position of the template in the model
+        :return: the arms of the template
+        :rtype: range
+        """
+        first = bisect.bisect_left(self.arm_templates, template)
+        return range(first, bisect.bisect_right(self.arm_templates, template))
+
+
+class _Stats(object):
+
+    def __init__(self):
+        self.scheduled = 0
+        self.observed = 0
+        self.reward = 0.0
+
+    def mean(self, default):
+        return self.reward / self.observed if self.observed else default
+
+
+@set_class_logger
+class NoveltyScheduler(object):
+    """
+    Upper confidence bound selection of a template, then of a field of the template, by the novelty of their
+    responses. Every template and field is tried once before the others are repeated. The order only depends on the
+    responses, it is deterministic for a deterministic target.
+    """
+
+    def __init__(self, space, test_list_str=None, batch=4, exploration=0.5):
+        """
+        :param space: mutation space of the model
+        :type space: MutationSpace
+        :param test_list_str: kitty test list, the tests are scheduled from it, every test by default
+        :param batch: number of tests of an arm scheduled at once
+        :type batch: int
+        :param exploration: weight of the confidence bound, higher tries the rarely scheduled arms more
+        :type exploration: float
+        """
+        self.space = space
+        self.batch = batch
+        self.exploration = exploration
+        ranges = [(start, space.num_mutations if end is None else min(end + 1, space.num_mutations))
+                  for start, end in parse_test_list(test_list_str)]
+        self._remaining = dict()
+        for arm, (arm_start, arm_end) in enumerate(zip(space.arm_starts, space.arm_ends)):
+            arm_ranges = deque((max(start, arm_start), min(end, arm_end)) for start, end in ranges
+                               if start < arm_end and end > arm_start)
+            if arm_ranges:
+                self._remaining[arm] = arm_ranges
+        self._arm_stats = [_Stats() for _ in space.arm_starts]
+        self._template_stats = [_Stats() for _ in space.template_names]
+        self._arms_left = dict()
+        for arm in self._remaining:
+            template = space.arm_templates[arm]
+            self._arms_left[template] = self._arms_left.get(template, 0) + 1
+        self._active_templates = sorted(self._arms_left)
+        self._queue = deque()
+        self._template_statuses = dict()
+        self._latency = dict()
+        self._signatures = set()
+        self.scheduled = 0
+        self.outliers = 0
+
+    def next_test(self):
+        """
+        :return: index of the next test, None if every test of the test list was scheduled
+        :rtype: int
+        """
+        if not self._queue:
+            self._schedule_batch()
+        if not self._queue:
+            return None
+        self.scheduled += 1
+        return self._queue.popleft()
+
+    def exhausted(self):
+        """
+        :return: True if every test of the test list was scheduled
+        :rtype: bool
+        """
+        return not self._queue and not self._remaining
+
+    def _bound(self, stats, total):
+        if not stats.scheduled:
+            return float('inf')
+        return self.exploration * sqrt(log(total + 1) / stats.scheduled)
+
+    def _schedule_batch(self):
+        best_template, best_score = None, None
+        for template in self._active_templates:
+            stats = self._template_stats[template]
+            score = stats.mean(1.0) + self._bound(stats, self.scheduled)
+            if best_score is None or score > best_score:
+                best_template, best_score = template, score
+        if best_template is None:
+            return
+        template_stats = self._template_stats[best_template]
+        best_arm, best_score = None, None
+        for arm in self.space.arms_of_template(best_template):
+            if arm not in self._remaining:
+                continue
+            stats = self._arm_stats[arm]
+            score = stats.mean(template_stats.mean(1.0)) + self._bound(stats, template_stats.scheduled)
+            if best_score is None or score > best_score:
+                best_arm, best_score = arm, score
+        arm_ranges = self._remaining[best_arm]
+        while len(self._queue) < self.batch and arm_ranges:
+            start, end = arm_ranges[0]
+            self._queue.append(start)
+            if start + 1 < end:
+                arm_ranges[0] = (start + 1, end)
+            else:
+                arm_ranges.popleft()
+        if not arm_ranges:
+            del self._remaining[best_arm]
+            self._arms_left[best_template] -= 1
+            if not self._arms_left[best_template]:
+                self._active_templates.remove(best_template)
+        self._arm_stats[best_arm].scheduled += len(self._queue)
+        template_stats.scheduled += len(self._queue)
+
+    def observe(self, index, report):
+        """
+        Rewards the arm of a completed test by the novelty of its response
+        :param index: mutation index of the test
+        :param report: report of the test
+        :type report: apifuzzer.apifuzzer_report.Apifuzzer_Report
+        """
+        arm = self.space.arm(index)
+        if arm is None:
+            return
+        template = self.space.arm_templates[arm]
+        reward = 0
+        status = report.get('parsed_status_code')
+        if status is None and report.get('request_error'):
+            status = 'error'
+        statuses = self._template_statuses.setdefault(template, set())
+        if status not in statuses:
+            statuses.add(status)
+            reward += 1
+        signature = (status, normalize_body(report.get('response') or report.get('request_error')))
+        if signature not in self._signatures:
+            self._signatures.add(signature)
+            reward += 1
+        if self._is_latency_outlier(template, report.get('response_time')):
+            self.outliers += 1
+            reward += 1
+        for stats in (self._arm_stats[arm], self._template_stats[template]):
+            stats.observed += 1
+            stats.reward += reward
+
+    def _is_latency_outlier(self, template, latency):
+        if latency is None:
+            return False
+        # running mean and variance of the template (Welford)
+        count, mean, m2 = self._latency.get(template, (0, 0.0, 0.0))
+        outlier = count >= LATENCY_MIN_SAMPLES and latency > mean + LATENCY_OUTLIER_SIGMA * sqrt(m2 / count)
+        count += 1
+        delta = latency - mean
+        mean += delta / count
+        m2 += delta * (latency - mean)
+        self._latency[template] = (count, mean, m2)
+        return outlier
+
+    def summary(self):
+        """
+        :return: number of scheduled tests, distinct responses, latency outliers and the most rewarding templates
+        :rtype: dict
+        """
+        templates = sorted(((stats.mean(0.0), self.space.template_names[template])
+                            for template, stats in enumerate(self._template_stats) if stats.observed), reverse=True)
+        return {
+            'scheduled': self.scheduled,
+            'distinct_responses': len(self._signatures),
+            'latency_outliers': self.outliers,
+            'top_templates': [name for _, name in templates[:10]],
+        }
@@ -0,0 +1,183 @@
+from time import monotonic, sleep
+
+import pycurl
+
+from apifuzzer.utils import set_class_logger
+
+# 500 is what the fuzzer hunts for, it tells nothing about the load of the target
+OVERLOAD_STATUS_CODES = frozenset([429, 502, 503, 504])
+
+
+class TokenBucket(object):
+    """
+    Limits the request rate, at most `burst` requests can be sent at once after an idle period
+    """
+
+    def __init__(self, rate, burst=None, clock=monotonic):
+        """
+        :param rate: number of tokens added per second
+        :type rate: float
+        :param burst: capacity of the bucket, a tenth of a second worth of tokens by default
+        :type burst: float
+        :param clock: monotonic clock in seconds
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst) if burst else max(1.0, self.rate / 10)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def reserve(self):
+        """
+        Takes a token if there is one
+        :return: 0 if a token was taken, otherwise the time until the next token is available (seconds)
+        :rtype: float
+        """
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+
+@set_class_logger
+class AimdConcurrencyController(object):
+    """
+    Additive increase, multiplicative decrease of the number of requests in flight. The requests are evaluated in
+    windows of max(min_window, concurrency) requests: a window with too many timeouts/overload responses or too high
+    latency halves the concurrency, a healthy one increases it by one.
+    """
+
+    def __init__(self, max_concurrency, min_concurrency=1, min_window=10, error_threshold=0.1, latency_target=None,
+                 latency_factor=2.0, decrease_factor=0.5):
+        """
+        :param max_concurrency: upper limit of the concurrency
+        :param min_concurrency: lower limit and starting value of the concurrency
+        :param min_window: minimum number of requests evaluated at once
+        :param error_threshold: maximum ratio of timeouts and overload responses in a healthy window
+        :type error_threshold: float
+        :param latency_target: maximum mean total time of a healthy window (seconds), if not set it is
+                               latency_factor times the lowest mean total time seen in a healthy window
+        :type latency_target: float
+        :param latency_factor: allowed slowdown compared to the lowest latency seen
+        :param decrease_factor: the concurrency is multiplied by this at overload
+        """
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.min_window = min_window
+        self.error_threshold = error_threshold
+        self.latency_target = latency_target
+        self.latency_factor = latency_factor
+        self.decrease_factor = decrease_factor
+        self.concurrency = min_concurrency
+        self.baseline_latency = None
+        self._reset_window()
+
+    def _reset_window(self):
+        self._samples = 0
+        self._errors = 0
+        self._total_time = 0.0
+        self._connect_time = 0.0
+
+    def record(self, total_time, connect_time, overloaded):
+        """
+        :param total_time: duration of the request (seconds)
+        :param connect_time: time until the connection was established (seconds)
+        :param overloaded: the request timed out, failed or got an overload response
+        :type overloaded: bool
+        """
+        self._samples += 1
+        self._errors += int(overloaded)
+        self._total_time += total_time
+        self._connect_time += connect_time
+        if self._samples >= max(self.min_window, self.concurrency):
+            self._evaluate()
+
+    def _evaluate(self):
+        error_ratio = float(self._errors) / self._samples
+        mean_total_time = self._total_time / self._samples
+        mean_connect_time = self._connect_time / self._samples
+        latency_limit = self.latency_target
+        if latency_limit is None and self.baseline_latency is not None:
+            latency_limit = self.baseline_latency * self.latency_factor
+        previous = self.concurrency
+        if error_ratio > self.error_threshold:
+            reason = 'overload ratio above {}'.format(self.error_threshold)
+            self.concurrency = max(self.min_concurrency, int(self.concurrency * self.decrease_factor))
+        elif latency_limit is not None and mean_total_time > latency_limit:
+            reason = 'latency above {:.3f}s'.format(latency_limit)
+            self.concurrency = max(self.min_concurrency, int(self.concurrency * self.decrease_factor))
+        else:
+            reason = 'healthy'
+            if self.baseline_latency is None or mean_total_time < self.baseline_latency:
+                self.baseline_latency = mean_total_time
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+        log = self.logger.info if previous != self.concurrency else self.logger.debug
+        log('Concurrency %d -> %d, %s (window of %d requests: overload ratio %.2f, mean total time %.3fs, '
+            'mean connect time %.3fs)', previous, self.concurrency, reason, self._samples, error_ratio,
+            mean_total_time, mean_connect_time)
+        self._reset_window()
+
+
+class RateController(object):
+    """
+    Decides when the next request can be sent and how many can be in flight. Without max_rps and adaptive mode it
+    lets everything through with the configured concurrency.
+    """
+
+    def __init__(self, max_concurrency=1, max_rps=None, adaptive=False, latency_target=None):
+        """
+        :param max_concurrency: number of requests in flight, the upper limit in adaptive mode
+        :param max_rps: maximum number of requests per second, unlimited if not set
+        :type max_rps: float
+        :param adaptive: adjust the concurrency to the latency and overload rate of the target
+        :type adaptive: bool
+        :param latency_target: maximum mean total time of the requests in adaptive mode (seconds)
+        """
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(max_rps) if max_rps else None
+        self.aimd = AimdConcurrencyController(max_concurrency, latency_target=latency_target) if adaptive else None
+
+    def concurrency_limit(self, concurrency):
+        """
+        :param concurrency: configured number of requests in flight
+        :return: number of requests which can be in flight now
+        :rtype: int
+        """
+        if self.aimd is not None:
+            return min(concurrency, self.aimd.concurrency)
+        return concurrency
+
+    def reserve(self):
+        """
+        :return: 0 if the request can be sent now, otherwise the time to wait before asking again (seconds)
+        :rtype: float
+        """
+        if self.bucket is None:
+            return 0
+        return self.bucket.reserve()
+
+    def acquire(self):
+        """
+        Blocks until the request can be sent
+        """
+        while True:
+            wait = self.reserve()
+            if not wait:
+                return
+            sleep(wait)
+
+    def record_transfer(self, _curl, failed=False):
+        """
+        Feeds the timings and the outcome of a finished transfer to the concurrency controller
+        :param _curl: handle which performed the request
+        :type _curl: pycurl.Curl
+        :param failed: the transfer failed, e.g. timed out
+        :type failed: bool
+        """
+        if self.aimd is None:
+            return
+        overloaded = failed or _curl.getinfo(pycurl.RESPONSE_CODE) in OVERLOAD_STATUS_CODES
+        self.aimd.record(_curl.getinfo(pycurl.TOTAL_TIME), _curl.getinfo(pycurl.CONNECT_TIME), overloaded)
@@ -0,0 +1,211 @@
+"""
+Replay of the saved failure reports to verify the fixes of the API. The requests of the reports are sent again, many
+of them at once, and the new outcome of every request is compared to the saved one: a request is fixed if its response
+is accepted now, still failing if it fails the same way and changed if it fails in an other way.
+"""
+import json
+import re
+from base64 import b64decode
+from binascii import Error
+
+from apifuzzer.body_encoders import JSON, MULTIPART, FormEncoder, JsonEncoder, MultipartEncoder
+from apifuzzer.concurrent_transmitter import ConcurrentTransmitter
+from apifuzzer.fuzzer_target import Return
+from apifuzzer.report_sink import iter_reports
+from apifuzzer.utils import set_class_logger
+
+FIXED = 'fixed'
+STILL_FAILING = 'still_failing'
+CHANGED = 'changed'
+SKIPPED = 'skipped'
+# the test numbers of the failing requests listed in the summary
+MAX_LISTED_TESTS = 100
+URL_ORIGIN = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*://[^/?#]*')
+BOUNDARY = re.compile(r'boundary="?([^";]+)"?')
+
+
+def decode_field(value):
+    """
+    :param value: JSON value of a report, the headers are JSON encoded, possibly base64 encoded too
+    :return: the decoded value, the value itself if it isn't encoded
+    """
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    try:
+        return decode_field(b64decode(value, validate=True).decode())
+    except (Error, ValueError):
+        return value
+
+
+def rebase_url(request_url, url=None):
+    """
+    :param request_url: url of a saved request
+    :param url: the scheme, host and port of the saved url are replaced by this url, its path is prefixed to the
+        saved path
+    :rtype: str
+    """
+    if not url:
+        return request_url
+    return URL_ORIGIN.sub(lambda _: url.rstrip('/'), request_url, count=1)
+
+
+def request_outcome(report):
+    """
+    :param report: saved report or the outcome of a replayed request
+    :return: status code of the response, 'error' if the request failed without a response
+    """
+    if report.get('request_error'):
+        return 'error'
+    return report.get('parsed_status_code')
+
+
+@set_class_logger
+class ReportReplayer(object):
+    """
+    Sends the requests of the saved reports again and compares the outcomes, the reports are streamed, so the memory
+    doesn't depend on their number
+    """
+
+    def __init__(self, target, report_dir, url=None, concurrency=1):
+        """
+        :param target: target which sends the requests, its accepted status codes decide whether a request is fixed
+        :type target: apifuzzer.fuzzer_target.FuzzerTarget
+        :param report_dir: directory of the saved reports, report files or ndjson sinks
+        :param url: base url of the replayed requests, the saved url if not set
+        :param concurrency: number of requests kept in flight
+        :type concurrency: int
+        """
+        self.target = target
+        self.report_dir = report_dir
+        self.url = url
+        self.concurrency = concurrency
+        self.counts = {FIXED: 0, STILL_FAILING: 0, CHANGED: 0, SKIPPED: 0}
+        self.transitions = dict()
+        self.failing_tests = list()
+        self._encoders = dict()
+
+    def build_request(self, report):
+        """
+        :param report: saved report
+        :type report: dict
+        :return: request like FuzzerTarget.prepare_request returns, None if the report has no request
+        """
+        if not report.get('request_url') or not report.get('request_method'):
+            return None
+        headers = decode_field(report.get('request_headers'))
+        if not isinstance(headers, dict):
+            headers = dict()
+        if isinstance(self.target.auth_headers, list):
+            for auth_header_part in self.target.auth_headers:
+                headers.update(auth_header_part)
+        else:
+            headers.update(self.target.auth_headers)
+        data = report.get('request_body')
+        if not isinstance(data, dict):
+            data = dict()
+        content_type = ''
+        for name, value in headers.items():
+            if name.lower() == 'content-type':
+                content_type = value
+        _request = Return()
+        _request.url = rebase_url(report['request_url'], self.url)
+        _request.method = report['request_method']
+        _request.headers = headers
+        _request.data = data
+        _request.body = self.encoder(content_type, data.keys()).encode(data) if data else b''
+        _request.endpoint = 'replay|{}'.format(_request.method.lower())
+        return _request
+
+    def encoder(self, content_type, keys):
+        """
+        :param content_type: content type header of the saved request
+        :param keys: names of the fields of the body
+        :return: encoder of the body, the multipart boundary of the header is kept
+        :rtype: apifuzzer.body_encoders.SplicedEncoder
+        """
+        cache_key = (content_type, tuple(keys))
+        encoder = self._encoders.get(cache_key)
+        if encoder is None:
+            media_type = content_type.split(';')[0].strip().lower()
+            boundary = BOUNDARY.search(content_type)
+            if media_type == JSON:
+                encoder = JsonEncoder(keys)
+            elif media_type == MULTIPART and boundary:
+                encoder = MultipartEncoder(keys, boundary.group(1))
+            else:
+                encoder = FormEncoder(keys)
+            self._encoders[cache_key] = encoder
+        return encoder
+
+    def run(self):
+        """
+        :return: summary of the replay
+        :rtype: dict
+        """
+        transmitter = ConcurrentTransmitter(self.target, self.concurrency)
+        try:
+            transmitter.run(self._requests(), self._complete)
+        finally:
+            transmitter.close()
+        summary = self.summary()
+        self.logger.info('Replay summary: {}'.format(summary))
+        return summary
+
+    def _requests(self):
+        for report in iter_reports(self.report_dir):
+            try:
+                request = self.build_request(report)
+            except ValueError as e:
+                self.logger.warning('Failed to rebuild the request of test %s: %s', report.get('test_number'), e)
+                request = None
+            if request is None:
+                self.counts[SKIPPED] += 1
+                continue
+            yield request, report
+
+    def _complete(self, completed):
+        for in_flight in completed:
+            if in_flight.error is not None:
+                self.compare(in_flight.context, {'request_error': str(in_flight.error)})
+            else:
+                self.compare(in_flight.context, {'parsed_status_code': in_flight.response.status_code})
+
+    def compare(self, report, result):
+        """
+        Classifies the new outcome of a saved request
+        :param report: saved report
+        :param result: outcome of the replayed request, parsed_status_code or request_error
+        :return: fixed, still_failing or changed
+        """
+        old, new = request_outcome(report), request_outcome(result)
+        if new in self.target.accepted_status_codes:
+            verdict = FIXED
+        elif new == old:
+            verdict = STILL_FAILING
+        else:
+            verdict = CHANGED
+        self.counts[verdict] += 1
+        transition = '{} -> {}'.format(old, new)
+        self.transitions[transition] = self.transitions.get(transition, 0) + 1
+        if verdict != FIXED:
+            if len(self.failing_tests) < MAX_LISTED_TESTS and report.get('test_number') is not None:
+                self.failing_tests.append(report['test_number'])
+            self.logger.info('Test %s %s: %s %s', report.get('test_number'), verdict, report.get('request_method'),
+                             report.get('request_url'))
+        return verdict
+
+    def summary(self):
+        """
+        :return: number of fixed, still failing, changed and skipped reports, the outcome transitions and the test
+            numbers of the first failing requests
+        :rtype: dict
+        """
+        summary = dict(self.counts)
+        summary['replayed'] = self.counts[FIXED] + self.counts[STILL_FAILING] + self.counts[CHANGED]
+        summary['transitions'] = dict(sorted(self.transitions.items(), key=lambda item: -item[1]))
+        summary['failing_tests'] = sorted(self.failing_tests)
+        return summary
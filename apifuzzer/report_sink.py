@@ -0,0 +1,293 @@
+import gzip
+import io
+import json
+import os
+import queue
+import re
+import threading
+from time import time
+
+from apifuzzer.utils import set_class_logger
+
+REPORT_FILE_NAME = re.compile(r'^-?\d+_([\d.]+)\.json$')
+NDJSON_FILE_NAME = re.compile(r'^reports_(\d+)_(\d+)\.ndjson')
+NDJSON_EXTENSIONS = {
+    None: '.ndjson',
+    'gzip': '.ndjson.gz',
+    'zstd': '.ndjson.zst',
+}
+
+
+class ReportSink(object):
+    """
+    Stores the reports of the failed tests. The reports are the dicts created by Apifuzzer_Report.to_dict
+    """
+
+    def write(self, test_number, report):
+        """
+        :param test_number: number of the test the report belongs to
+        :type test_number: int
+        :param report: report of the test
+        :type report: dict
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """
+        Blocks until the reports written so far are saved
+        """
+        pass
+
+    def position(self):
+        """
+        :return: JSON serializable position of the sink after the reports written so far
+        """
+        return None
+
+    def restore(self, position):
+        """
+        Removes the reports saved after the position, used when an interrupted session is resumed
+        :param position: position returned by position() of the interrupted session
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+@set_class_logger
+class FileReportSink(ReportSink):
+    """
+    Saves every report to its own {test_number}_{time}.json file
+    """
+
+    def __init__(self, report_dir):
+        self.report_dir = report_dir
+
+    def write(self, test_number, report):
+        try:
+            if not os.path.exists(os.path.dirname(self.report_dir)):
+                try:
+                    os.makedirs(os.path.dirname(self.report_dir))
+                except OSError:
+                    pass
+            with open('{}/{}_{}.json'.format(self.report_dir, test_number, time()), 'w') as report_dump_file:
+                report_dump_file.write(json.dumps(report))
+        except Exception as e:
+            self.logger.error('Failed to save report "%s" to %s because: %s', report, self.report_dir, e)
+
+    def position(self):
+        return {'time': time()}
+
+    def restore(self, position):
+        if not position or not os.path.isdir(self.report_dir):
+            return
+        for file_name in os.listdir(self.report_dir):
+            match = REPORT_FILE_NAME.match(file_name)
+            if match and float(match.group(1)) > position['time']:
+                os.remove(os.path.join(self.report_dir, file_name))
+
+
+def get_compressor(compression=None):
+    """
+    Every batch of reports is compressed on its own into a complete gzip member or zstd frame, so the file can be
+    truncated after any batch and it is readable even if the fuzzer is killed
+    :param compression: None, 'gzip' or 'zstd'
+    :return: function compressing a batch of bytes
+    """
+    if compression is None:
+        return bytes
+    if compression == 'gzip':
+        return gzip.compress
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError('zstd report compression requires the zstandard package')
+        return zstandard.ZstdCompressor().compress
+    raise ValueError('Unknown report compression: {}'.format(compression))
+
+
+@set_class_logger
+class NdjsonReportSink(ReportSink):
+    """
+    Appends the reports as JSON lines to reports_{pid}_{index}.ndjson[.gz|.zst] files. The reports are serialized and
+    written in batches by a background thread, the file is rotated when it reaches rotate_size bytes (uncompressed).
+    """
+    _CLOSE = object()
+    _TIMEOUT = object()
+
+    def __init__(self, report_dir, compression=None, batch_size=100, flush_interval=1.0,
+                 rotate_size=64 * 1024 * 1024):
+        """
+        :param report_dir: directory of the report files
+        :param compression: None, 'gzip' or 'zstd'
+        :param batch_size: maximum number of reports written at once
+        :type batch_size: int
+        :param flush_interval: maximum time a report waits in memory (seconds)
+        :type flush_interval: float
+        :param rotate_size: a new file is started when the current one would exceed this size (bytes)
+        :type rotate_size: int
+        """
+        if compression not in NDJSON_EXTENSIONS:
+            raise ValueError('Unknown report compression: {}'.format(compression))
+        self.report_dir = report_dir
+        self.compression = compression
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rotate_size = rotate_size
+        # fail here and not on the writer thread if the compression is not available
+        self._compress = get_compressor(compression)
+        self._file = None
+        self._path = None
+        self._file_index = 0
+        self._written = 0
+        os.makedirs(report_dir, exist_ok=True)
+        self._rotate()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._writer, name='report-sink')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, test_number, report):
+        self._queue.put(report)
+
+    def _writer(self):
+        batch = list()
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = self._TIMEOUT
+            if isinstance(item, dict):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._write_batch(batch)
+                batch = list()
+                deadline = None
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is self._CLOSE:
+                break
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        while True:
+            path = os.path.join(self.report_dir, 'reports_{}_{:04d}{}'.format(
+                os.getpid(), self._file_index, NDJSON_EXTENSIONS[self.compression]))
+            self._file_index += 1
+            if not os.path.exists(path):
+                break
+        self._file = open(path, 'ab')
+        self._path = path
+        self._written = 0
+
+    def _write_batch(self, batch):
+        lines = list()
+        for report in batch:
+            # a report which can't be serialized is dropped alone, as by the file sink
+            try:
+                lines.append(json.dumps(report) + '\n')
+            except Exception as e:
+                self.logger.error('Failed to save report "%s" to %s because: %s', report, self.report_dir, e)
+        if not lines:
+            return
+        try:
+            data = ''.join(lines).encode()
+            if self._written and self._written + len(data) > self.rotate_size:
+                self._rotate()
+            self._file.write(self._compress(data))
+            self._file.flush()
+            self._written += len(data)
+        except Exception as e:
+            self.logger.error('Failed to save %d reports to %s because: %s', len(lines), self.report_dir, e)
+
+    def flush(self):
+        flushed = threading.Event()
+        self._queue.put(flushed)
+        flushed.wait()
+
+    def position(self):
+        self.flush()
+        return {'file': os.path.basename(self._path), 'offset': self._file.tell()}
+
+    def restore(self, position):
+        """
+        Truncates the file of the position and removes the files rotated after it, the files of the other processes
+        and of this sink are kept
+        """
+        if not position:
+            return
+        match = NDJSON_FILE_NAME.match(position['file'])
+        for file_name in os.listdir(self.report_dir):
+            path = os.path.join(self.report_dir, file_name)
+            file_match = NDJSON_FILE_NAME.match(file_name)
+            if path == self._path or not file_match or file_match.group(1) != match.group(1):
+                continue
+            if file_name == position['file']:
+                with open(path, 'r+b') as f:
+                    f.truncate(position['offset'])
+            elif int(file_match.group(2)) > int(match.group(2)):
+                os.remove(path)
+
+    def close(self):
+        """
+        Writes the queued reports and closes the current file
+        """
+        self._queue.put(self._CLOSE)
+        self._thread.join()
+        self._file.close()
+
+
+def get_report_sink(report_dir, report_format='files', compression=None, rotate_size=64 * 1024 * 1024):
+    """
+    :param report_dir: directory of the reports
+    :param report_format: 'files' for a JSON file per report, 'ndjson' for JSON lines files
+    :param compression: compression of the ndjson files: None, 'gzip' or 'zstd'
+    :param rotate_size: maximum size of an ndjson file (bytes)
+    :rtype: ReportSink
+    """
+    if report_format == 'files':
+        return FileReportSink(report_dir)
+    if report_format == 'ndjson':
+        return NdjsonReportSink(report_dir, compression=compression, rotate_size=rotate_size)
+    raise ValueError('Unknown report format: {}'.format(report_format))
+
+
+def _open_zstd_text(path):
+    import zstandard
+    reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+    return io.TextIOWrapper(reader, encoding='utf-8')
+
+
+def iter_reports(report_dir):
+    """
+    Streams the reports of every sink from the report directory
+    :param report_dir: directory of the reports
+    :return: generator of the report dicts
+    """
+    for file_name in sorted(os.listdir(report_dir)):
+        path = os.path.join(report_dir, file_name)
+        if file_name.endswith('.ndjson.gz'):
+            f = gzip.open(path, 'rt', encoding='utf-8')
+        elif file_name.endswith('.ndjson.zst'):
+            f = _open_zstd_text(path)
+        elif file_name.endswith('.ndjson'):
+            f = open(path, 'r', encoding='utf-8')
+        elif REPORT_FILE_NAME.match(file_name):
+            with open(path, 'r', encoding='utf-8') as report_file:
+                yield json.loads(report_file.read())
+            continue
+        else:
+            continue
+        with f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,69 @@
+"""
+Size capped buffers of the responses. The buffers belong to the Curl handles and are reused by the tests of the
+handle, so a test doesn't allocate new ones and a big response body can't take more memory than the cap.
+"""
+
+DEFAULT_MAX_RESPONSE_BYTES = 1024 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class ResponseBuffer(object):
+    """
+    Write callback of a Curl handle which keeps the first max_size bytes of the transfer and counts the rest
+    """
+
+    def __init__(self, max_size=None):
+        """
+        :param max_size: maximum number of bytes kept, unlimited if not set
+        :type max_size: int
+        """
+        self.max_size = max_size
+        self._buffer = bytearray()
+        self._length = 0
+        self.received = 0
+
+    def reset(self):
+        """
+        Empties the buffer, its memory is kept for the next transfer
+        """
+        self._length = 0
+        self.received = 0
+
+    def write(self, data):
+        self.received += len(data)
+        if self.max_size:
+            data = data[:self.max_size - self._length]
+        if data:
+            end = self._length + len(data)
+            self._buffer[self._length:end] = data
+            self._length = end
+
+    @property
+    def truncated(self):
+        return self.received > self._length
+
+    def getvalue(self):
+        """
+        :return: the kept bytes
+        :rtype: bytes
+        """
+        with memoryview(self._buffer) as view:
+            return view[:self._length].tobytes()
+
+
+def parse_headers(raw):
+    """
+    :param raw: header lines of a response, the headers of the last response are kept if there were redirects or
+        interim responses
+    :type raw: bytes
+    :return: headers by lower case name
+    :rtype: dict
+    """
+    headers = dict()
+    for line in raw.decode('iso-8859-1').split('\r\n'):
+        if line.startswith('HTTP/'):
+            headers = dict()
+        elif ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return headers
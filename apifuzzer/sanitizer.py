@@ -0,0 +1,123 @@
+"""
+Decides in one pass which part of a fuzzed value libcurl accepts. pycurl rejects URLs with non-ASCII characters or
+null bytes (UnicodeEncodeError, ValueError) and header lines with null bytes (ValueError), so instead of trying
+setopt() after every removed character, the first/last rejected character is looked up with a precompiled pattern.
+"""
+import re
+
+URL_REJECTED_CHARS = re.compile('[\x00\x80-\U0010ffff]')
+HEADER_REJECTED_CHARS = re.compile('\x00')
+
+
+def _first_rejected(pattern, value):
+    match = pattern.search(value)
+    return match.start() if match else None
+
+
+def _last_rejected(pattern, value):
+    match = pattern.search(value[::-1])
+    return len(value) - 1 - match.start() if match else None
+
+
+def chop_left(pattern, value):
+    """
+    Removes characters from the beginning of the value until it is accepted
+    :param pattern: pattern of the rejected characters
+    :param value: value to sanitize
+    :rtype: str
+    """
+    last = _last_rejected(pattern, value)
+    if last is None:
+        return value
+    return value[last + 1:]
+
+
+def chop_right(pattern, value):
+    """
+    Removes characters from the end of the value until it is accepted
+    :param pattern: pattern of the rejected characters
+    :param value: value to sanitize
+    :rtype: str
+    """
+    first = _first_rejected(pattern, value)
+    if first is None:
+        return value
+    return value[:first]
+
+
+def is_acceptable(pattern, value):
+    return pattern.search(value) is None
+
+
+def dict_to_query_string(query_strings):
+    """
+    Transforms dictionary to query string format
+    :param query_strings: dictionary
+    :type query_strings: dict
+    :return: query string
+    :rtype: str
+    """
+    _tmp_list = list()
+    for query_string_key in query_strings.keys():
+        _tmp_list.append('{}={}'.format(query_string_key, query_strings[query_string_key]))
+    return '?' + '&'.join(_tmp_list)
+
+
+def sanitize_url(url):
+    """
+    Removes the rejected characters of every url part from the left, an emptied part stays empty
+    :param url: URL string prepared earlier
+    :type url: str
+    :return: pycurl compliant URL
+    :rtype: str
+    """
+    return '/'.join(chop_left(URL_REJECTED_CHARS, part) for part in url.split('/'))
+
+
+def sanitize_query_params(url, query_params):
+    """
+    Removes the rejected characters of the query param values from the right. When the url or a param name is
+    rejected, that param and the ones after it get empty value, as nothing can be appended to the url anymore.
+    :param url: url the query string is appended to
+    :type url: str
+    :param query_params: query strings in dict format, the keys may be prefixed with 'template|'
+    :type query_params: dict
+    :return: query string
+    :rtype: str
+    """
+    _tmp_query_params = dict()
+    acceptable_prefix = is_acceptable(URL_REJECTED_CHARS, url)
+    for k, v in query_params.items():
+        _query_param_name = k.split('|')[-1]
+        acceptable_prefix = acceptable_prefix and is_acceptable(URL_REJECTED_CHARS, _query_param_name)
+        if acceptable_prefix:
+            _tmp_query_params[_query_param_name] = chop_right(URL_REJECTED_CHARS, v)
+        else:
+            _tmp_query_params[_query_param_name] = ""
+    return dict_to_query_string(_tmp_query_params)
+
+
+def sanitize_header_value(name, value):
+    """
+    Removes the rejected characters of the header value from the left, or if it would remove the whole value, from
+    the right
+    :param name: header name
+    :param value: header value
+    :rtype: str
+    """
+    if not is_acceptable(HEADER_REJECTED_CHARS, name):
+        return ""
+    _value = chop_left(HEADER_REJECTED_CHARS, value)
+    if len(_value):
+        return _value
+    return chop_right(HEADER_REJECTED_CHARS, value)
+
+
+def sanitize_headers(headers):
+    """
+    :param headers: http headers
+    :type headers: dict
+    :return: http header lines
+    :rtype: list of bytes
+    """
+    return ['{}: {}'.format(k, sanitize_header_value(k, v)).encode() for k, v in headers.items()]
@@ -1,7 +1,15 @@
+import signal
+import traceback
+
 from kitty.data.report import Report
 from kitty.fuzzers import ServerFuzzer
 from kitty.model import Container, KittyException
 
+from apifuzzer.checkpoint import model_fingerprint, parse_test_list, remaining_test_list
+from apifuzzer.concurrent_transmitter import ConcurrentTransmitter
+from apifuzzer.endpoint_selection import skip_test_list_to
+from apifuzzer.session_store import FAILURES, SQLITE, get_data_manager
+from apifuzzer.sharding import write_shard_stats
 from apifuzzer.utils import set_class_logger, transform_data_to_bytes
 
 
@@ -20,6 +28,17 @@ def _flatten_dict_entry(orig_key, v):
     return entries
 
 
+class FuzzCase(object):
+    """State of a test captured when it was sent, so it can be reported after the model moved on"""
+
+    def __init__(self, number, fuzz_path, test_info, payload):
+        self.number = number
+        self.fuzz_path = fuzz_path
+        self.test_info = test_info
+        self.payload = payload
+        self.target_context = None
+
+
 @set_class_logger
 class OpenApiServerFuzzer(ServerFuzzer):
     """Extends the ServerFuzzer with exit after the end message."""
@@ -27,23 +46,327 @@ class OpenApiServerFuzzer(ServerFuzzer):
     def not_implemented(self, func_name):
         pass
 
-    def __init__(self):
+    def __init__(self, concurrency=1, stats_file=None, checkpoint=None, endpoint_budget=None, scheduler=None,
+                 session_store=SQLITE, session_commit_interval=1.0):
+        """
+        :param concurrency: number of requests kept in flight, 1 sends the tests one by one
+        :type concurrency: int
+        :param stats_file: if set, the session stats are saved here at the end of the session
+        :type stats_file: str
+        :param checkpoint: if set, the progress is saved periodically and at exit to its state file
+        :type checkpoint: apifuzzer.checkpoint.Checkpoint
+        :param endpoint_budget: if set, the tests of the endpoints beyond their budget are skipped
+        :type endpoint_budget: apifuzzer.endpoint_selection.EndpointBudget
+        :param scheduler: if set, it selects and orders the tests instead of the test list
+        :type scheduler: apifuzzer.mutation_scheduler.NoveltyScheduler or apifuzzer.time_budget.TimeBudgetSampler
+        :param session_store: storage of the kitty session, see apifuzzer.session_store
+        :param session_commit_interval: minimum time between two commits of the batched session store (seconds)
+        :type session_commit_interval: float
+        """
         self.logger.info('Logger initialized')
         super(OpenApiServerFuzzer, self).__init__()
+        self.concurrency = concurrency
+        self.stats_file = stats_file
+        self.checkpoint = checkpoint
+        self.endpoint_budget = endpoint_budget
+        self.scheduler = scheduler
+        self.session_store = session_store
+        self.session_commit_interval = session_commit_interval
+        self._stored_failure_count = 0
+        self._session_test_list_str = None
+        self._tested_before_resume = 0
+        self._last_completed = -1
+        self._in_flight = set()
+        self._finished = False
+        self._fingerprint = None
+
+    def set_test_list(self, test_list_str=''):
+        super(OpenApiServerFuzzer, self).set_test_list(test_list_str)
+        self._session_test_list_str = test_list_str or None
+
+    def resume(self, state):
+        """
+        Continues an interrupted session after its last completed test. Must be called after the model and the target
+        are set and before start.
+        :param state: state saved by the checkpoint of the interrupted session
+        :type state: dict
+        :return: False if the session has no tests left
+        :rtype: bool
+        """
+        if state['model_fingerprint'] != self._model_fingerprint():
+            raise ValueError('The API definition changed since the state file {} was saved'.format(
+                self.checkpoint.path))
+        if state['test_list_str'] != self._session_test_list_str:
+            raise ValueError('The state file {} was saved by a session of the tests {}'.format(
+                self.checkpoint.path, state['test_list_str']))
+        if state['finished']:
+            self.logger.info('The session of %s is finished already', self.checkpoint.path)
+            return False
+        last_completed = state['last_completed']
+        # kitty and _end_message expect a closed range
+        session_test_list_str = state['test_list_str'] or '0-{}'.format(self.model.last_index())
+        test_list_str = remaining_test_list(session_test_list_str, last_completed)
+        if not test_list_str:
+            return False
+        self.logger.info('Resuming after test %d with the tests %s', last_completed, test_list_str)
+        self.target.report_sink.restore(state['report_sink'])
+        self.set_test_list(test_list_str)
+        self._session_test_list_str = state['test_list_str']
+        self._tested_before_resume = state['tested']
+        self._last_completed = last_completed
+        self.session_info.failure_count = state['session_info'].get('failure_count', 0)
+        return True
+
+    def _next_mutation(self):
+        if self.scheduler is not None:
+            return self._next_scheduled_mutation()
+        if self.endpoint_budget is not None:
+            index = self._test_list.current()
+            while index is not None:
+                next_index = self.endpoint_budget.next_test(index)
+                if next_index == index:
+                    break
+                skip_test_list_to(self._test_list, next_index)
+                index = self._test_list.current()
+        # the model seeks to the next test of the test list, see IndexedGraphModel
+        mutated = super(OpenApiServerFuzzer, self)._next_mutation()
+        if mutated and self.endpoint_budget is not None:
+            self.endpoint_budget.started(self.model.current_index())
+        return mutated
+
+    def _next_scheduled_mutation(self):
+        if not self._keep_running():
+            return False
+        self.session_info.current_index = self.model.current_index()
+        index = self.scheduler.next_test()
+        if index is None:
+            return False
+        self.model.seek(index)
+        return self.model.mutate()
+
+    def _post_test(self):
+        failure_detected = super(OpenApiServerFuzzer, self)._post_test()
+        if self.scheduler is not None and not self._in_environment_test:
+            self.scheduler.observe(self.model.current_index(), self.target.report)
+        return failure_detected
+
+    def _update_test_info(self):
+        # the model info of the current test is published only for the web interface
+        if getattr(self.user_interface, 'headless', False):
+            return
+        super(OpenApiServerFuzzer, self)._update_test_info()
+
+    def _set_signal_handler(self):
+        super(OpenApiServerFuzzer, self)._set_signal_handler()
+        # pre-empted CI runners are stopped with SIGTERM
+        signal.signal(signal.SIGTERM, self._exit_now)
+
+    def _load_session(self):
+        # the same as the one of kitty, with the configured session store
+        if not self.config.session_file_name:
+            self.config.session_file_name = ':memory:'
+        self.dataman = get_data_manager(self.session_store, self.config.session_file_name,
+                                        commit_interval=self.session_commit_interval)
+        self.dataman.start()
+        if self.model:
+            self.handle_stage_changed(self.model)
+        self.dataman.set('log_file_name', self.get_log_file_name())
+        info = self._get_session_info()
+        if info:
+            self.logger.info('Loaded session from DB')
+            self.session_info = info
+            return True
+        self.logger.info('No session loaded')
+        self._set_session_info()
+        return False
+
+    def _store_session(self):
+        if self.session_store != FAILURES or self.session_info.failure_count != self._stored_failure_count:
+            self._stored_failure_count = self.session_info.failure_count
+            super(OpenApiServerFuzzer, self)._store_session()
+        if self._in_environment_test:
+            return
+        # in concurrent mode the tests are completed out of order, only the ones before the oldest in flight test
+        # are surely done
+        if self._in_flight:
+            self._last_completed = min(self._in_flight) - 1
+        else:
+            self._last_completed = self.model.current_index()
+        if self.checkpoint is not None and self.checkpoint.due():
+            self._save_checkpoint()
+
+    def _save_checkpoint(self):
+        try:
+            self.checkpoint.save(test_list_str=self._session_test_list_str,
+                                 last_completed=self._last_completed,
+                                 session_info=self.session_info,
+                                 report_sink_position=self.target.report_sink.position(),
+                                 fingerprint=self._model_fingerprint(),
+                                 finished=self._finished)
+        except Exception as e:
+            self.logger.error('Failed to save the checkpoint to %s: %s', self.checkpoint.path, e)
+
+    def _model_fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = model_fingerprint(self.model)
+        return self._fingerprint
+
+    def _exit_now(self, dummy1, dummy2):
+        if self.checkpoint is not None and self._started:
+            self._save_checkpoint()
+        super(OpenApiServerFuzzer, self)._exit_now(dummy1, dummy2)
 
     def _end_message(self):
+        # the session also ends here when an error stops the fuzzer
+        if self.scheduler is not None:
+            self._finished = self.scheduler.exhausted() and not self._in_flight
+        else:
+            self._finished = self._test_list.current() is None and not self._in_flight
         super(OpenApiServerFuzzer, self)._end_message()
+        if self.session_store == FAILURES:
+            self._set_session_info()
         # Sometimes Kitty has stopped the fuzzer before it has finished the work. We can't continue, but can log
         self.logger.info('Stop fuzzing session_info: {}'.format(self.session_info.as_dict()))
-        test_list_str_end = self.session_info.as_dict().get('test_list_str', '0-0').split('-', 1)[1].strip()
-        if self.session_info.as_dict().get('end_index') != int(test_list_str_end):
+        # the test list can have several ranges and the last one can be open
+        test_list_str_end = parse_test_list(self.session_info.as_dict().get('test_list_str', '0-0'))[-1][1]
+        if self.scheduler is not None:
+            # the scheduled tests are out of order and a time budget ends the session before the end of the tests
+            if not self._finished:
+                self.logger.error('Fuzzer want to exit before the end of the tests')
+        elif test_list_str_end is not None and self.session_info.as_dict().get('end_index') != test_list_str_end:
             self.logger.error('Fuzzer want to exit before the end of the tests')
+        if self.endpoint_budget is not None:
+            self.logger.info('Tests by endpoint: {}'.format(self.endpoint_budget.summary()))
+        if self.scheduler is not None:
+            self.logger.info('Scheduler summary: {}'.format(self.scheduler.summary()))
+        if self.stats_file:
+            if self.scheduler is not None:
+                tested = self.scheduler.scheduled
+            elif self.endpoint_budget is not None:
+                # the skipped tests of the test list are not counted
+                tested = sum(self.endpoint_budget.tested.values())
+            else:
+                tested = self._test_list.get_progress()
+            write_shard_stats(self.stats_file, self.session_info, self._tested_before_resume + tested)
         self._exit_now(None, None)
 
+    def _start(self):
+        if self.concurrency > 1:
+            self._start_concurrent()
+        else:
+            super(OpenApiServerFuzzer, self)._start()
+
+    def _start_concurrent(self):
+        """
+        Renders the payloads ahead and keeps self.concurrency tests in flight. Responses are matched back to their
+        test by the FuzzCase they were submitted with, so the reports are the same as in sequential mode.
+        """
+        self.logger.info('Fuzzing with {} requests in flight'.format(self.concurrency))
+        transmitter = ConcurrentTransmitter(self.target, self.concurrency)
+        try:
+            transmitter.run(self._requests(transmitter), self._complete_tests)
+        except Exception as e:
+            self.logger.error('Error occurred while fuzzing: %s', repr(e))
+            self.logger.error(traceback.format_exc())
+        transmitter.close()
+        self._end_message()
+
+    def _requests(self, transmitter):
+        while self._next_mutation():
+            sequence = self.model.get_sequence()
+            if len(sequence) > 1:
+                # the prerequisite requests of the sequence must be answered before the fuzzed one is sent
+                self._complete_tests(transmitter.drain())
+                self._run_sequence(sequence)
+                continue
+            request, fuzz_case = self._prepare_test(sequence[-1].dst)
+            if request is not None:
+                yield request, fuzz_case
+
+    def _prepare_test(self, node):
+        """
+        :return: the request of the current test and its FuzzCase, no request if it can't be built
+        """
+        self._check_pause()
+        self._pre_test()
+        self._test_info()
+        node.set_session_data(self.target.get_session_data())
+        payload = self._render_payload(node)
+        fuzz_case = FuzzCase(number=self.model.current_index(),
+                             fuzz_path=self.model.get_sequence_str(),
+                             test_info=self.model.get_test_info(),
+                             payload=payload)
+        self._in_flight.add(fuzz_case.number)
+        try:
+            request = self.target.prepare_request(**payload)
+        except (UnicodeDecodeError, UnicodeEncodeError) as e:
+            self.target.report_add_basic_msg(('Failed to parse http response code, exception occurred: %s', e))
+            self._post_fuzz_case(fuzz_case)
+            return None, fuzz_case
+        fuzz_case.target_context = self.target.save_test_context()
+        return request, fuzz_case
+
+    def _complete_tests(self, completed):
+        for in_flight in completed:
+            fuzz_case = in_flight.context
+            self.target.restore_test_context(fuzz_case.target_context)
+            if in_flight.error is not None:
+                self.target.request_failed(in_flight.request, in_flight.error)
+            else:
+                self.target.process_response(in_flight.response)
+            self._post_fuzz_case(fuzz_case)
+
+    def _post_fuzz_case(self, fuzz_case):
+        """
+        The same as _post_test, but reports the given test instead of the current one of the model
+        :type fuzz_case: FuzzCase
+        :return: True if test failed
+        """
+        failure_detected = False
+        self.target.post_test(fuzz_case.number)
+        self._in_flight.discard(fuzz_case.number)
+        if self.scheduler is not None:
+            self.scheduler.observe(fuzz_case.number, self.target.report)
+        report = self._get_report()
+        if report.get_status() != Report.PASSED:
+            self._store_report(report, fuzz_case)
+            self.user_interface.failure_detected()
+            failure_detected = True
+            self.logger.warning('!! Failure detected !!')
+        elif self.config.store_all_reports:
+            self._store_report(report, fuzz_case)
+        if failure_detected:
+            self.session_info.failure_count += 1
+        self._store_session()
+        return failure_detected
+
     def _transmit(self, node):
+        payload = self._render_payload(node)
+        try:
+            return self.target.transmit(**payload)
+        except Exception as e:
+            self.logger.error('Error in transmit: %s', e)
+            raise
+
+    def _render_payload(self, node):
+        payload = self.render_payload(node, self.logger)
+        self._last_payload = payload
+        return payload
+
+    @staticmethod
+    def render_payload(node, logger):
+        """
+        Renders the current mutation of a template into the keyword arguments of FuzzerTarget.transmit
+        :param node: template of the test
+        :type node: kitty.model.Template
+        :param logger: logger of the caller
+        :rtype: dict
+        """
         payload = {}
         for key in ['url', 'method']:
             payload[key] = transform_data_to_bytes(node.get_field_by_name(key).render())
+        if 'content_type' in node._fields_dict:
+            payload['content_type'] = transform_data_to_bytes(node.get_field_by_name('content_type').render()).decode()
         fuzz_places = ['params', 'headers', 'data', 'path_variables']
         for place in fuzz_places:
             # self.logger.info('Transmit place: {}'.format(place))
@@ -51,20 +374,15 @@ class OpenApiServerFuzzer(ServerFuzzer):
                 if place in node._fields_dict:
                     param = node.get_field_by_name(place)
                     # if isinstance(param, Container):
-                    _result = self._recurse_params(param)
+                    _result = OpenApiServerFuzzer._recurse_params(param)
                     # self.logger.info('Process param recursively: {} gives: {}'.format(param, _result))
                     payload[place] = _result
                     # elif hasattr(param, 'render'):
                     #     payload[place] = param.render()
             except KittyException as e:
-                self.logger.warn('Exception occurred while processing {}: {}'.format(place, e.__str__()))
+                logger.warn('Exception occurred while processing {}: {}'.format(place, e.__str__()))
         # self.logger.info('Payload: {}'.format(payload))
-        self._last_payload = payload
-        try:
-            return self.target.transmit(**payload)
-        except Exception as e:
-            self.logger.error('Error in transmit: %s', e)
-            raise
+        return payload
 
     @staticmethod
     def _recurse_params(param):
@@ -76,18 +394,23 @@ class OpenApiServerFuzzer(ServerFuzzer):
             _return = transform_data_to_bytes(param.render()).decode(errors='ignore')
         return _return
 
-    def _store_report(self, report):
+    def _store_report(self, report, fuzz_case=None):
         self.logger.debug('<in>')
-        report.add('test_number', self.model.current_index())
-        report.add('fuzz_path', self.model.get_sequence_str())
-        test_info = self.model.get_test_info()
+        if fuzz_case is None:
+            fuzz_case = FuzzCase(number=self.model.current_index(),
+                                 fuzz_path=self.model.get_sequence_str(),
+                                 test_info=self.model.get_test_info(),
+                                 payload=self._last_payload)
+        report.add('test_number', fuzz_case.number)
+        report.add('fuzz_path', fuzz_case.fuzz_path)
+        test_info = fuzz_case.test_info
         data_model_report = Report(name='Data Model')
         for k, v in test_info.items():
             new_entries = _flatten_dict_entry(k, v)
             for (k_, v_) in new_entries:
                 data_model_report.add(k_, v_)
         report.add(data_model_report.get_name(), data_model_report)
-        payload = self._last_payload
+        payload = fuzz_case.payload
         if payload is not None:
             data_report = Report('payload')
             data_report.add('raw', payload)
@@ -96,7 +419,7 @@ class OpenApiServerFuzzer(ServerFuzzer):
         else:
             report.add('payload', None)
 
-        self.dataman.store_report(report, self.model.current_index())
+        self.dataman.store_report(report, fuzz_case.number)
         # TODO investigate:
         #  self.dataman.get_report_by_id(self.model.current_index())
 
@@ -0,0 +1,186 @@
+"""
+Storage of the kitty session: the session info, which is updated after every test, and the reports of the failed
+tests. kitty's DataManager writes both to sqlite on its own thread, commits every write and the fuzzer waits for each
+of them. The reports are saved to the report directory anyway, the session store only serves the web interface and
+the session file, so it can be cheaper:
+
+    sqlite: kitty's DataManager
+    batched: the writes are queued without waiting and committed together every commit interval
+    memory: no database, the session info and the latest reports are kept in memory
+    failures: kitty's DataManager, but the session info is only written together with a failure and at the end
+"""
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from kitty.data.data_manager import DataManager, DataManagerTask, SessionInfo
+
+SQLITE = 'sqlite'
+BATCHED = 'batched'
+MEMORY = 'memory'
+FAILURES = 'failures'
+SESSION_STORES = (SQLITE, BATCHED, MEMORY, FAILURES)
+# the memory store keeps the content of this many reports, the list of the failed tests is complete
+MEMORY_REPORTS = 100
+
+
+class _BatchedConnection(object):
+    """
+    sqlite connection whose commits are skipped until the commit interval has passed since the last one
+    """
+
+    def __init__(self, connection, commit_interval):
+        self._connection = connection
+        self.commit_interval = commit_interval
+        self._committed = monotonic()
+
+    def cursor(self):
+        return self._connection.cursor()
+
+    def commit(self):
+        if monotonic() - self._committed >= self.commit_interval:
+            self.flush()
+
+    def flush(self):
+        self._connection.commit()
+        self._committed = monotonic()
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+
+def _store_report(dataman, report, test_id):
+    dataman._reports.store(report, test_id)
+
+
+def _set_session_info(dataman, info):
+    dataman._session_info.set_session_info(info)
+
+
+def _set(dataman, key, data):
+    dataman._volatile_data[key] = data
+
+
+class BatchedDataManager(DataManager):
+    """
+    DataManager which doesn't wait for its writes and commits them in batches, the reads still wait for the writes
+    queued before them
+    """
+
+    def __init__(self, dbname, commit_interval=1.0):
+        """
+        :param dbname: database name of the session
+        :param commit_interval: minimum time between two commits (seconds), the last writes are committed at the stop
+        :type commit_interval: float
+        """
+        super(BatchedDataManager, self).__init__(dbname)
+        self.commit_interval = commit_interval
+
+    def open(self):
+        super(BatchedDataManager, self).open()
+        self._connection = _BatchedConnection(self._connection, self.commit_interval)
+        # the tables commit through their own reference of the connection
+        self._session_info._connection = self._connection
+        self._reports._connection = self._connection
+
+    def store_report(self, report, test_id):
+        self.submit_task(DataManagerTask(_store_report, report, test_id))
+
+    def set_session_info(self, info):
+        # the fuzzer keeps updating its session info
+        self.submit_task(DataManagerTask(_set_session_info, SessionInfo(info)))
+
+    def set(self, key, data):
+        if isinstance(data, dict):
+            data = dict(data)
+        self.submit_task(DataManagerTask(_set, key, data))
+
+
+class MemoryDataManager(object):
+    """
+    The interface of kitty's DataManager without a database or a thread, the calls are served on the caller's thread
+    """
+
+    def __init__(self, max_reports=MEMORY_REPORTS):
+        """
+        :param max_reports: number of the latest reports kept
+        :type max_reports: int
+        """
+        self.max_reports = max_reports
+        # the tasks can call the other methods
+        self._lock = threading.RLock()
+        self._session_info = None
+        self._report_list = list()
+        self._reports = OrderedDict()
+        self._volatile_data = dict()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def submit_task(self, task):
+        if task is not None:
+            with self._lock:
+                task.execute(self)
+        return task
+
+    def get_session_info(self):
+        with self._lock:
+            return SessionInfo(self._session_info) if self._session_info is not None else None
+
+    def set_session_info(self, info):
+        with self._lock:
+            self._session_info = SessionInfo(info)
+
+    def get_report_test_ids(self):
+        with self._lock:
+            return [test_id for test_id, _, _ in self._report_list]
+
+    def get_report_list(self):
+        """
+        :return: test id, status and reason of every stored report
+        :rtype: list of tuple
+        """
+        with self._lock:
+            return list(self._report_list)
+
+    def get_report_by_id(self, report_id):
+        with self._lock:
+            if report_id not in self._reports:
+                raise KeyError('No report with test id %s in memory' % report_id)
+            return self._reports[report_id]
+
+    def store_report(self, report, test_id):
+        with self._lock:
+            self._report_list.append((test_id, report.get_status(), report.get('reason')))
+            self._reports[test_id] = report
+            self._reports.move_to_end(test_id)
+            if len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+
+    def set(self, key, data):
+        with self._lock:
+            self._volatile_data[key] = dict(data) if isinstance(data, dict) else data
+
+    def get(self, key):
+        with self._lock:
+            return self._volatile_data.get(key)
+
+
+def get_data_manager(session_store, dbname, commit_interval=1.0):
+    """
+    :param session_store: sqlite, batched, memory or failures
+    :param dbname: database name of the session
+    :param commit_interval: minimum time between two commits of the batched store (seconds)
+    :rtype: DataManager or MemoryDataManager
+    """
+    if session_store == BATCHED:
+        return BatchedDataManager(dbname, commit_interval=commit_interval)
+    if session_store == MEMORY:
+        return MemoryDataManager()
+    if session_store in (SQLITE, FAILURES):
+        return DataManager(dbname)
+    raise ValueError('Unknown session store: {}'.format(session_store))
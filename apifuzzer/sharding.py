@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+
+from apifuzzer.failure_buckets import FAILURE_BUCKETS_FILE, FailureBuckets, merge_bucket_summaries
+from apifuzzer.report_sink import iter_reports
+
+
+def split_test_range(num_mutations, workers):
+    """
+    Splits the test indexes of the model into disjoint, contiguous kitty test lists
+    :param num_mutations: number of mutations in the model
+    :type num_mutations: int
+    :param workers: number of shards to create
+    :type workers: int
+    :return: test list strings like '0-99', at most one per worker
+    :rtype: list of str
+    """
+    shards = list()
+    workers = max(1, min(workers, num_mutations))
+    shard_size, remainder = divmod(num_mutations, workers)
+    start = 0
+    for worker in range(workers):
+        end = start + shard_size + (1 if worker < remainder else 0)
+        if end > start:
+            shards.append('{}-{}'.format(start, end - 1))
+        start = end
+    return shards
+
+
+def write_shard_stats(stats_file, session_info, tested):
+    """
+    Saves the kitty session stats of one shard
+    :param stats_file: path of the stats file
+    :param session_info: kitty session info of the shard's fuzzer
+    :type session_info: kitty.data.data_manager.SessionInfo
+    :param tested: number of tests executed by the shard
+    :type tested: int
+    """
+    stats = session_info.as_dict()
+    stats['tested'] = tested
+    with open(stats_file, 'w') as f:
+        f.write(json.dumps(stats))
+
+
+def merge_shard_results(shard_dirs, stats_files, report_dir, report_sink=None, failure_exemplars=None):
+    """
+    Moves the reports of the shards into the report directory and sums up their session stats and failure buckets
+    :param shard_dirs: report directories of the shards
+    :param stats_files: stats files of the shards, missing ones are reported as failed shards
+    :param report_dir: directory of the merged reports
+    :param report_sink: store of the merged reports, required if the failure buckets are capped
+    :type report_sink: apifuzzer.report_sink.ReportSink
+    :param failure_exemplars: number of reports kept per failure bucket of all the shards, not capped if not set. Every
+        shard saves up to this number, the reports past it are dropped and the rest are written to the report sink
+    :return: merged session stats
+    :rtype: dict
+    """
+    merged = {
+        'shards': list(),
+        'failed_shards': list(),
+        'tested': 0,
+        'failure_count': 0,
+        'start_time': None,
+    }
+    bucket_summaries = list()
+    failure_buckets = None
+    if failure_exemplars is not None:
+        failure_buckets = FailureBuckets(report_dir, exemplars=failure_exemplars)
+    for shard_dir in shard_dirs:
+        if not os.path.isdir(shard_dir):
+            continue
+        if failure_buckets is not None:
+            for report in iter_reports(shard_dir):
+                if failure_buckets.add_saved(report.get('test_number'), report):
+                    report_sink.write(report.get('test_number'), report)
+            buckets_file = os.path.join(shard_dir, FAILURE_BUCKETS_FILE)
+            if os.path.exists(buckets_file):
+                with open(buckets_file, 'r') as f:
+                    bucket_summaries.append(json.loads(f.read()))
+            shutil.rmtree(shard_dir)
+            continue
+        for report_file in os.listdir(shard_dir):
+            if report_file == FAILURE_BUCKETS_FILE:
+                with open(os.path.join(shard_dir, report_file), 'r') as f:
+                    bucket_summaries.append(json.loads(f.read()))
+                os.remove(os.path.join(shard_dir, report_file))
+                continue
+            shutil.move(os.path.join(shard_dir, report_file), os.path.join(report_dir, report_file))
+        os.rmdir(shard_dir)
+    if failure_buckets is not None:
+        report_sink.close()
+        failure_buckets.merge(bucket_summaries)
+        failure_buckets.close()
+    elif bucket_summaries:
+        with open(os.path.join(report_dir, FAILURE_BUCKETS_FILE), 'w') as f:
+            f.write(json.dumps(merge_bucket_summaries(bucket_summaries)))
+    for stats_file in stats_files:
+        try:
+            with open(stats_file, 'r') as f:
+                stats = json.loads(f.read())
+            os.remove(stats_file)
+        except (OSError, ValueError):
+            merged['failed_shards'].append(stats_file)
+            continue
+        merged['shards'].append(stats.get('test_list_str'))
+        merged['tested'] += stats.get('tested', 0)
+        merged['failure_count'] += stats.get('failure_count', 0)
+        if stats.get('start_time') and (merged['start_time'] is None or stats['start_time'] < merged['start_time']):
+            merged['start_time'] = stats['start_time']
+    merged['test_list_str'] = ','.join(merged['shards'])
+    return merged
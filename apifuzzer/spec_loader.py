@@ -0,0 +1,179 @@
+"""
+Loading and indexing of API definitions. The $ref pointers are resolved lazily and every pointer only once, the
+resolved node is shared by every reference instead of copied, so big definitions with heavily shared parameters and
+schemas stay at the size of the parsed document and recursive schemas don't need special care.
+"""
+import json
+import os
+from collections import namedtuple
+from urllib.parse import unquote
+
+HTTP_METHODS = ('get', 'put', 'post', 'delete', 'options', 'head', 'patch')
+YAML_EXTENSIONS = ('.yaml', '.yml')
+
+Operation = namedtuple('Operation', ['path', 'method', 'parameters', 'tags', 'operation_id', 'consumes'])
+# the defaults argument of namedtuple needs Python 3.7
+Operation.__new__.__defaults__ = ((),)
+
+
+def _is_yaml(path, f):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in YAML_EXTENSIONS:
+        return True
+    if extension == '.json':
+        return False
+    # no telling extension, JSON documents start with an object
+    while True:
+        char = f.read(1)
+        if not char or not char.isspace():
+            f.seek(0)
+            return char != '{'
+
+
+def load_spec(path):
+    """
+    :param path: JSON or YAML API definition file, YAML requires the PyYAML package
+    :type path: str
+    :return: the parsed API definition
+    :rtype: dict
+    """
+    with open(path, mode='r', encoding='utf-8') as f:
+        if _is_yaml(path, f):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError('YAML API definitions require the PyYAML package')
+            # the LibYAML based loader is an order of magnitude faster if PyYAML was built with it
+            document = yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        else:
+            document = json.load(f)
+    if not isinstance(document, dict) or not isinstance(document.get('paths'), dict):
+        raise ValueError('{} is not an API definition file'.format(path))
+    return document
+
+
+class RefResolver(object):
+    """
+    Resolves the local $ref pointers of a document, e.g. '#/definitions/Pet'
+    """
+
+    def __init__(self, document):
+        """
+        :param document: the parsed API definition
+        :type document: dict
+        """
+        self.document = document
+        self._resolved = dict()
+
+    def resolve(self, node):
+        """
+        Follows the $ref of the node, and the $ref of its target if that is a reference too. The nested references of
+        the result are left as they are, they can be resolved when they are reached.
+        :param node: any node of the document
+        :return: the node itself if it's not a reference, the referred node otherwise
+        """
+        chain = list()
+        while isinstance(node, dict) and '$ref' in node:
+            ref = node['$ref']
+            if ref in self._resolved:
+                node = self._resolved[ref]
+                break
+            if ref in chain:
+                raise ValueError('Circular $ref: {}'.format(' -> '.join(chain + [ref])))
+            chain.append(ref)
+            node = self._lookup(ref)
+        for ref in chain:
+            self._resolved[ref] = node
+        return node
+
+    def _lookup(self, ref):
+        if not ref.startswith('#'):
+            raise ValueError('Only local $ref is supported: {}'.format(ref))
+        pointer = unquote(ref[1:])
+        node = self.document
+        if not pointer:
+            return node
+        if not pointer.startswith('/'):
+            raise ValueError('Invalid $ref: {}'.format(ref))
+        for token in pointer[1:].split('/'):
+            token = token.replace('~1', '/').replace('~0', '~')
+            try:
+                node = node[int(token)] if isinstance(node, list) else node[token]
+            except (KeyError, IndexError, TypeError, ValueError):
+                raise ValueError('Unresolvable $ref: {}'.format(ref))
+        return node
+
+
+class ApiSpec(object):
+    """
+    Index of the operations of an API definition
+    """
+
+    def __init__(self, document):
+        """
+        :param document: the parsed API definition
+        :type document: dict
+        """
+        self.document = document
+        self.resolver = RefResolver(document)
+        self._operations = None
+        self._index = None
+
+    def operations(self):
+        """
+        :return: the operations in the order of the definition, their parameters contain the ones shared by the path
+        :rtype: list of Operation
+        """
+        if self._operations is None:
+            self._build_index()
+        return self._operations
+
+    def operation(self, path, method):
+        """
+        :param path: path as in the definition, e.g. '/pets/{id}'
+        :param method: HTTP method
+        :return: the operation or None if the definition doesn't have it
+        :rtype: Operation
+        """
+        if self._index is None:
+            self._build_index()
+        return self._index.get((path, method.lower()))
+
+    def parameter_schema(self, parameter):
+        """
+        :param parameter: resolved parameter of an operation
+        :return: the node with the type and format of the parameter, the resolved schema of a body parameter
+        :rtype: dict
+        """
+        if 'schema' in parameter:
+            schema = self.resolver.resolve(parameter['schema'])
+            return schema if isinstance(schema, dict) else dict()
+        return parameter
+
+    def _parameters(self, parameters):
+        resolved = list()
+        for parameter in parameters or list():
+            parameter = self.resolver.resolve(parameter)
+            if isinstance(parameter, dict):
+                resolved.append(parameter)
+        return resolved
+
+    def _build_index(self):
+        self._operations = list()
+        self._index = dict()
+        for path, path_item in self.document['paths'].items():
+            path_item = self.resolver.resolve(path_item)
+            shared = self._parameters(path_item.get('parameters'))
+            for method, operation in path_item.items():
+                if method.lower() not in HTTP_METHODS:
+                    continue
+                operation = self.resolver.resolve(operation)
+                parameters = self._parameters(operation.get('parameters'))
+                # the parameters of the operation override the ones of the path with the same name and location
+                overridden = {(p.get('name'), p.get('in')) for p in parameters}
+                parameters.extend(p for p in shared if (p.get('name'), p.get('in')) not in overridden)
+                entry = Operation(path=path, method=method.lower(), parameters=parameters,
+                                  tags=tuple(operation.get('tags', ())), operation_id=operation.get('operationId'),
+                                  consumes=tuple(operation.get('consumes', self.document.get('consumes', ()))))
+                self._operations.append(entry)
+                self._index[(path, entry.method)] = entry
@@ -1,4 +1,6 @@
 from apifuzzer.base_template import BaseTemplate
+from apifuzzer.body_encoders import JSON, MULTIPART, sample_text, sample_value, schema_leaves
+from apifuzzer.spec_loader import ApiSpec
 from apifuzzer.template_generator_base import TemplateGenerator
 from apifuzzer.utils import get_sample_data_by_type, get_fuzz_type_by_param_type, transform_data_to_bytes
 
@@ -14,8 +16,16 @@ class ParamTypes(object):
 
 class SwaggerTemplateGenerator(TemplateGenerator):
 
-    def __init__(self, api_resources, logger):
+    def __init__(self, api_resources, logger, endpoint_filter=None):
+        """
+        :param api_resources: the parsed API definition
+        :param logger: logger of the fuzzer
+        :param endpoint_filter: if set, only the operations matching it get a template
+        :type endpoint_filter: apifuzzer.endpoint_selection.EndpointFilter
+        """
         self.api_resources = api_resources
+        self.endpoint_filter = endpoint_filter
+        self.spec = ApiSpec(api_resources)
         self.templates = list()
         self.logger = logger
         self.logger.info('Logger initialized')
@@ -28,47 +38,77 @@ class SwaggerTemplateGenerator(TemplateGenerator):
 
     def process_api_resources(self):
         self.logger.info('Start preparation')
-        for resource in self.api_resources['paths'].keys():
+        for operation in self.spec.operations():
+            resource = operation.path
+            method = operation.method
+            if self.endpoint_filter is not None and not self.endpoint_filter.matches(operation):
+                self.logger.info('Resource: {} Method: {} is filtered out'.format(resource, method))
+                continue
             normalized_url = self.normalize_url(resource)
-            for method in self.api_resources['paths'][resource].keys():
-                self.logger.info('Resource: {} Method: {}'.format(resource, method))
-                template_container_name = '{}|{}'.format(normalized_url, method)
-                template = BaseTemplate(name=template_container_name)
-                template.url = normalized_url
-                template.method = method.upper()
-                self.logger.debug('Resource: {} Method: {}'.format(resource, method))
-                for param in self.api_resources['paths'][resource][method].get('parameters', {}):
-                    type = param.get('type')
-                    format = param.get('format')
-                    if format is not None:
-                        fuzzer_type = format.lower()
-                    elif type is not None:
-                        fuzzer_type = type.lower()
-                    else:
-                        fuzzer_type = None
-                    fuzz_type = get_fuzz_type_by_param_type(fuzzer_type)
-                    sample_data = get_sample_data_by_type(param.get('type'))
-                    # get parameter placement(in): path, query, header, cookie
-                    # get parameter type: integer, string
-                    # get format if present
-                    param_type = param.get('in')
-                    param_name = '{}|{}'.format(template_container_name, param.get('name'))
-                    self.logger.debug('Resource: {} Method: {} Parameter: {}, Parameter type: {}, Sample data: {},'
-                                      'Param name: {}'
-                                      .format(resource, method, param, param_type, sample_data, param_name))
-                    if param_type == ParamTypes.PATH:
-                        template.path_variables.append(fuzz_type(name=param_name, value=str(sample_data)))
-                    elif param_type == ParamTypes.HEADER:
-                        template.headers.append(fuzz_type(name=param_name, value=transform_data_to_bytes(sample_data)))
-                    elif param_type == ParamTypes.COOKIE:
-                        template.cookies.append(fuzz_type(name=param_name, value=sample_data))
-                    elif param_type == ParamTypes.QUERY:
-                        template.params.append(fuzz_type(name=param_name, value=str(sample_data)))
-                    elif param_type in [ParamTypes.BODY, ParamTypes.FORM_DATA]:
-                        template.data.append(fuzz_type(name=param_name, value=transform_data_to_bytes(sample_data)))
-                    else:
-                        self.logger.error('Can not parse a definition from swagger.json: %s', param)
-                self.templates.append(template)
+            self.logger.info('Resource: {} Method: {}'.format(resource, method))
+            template_container_name = '{}|{}'.format(normalized_url, method)
+            template = BaseTemplate(name=template_container_name)
+            template.url = normalized_url
+            template.method = method.upper()
+            has_body = any(param.get('in') == ParamTypes.BODY for param in operation.parameters)
+            if has_body:
+                template.content_type = JSON
+            elif MULTIPART in operation.consumes:
+                template.content_type = MULTIPART
+            for param in operation.parameters:
+                # the type of a body parameter is defined by its schema
+                schema = self.spec.parameter_schema(param)
+                type = schema.get('type')
+                format = schema.get('format')
+                if format is not None:
+                    fuzzer_type = format.lower()
+                elif type is not None:
+                    fuzzer_type = type.lower()
+                else:
+                    fuzzer_type = None
+                fuzz_type = get_fuzz_type_by_param_type(fuzzer_type)
+                sample_data = get_sample_data_by_type(type)
+                # get parameter placement(in): path, query, header, cookie
+                # get parameter type: integer, string
+                # get format if present
+                param_type = param.get('in')
+                param_name = '{}|{}'.format(template_container_name, param.get('name'))
+                # the definitions can have hundreds of thousands of parameters, the message is formatted lazily
+                self.logger.debug('Resource: %s Method: %s Parameter: %s, Parameter type: %s, Sample data: %s, '
+                                  'Param name: %s', resource, method, param, param_type, sample_data, param_name)
+                if param_type == ParamTypes.PATH:
+                    template.path_variables.append(fuzz_type(name=param_name, value=str(sample_data)))
+                elif param_type == ParamTypes.HEADER:
+                    template.headers.append(fuzz_type(name=param_name, value=transform_data_to_bytes(sample_data)))
+                elif param_type == ParamTypes.COOKIE:
+                    template.cookies.append(fuzz_type(name=param_name, value=sample_data))
+                elif param_type == ParamTypes.QUERY:
+                    template.params.append(fuzz_type(name=param_name, value=str(sample_data)))
+                elif param_type == ParamTypes.BODY:
+                    self.add_body_fields(template, param_name, schema)
+                elif param_type == ParamTypes.FORM_DATA:
+                    if has_body:
+                        self.logger.warning('Resource: %s Method: %s has a body, form parameter %s is left out',
+                                            resource, method, param.get('name'))
+                        continue
+                    template.data.append(fuzz_type(name=param_name, value=transform_data_to_bytes(sample_data)))
+                else:
+                    self.logger.error('Can not parse a definition from swagger.json: %s', param)
+            self.templates.append(template)
+
+    def add_body_fields(self, template, param_name, schema):
+        """
+        Adds a field per leaf of the JSON document of a body parameter, the field names end with the path of the leaf
+        :param template: template of the operation
+        :type template: BaseTemplate
+        :param param_name: name of the body parameter, prefixed with the template name
+        :param schema: schema of the body parameter
+        """
+        for path, leaf_schema in schema_leaves(schema, self.spec.resolver):
+            fuzzer_type = leaf_schema.get('format') or leaf_schema.get('type')
+            fuzz_type = get_fuzz_type_by_param_type(fuzzer_type.lower() if fuzzer_type else None)
+            template.data.append(fuzz_type(name='{}|{}'.format(param_name, path),
+                                           value=sample_text(sample_value(leaf_schema))))
 
     def compile_base_url(self, alternate_url):
         """
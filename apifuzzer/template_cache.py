@@ -0,0 +1,175 @@
+"""
+Cache of the compiled kitty models. Parsing a big API definition, generating its templates and compiling them takes
+much longer than loading the pickled model, so a warm start with the same definition and options skips them.
+"""
+import gc
+import hashlib
+import json
+import os
+import pickle
+import platform
+
+import kitty
+
+from apifuzzer import base_template, body_encoders, custom_fuzzers, spec_loader, swagger_template_generator, utils
+from apifuzzer.utils import set_class_logger
+
+# 2: the models are IndexedGraphModels
+CACHE_VERSION = 2
+CACHE_FILE_SUFFIX = '.model'
+# the cache is invalidated by any change of the code which generates the templates
+GENERATOR_MODULES = (base_template, body_encoders, custom_fuzzers, spec_loader, swagger_template_generator, utils)
+
+
+def spec_digest(path):
+    """
+    :param path: API definition file
+    :return: hex digest of the file, it is not parsed
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _generator_digest():
+    digest = hashlib.sha256()
+    for module in GENERATOR_MODULES:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    digest.update(_kitty_version().encode())
+    return digest.hexdigest()
+
+
+def _kitty_version():
+    try:
+        # imported here, pkg_resources is slow to import
+        import pkg_resources
+    except ImportError:
+        return getattr(kitty, '__version__', '')
+    try:
+        return pkg_resources.get_distribution('kittyfuzzer').version
+    except pkg_resources.DistributionNotFound:
+        return getattr(kitty, '__version__', '')
+
+
+def rekey_graph(model):
+    """
+    The nodes of kitty graphs are keyed by a hash salted with the per process str hash seed, so the graph of a loaded
+    model is keyed again in the current process
+    :param model: model loaded from the cache
+    :type model: kitty.model.GraphModel
+    """
+    nodes = [model._root]
+    connections = list()
+    for node_connections in model._graph.values():
+        connections.extend(node_connections)
+        nodes.extend(connection.dst for connection in node_connections)
+    graph = {node.hash(): list() for node in nodes}
+    for connection in connections:
+        graph[connection.src.hash()].append(connection)
+    model._root_id = model._root.hash()
+    model._graph = graph
+
+
+@set_class_logger
+class TemplateCache(object):
+    """
+    Directory of pickled kitty models, a file per API definition and generator options. The least recently used files
+    are removed above max_entries.
+    """
+
+    def __init__(self, cache_dir, max_entries=32):
+        """
+        :param cache_dir: cache directory, created if missing
+        :param max_entries: maximum number of cached models
+        :type max_entries: int
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._generator = _generator_digest()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, spec_hash, **options):
+        """
+        :param spec_hash: digest of the API definition, see spec_digest
+        :param options: options of the template generation, e.g. the test level
+        :return: cache key
+        :rtype: str
+        """
+        return hashlib.sha256(json.dumps([CACHE_VERSION, platform.python_version(), self._generator, spec_hash,
+                                          sorted(options.items())]).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_FILE_SUFFIX)
+
+    def contains(self, key):
+        return os.path.exists(self.path(key))
+
+    def load_base_url(self, key):
+        """
+        :param key: cache key
+        :return: base url of the cached model, None if the model is not cached
+        :rtype: str
+        """
+        try:
+            with open(self.path(key), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            self.logger.warning('Removing the corrupt template cache file %s', self.path(key))
+            os.remove(self.path(key))
+            return None
+
+    def load_model(self, key):
+        """
+        :param key: cache key
+        :return: a new instance of the cached model
+        :rtype: kitty.model.GraphModel
+        """
+        path = self.path(key)
+        # the model is millions of objects, the garbage collector would walk them over and over while it is loaded
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(path, 'rb') as f:
+                pickle.load(f)
+                model = pickle.load(f)
+            rekey_graph(model)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            raise ValueError('{} is not an APIFuzzer template cache file'.format(path))
+        finally:
+            if gc_enabled:
+                gc.enable()
+        os.utime(path)
+        self.logger.info('Model loaded from %s', path)
+        return model
+
+    def save(self, key, base_url, model):
+        """
+        :param key: cache key
+        :param base_url: base url compiled from the API definition
+        :param model: compiled model, before its first mutation
+        :type model: kitty.model.GraphModel
+        """
+        path = self.path(key)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(base_url, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.logger.info('Model saved to %s', path)
+        self._prune()
+
+    def _prune(self):
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                   if name.endswith(CACHE_FILE_SUFFIX)]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_entries:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
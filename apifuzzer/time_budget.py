@@ -0,0 +1,177 @@
+"""
+Time budget of a session. The tests are a seeded random sample of the mutation space, stratified by template and field:
+every field of every template gets a test before any field gets its next one, so the session can be cut at any time
+and its tests are spread over the whole API. The throughput is measured while the session runs and no test is started
+which would not complete within the budget.
+"""
+import bisect
+from random import Random
+from time import monotonic
+
+from apifuzzer.checkpoint import parse_test_list
+from apifuzzer.utils import set_class_logger
+
+try:
+    from math import gcd
+except ImportError:
+    # math.gcd needs Python 3.5
+    from fractions import gcd
+
+# the projected coverage is logged once this many tests have completed
+THROUGHPUT_SAMPLE_SIZE = 50
+
+
+class _ArmSample(object):
+    """
+    Seeded permutation of the tests of an arm, k -> (stride * k + offset) mod size, so it needs no memory per test
+    """
+
+    def __init__(self, ranges, random):
+        self.ranges = ranges
+        self.starts = list()
+        self.size = 0
+        for start, end in ranges:
+            self.starts.append(self.size)
+            self.size += end - start
+        self.stride = 1
+        if self.size > 1:
+            self.stride = random.randrange(1, self.size)
+            while gcd(self.stride, self.size) != 1:
+                self.stride = random.randrange(1, self.size)
+        self.offset = random.randrange(self.size)
+        self.taken = 0
+
+    def take(self):
+        position = (self.stride * self.taken + self.offset) % self.size
+        self.taken += 1
+        range_position = bisect.bisect_right(self.starts, position) - 1
+        return self.ranges[range_position][0] + position - self.starts[range_position]
+
+
+@set_class_logger
+class TimeBudgetSampler(object):
+    """
+    Schedules a stratified sample of the tests which fits the time budget. The order of the tests only depends on the
+    seed, the throughput of the target only decides how many of them are run.
+    """
+
+    def __init__(self, space, time_budget, seed=0, test_list_str=None, clock=monotonic):
+        """
+        :param space: mutation space of the model
+        :type space: apifuzzer.mutation_scheduler.MutationSpace
+        :param time_budget: time of the tests (seconds), from the first test
+        :type time_budget: float
+        :param seed: seed of the sample
+        :type seed: int
+        :param test_list_str: kitty test list, the sample is taken from it, every test by default
+        :param clock: monotonic clock in seconds
+        """
+        self.space = space
+        self._clock = clock
+        self.time_budget = time_budget
+        self.seed = seed
+        self._random = Random(seed)
+        ranges = [(start, space.num_mutations if end is None else min(end + 1, space.num_mutations))
+                  for start, end in parse_test_list(test_list_str)]
+        self._samples = dict()
+        for arm, (arm_start, arm_end) in enumerate(zip(space.arm_starts, space.arm_ends)):
+            arm_ranges = [(max(start, arm_start), min(end, arm_end)) for start, end in ranges
+                          if start < arm_end and end > arm_start]
+            if arm_ranges:
+                self._samples[arm] = _ArmSample(arm_ranges, self._random)
+        self.total = sum(sample.size for sample in self._samples.values())
+        self._round = list()
+        self._started = None
+        self._stopped = False
+        self.scheduled = 0
+        self.completed = 0
+
+    def _next_round(self):
+        """
+        One test of every arm which has tests left. The templates take turns, so a round cut by the budget still
+        covers the templates evenly.
+        """
+        by_template = dict()
+        for arm, sample in self._samples.items():
+            if sample.taken < sample.size:
+                by_template.setdefault(self.space.arm_templates[arm], list()).append(arm)
+        templates = sorted(by_template)
+        self._random.shuffle(templates)
+        for template in templates:
+            self._random.shuffle(by_template[template])
+        count = sum(len(template_arms) for template_arms in by_template.values())
+        arms = list()
+        turn = 0
+        while len(arms) < count:
+            for template in templates:
+                if turn < len(by_template[template]):
+                    arms.append(by_template[template][turn])
+            turn += 1
+        # popped from the end
+        self._round = arms[::-1]
+
+    def _seconds_per_test(self):
+        if not self.completed:
+            return 0.0
+        return (self._clock() - self._started) / self.completed
+
+    def next_test(self):
+        """
+        :return: index of the next test, None if the sample is complete or the next test wouldn't fit the budget
+        :rtype: int
+        """
+        if self._stopped:
+            return None
+        if self._started is None:
+            self._started = self._clock()
+        # the tests in flight have to complete within the budget too
+        in_flight = self.scheduled - self.completed
+        if self._clock() - self._started + (in_flight + 1) * self._seconds_per_test() > self.time_budget:
+            self.logger.info('Time budget is used up after %d tests', self.scheduled)
+            self._stopped = True
+            return None
+        if not self._round:
+            self._next_round()
+        if not self._round:
+            self._stopped = True
+            return None
+        self.scheduled += 1
+        return self._samples[self._round.pop()].take()
+
+    def exhausted(self):
+        """
+        :return: True if no more tests are scheduled
+        :rtype: bool
+        """
+        return self._stopped
+
+    def observe(self, index, report):
+        """
+        Counts a completed test for the throughput estimate
+        :param index: mutation index of the test
+        :param report: report of the test
+        """
+        self.completed += 1
+        if self.completed == THROUGHPUT_SAMPLE_SIZE:
+            seconds_per_test = self._seconds_per_test()
+            if seconds_per_test:
+                self.logger.info('%.1f tests/s, about %d of %d tests fit the time budget', 1 / seconds_per_test,
+                                 min(self.total, int(self.time_budget / seconds_per_test)), self.total)
+
+    def summary(self):
+        """
+        :return: number of tests run and the covered part of the mutation space
+        :rtype: dict
+        """
+        arms = [arm for arm, sample in self._samples.items() if sample.taken]
+        elapsed = self._clock() - self._started if self._started is not None else 0.0
+        return {
+            'scheduled': self.scheduled,
+            'tests': self.total,
+            'coverage': round(100.0 * self.scheduled / self.total, 2) if self.total else 100.0,
+            'fields': '{}/{}'.format(len(arms), len(self._samples)),
+            'templates': '{}/{}'.format(len(set(self.space.arm_templates[arm] for arm in arms)),
+                                        len(set(self.space.arm_templates[arm] for arm in self._samples))),
+            'seconds': round(elapsed, 1),
+            'tests_per_second': round(self.completed / elapsed, 1) if elapsed else None,
+        }
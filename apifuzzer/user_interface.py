@@ -0,0 +1,30 @@
+from kitty.interfaces import WebInterface
+from kitty.interfaces.base import EmptyInterface
+
+
+class NullInterface(EmptyInterface):
+    """
+    User interface of the headless runs. It doesn't start a thread or listen on a port, and the fuzzer doesn't publish
+    the per test model info for it.
+    """
+    headless = True
+
+    def __init__(self):
+        super(NullInterface, self).__init__('NullInterface')
+        self.failures = 0
+
+    def failure_detected(self):
+        self.failures += 1
+
+
+def get_user_interface(web=True, web_port=26000):
+    """
+    :param web: start the kitty web interface
+    :type web: bool
+    :param web_port: listening port of the web interface
+    :type web_port: int
+    :rtype: kitty.interfaces.base.BaseInterface
+    """
+    if web:
+        return WebInterface(port=web_port)
+    return NullInterface()
@@ -0,0 +1,69 @@
+"""
+Measures the per test overhead of the kitty web interface compared to the headless NullInterface. The runs alternate
+between the two modes against a local stand-in server.
+Usage: python -m benchmarks.bench_interface [--spec FILE] [--repeat N]
+"""
+import argparse
+import json
+import os
+import socket
+import tempfile
+import time
+
+from benchmarks.stand_in_server import StandInServer
+from fuzzer import Fuzzer
+
+DEFAULT_SPEC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test',
+                            'test_swagger_definition.json')
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def run_once(api_resources, url, web):
+    """
+    :return: duration of the session and the number of tests
+    """
+    prog = Fuzzer(api_resources=api_resources, report_dir=tempfile.mkdtemp(), test_level=1, log_level='error',
+                  alternate_url=url, web=web, web_port=free_port())
+    prog.prepare()
+    num_tests = prog.compile_model().num_mutations()
+    start = time.perf_counter()
+    try:
+        prog.run_fuzzer()
+    except SystemExit:
+        pass
+    return time.perf_counter() - start, num_tests
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web interface overhead benchmark')
+    parser.add_argument('--spec', type=str, default=DEFAULT_SPEC, help='API definition to fuzz')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of sessions per mode, the best is reported')
+    args = parser.parse_args()
+    with open(args.spec, mode='r', encoding='utf-8') as f:
+        api_resources = json.loads(f.read())
+    server = StandInServer().start()
+    durations = {'web': list(), 'headless': list()}
+    num_tests = 0
+    try:
+        for _ in range(args.repeat):
+            for mode in ('web', 'headless'):
+                duration, num_tests = run_once(api_resources, server.url, web=mode == 'web')
+                durations[mode].append(duration)
+    finally:
+        server.stop()
+    result = {'tests': num_tests}
+    for mode, values in durations.items():
+        result['{}_ms_per_test'.format(mode)] = round(min(values) / num_tests * 1000, 4)
+    result['overhead_ms_per_test'] = round(result['web_ms_per_test'] - result['headless_ms_per_test'], 4)
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
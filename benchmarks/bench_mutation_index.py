@@ -0,0 +1,81 @@
+"""
+Cost of reaching a test deep in the model, as a shard, a resumed session or a sample starts: kitty's skip from the
+first test against a seek of the mutation index, on synthetic API definitions of increasing size. The index is built
+once per model, its build time is reported separately.
+Usage: python -m benchmarks.bench_mutation_index [--paths 10 100 1000] [--seeks N]
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+
+from kitty.model import GraphModel
+
+from apifuzzer.mutation_index import MutationIndex
+from benchmarks.bench_throughput import synthetic_spec
+from fuzzer import Fuzzer
+
+
+def compile_model(paths):
+    prog = Fuzzer(api_resources=synthetic_spec(paths), report_dir=tempfile.mkdtemp(), test_level=1,
+                  log_level='critical', web=False)
+    prog.prepare()
+    return prog.compile_model()
+
+
+def skip_cost(model, indices):
+    """
+    :return: mean time of kitty's skip from a reset model to the indices (milliseconds)
+    """
+    duration = 0.0
+    for index in indices:
+        model._current_index = -1
+        model._sequence_idx = -1
+        model._update_state(0)
+        for sequence in model._sequences:
+            sequence[-1].dst.reset()
+        start = time.perf_counter()
+        # the compiled model seeks in its own skip
+        GraphModel.skip(model, index)
+        model.mutate()
+        duration += time.perf_counter() - start
+    return duration / len(indices) * 1000
+
+
+def seek_cost(index, indices):
+    """
+    :return: mean time of a seek and mutation of the index (milliseconds)
+    """
+    start = time.perf_counter()
+    for mutation_index in indices:
+        index.apply(mutation_index)
+    return (time.perf_counter() - start) / len(indices) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mutation index benchmark')
+    parser.add_argument('--paths', type=int, nargs='+', default=[10, 100, 1000], help='Sizes of the API definitions')
+    parser.add_argument('--seeks', type=int, default=20, help='Number of random indices per size')
+    args = parser.parse_args()
+    results = list()
+    for paths in args.paths:
+        model = compile_model(paths)
+        num_mutations = model.num_mutations()
+        indices = random.Random(0).sample(range(num_mutations), min(args.seeks, num_mutations))
+        indexed_model = compile_model(paths)
+        start = time.perf_counter()
+        index = MutationIndex(indexed_model)
+        build_time = time.perf_counter() - start
+        results.append({
+            'paths': paths,
+            'mutations': num_mutations,
+            'skip_ms': round(skip_cost(model, indices), 3),
+            'seek_ms': round(seek_cost(index, indices), 3),
+            'index_build_ms': round(build_time * 1000, 3),
+        })
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Compares the single pass sanitizer with the former trial and error setopt() loops on values rendered like the
+RandomBitsField values of the fuzzer. Usage: python -m benchmarks.bench_sanitizer [--values N] [--length BYTES]
+"""
+import argparse
+import json
+import random
+import timeit
+
+import pycurl
+
+from apifuzzer.sanitizer import dict_to_query_string, sanitize_headers, sanitize_query_params, sanitize_url
+
+
+def legacy_url(url):
+    _dummy_curl = pycurl.Curl()
+    _tmp_url_list = list()
+    for part in url.split('/'):
+        while True:
+            try:
+                _dummy_curl.setopt(pycurl.URL, '/'.join(_tmp_url_list + [part]))
+                _tmp_url_list.append(part)
+                break
+            except (UnicodeEncodeError, ValueError):
+                if len(part):
+                    part = part[1:]
+                else:
+                    _tmp_url_list.append("-")
+                    break
+    return '/'.join(_tmp_url_list)
+
+
+def legacy_query_param(url, query_params):
+    _dummy_curl = pycurl.Curl()
+    _tmp_query_params = dict()
+    for k, v in query_params.items():
+        _query_param_name = k.split('|')[-1]
+        while True:
+            _test_query_params = _tmp_query_params.copy()
+            _test_query_params[_query_param_name] = v
+            try:
+                _dummy_curl.setopt(pycurl.URL, '{}{}'.format(url, dict_to_query_string(_test_query_params)))
+                _tmp_query_params[_query_param_name] = v
+                break
+            except (UnicodeEncodeError, ValueError):
+                if len(v):
+                    v = v[:-1]
+                else:
+                    _tmp_query_params[_query_param_name] = ""
+                    break
+    return dict_to_query_string(_tmp_query_params)
+
+
+def legacy_header(headers):
+    _dummy_curl = pycurl.Curl()
+    _tmp = dict()
+    for k, v in headers.items():
+        original_value = v
+        chop_left = True
+        while True:
+            try:
+                _dummy_curl.setopt(pycurl.HTTPHEADER, ['{}: {}'.format(k, v).encode()])
+                _tmp[k] = v
+                break
+            except ValueError:
+                if len(v):
+                    if chop_left:
+                        v = v[1:]
+                        if len(v) == 0:
+                            chop_left = False
+                            v = original_value
+                    else:
+                        v = v[:-1]
+                else:
+                    _tmp[k] = ""
+                    break
+    return ['{}: {}'.format(k, v).encode() for k, v in _tmp.items()]
+
+
+def random_values(count, length, seed=1235):
+    rnd = random.Random(seed)
+    return [bytes(rnd.getrandbits(8) for _ in range(length)).decode(errors='ignore') for _ in range(count)]
+
+
+def hot_path(url_fn, query_fn, header_fn, values):
+    for value in values:
+        url = url_fn('http://127.0.0.1:5000/exception/{}'.format(value))
+        query_fn(url, {'query|q': value, 'query|r': value})
+        header_fn({'User-Agent': 'APIFuzzer', 'X-Fuzz': value})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sanitizer benchmark')
+    parser.add_argument('--values', type=int, default=200, help='Number of fuzz values')
+    parser.add_argument('--length', type=int, default=100, help='Length of a fuzz value in bytes')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of measurements, the best is reported')
+    args = parser.parse_args()
+    values = random_values(args.values, args.length)
+    for value in values:
+        url = 'http://127.0.0.1:5000/exception/{}'.format(value)
+        assert sanitize_url(url) == legacy_url(url)
+        assert sanitize_query_params(url, {'q': value}) == legacy_query_param(url, {'q': value})
+        assert sanitize_headers({'X-Fuzz': value}) == legacy_header({'X-Fuzz': value})
+    result = dict(values=args.values, length=args.length)
+    for name, fns in ('legacy', (legacy_url, legacy_query_param, legacy_header)), \
+                     ('sanitizer', (sanitize_url, sanitize_query_params, sanitize_headers)):
+        best = min(timeit.repeat(lambda: hot_path(*fns, values=values), number=1, repeat=args.repeat))
+        result['{}_us_per_value'.format(name)] = round(best / args.values * 1e6, 2)
+    result['speedup'] = round(result['legacy_us_per_value'] / result['sanitizer_us_per_value'], 1)
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Measures the per test cost of the kitty session stores. The store alone is measured by the calls a session makes
+to it for every test, the session info and the report of every failed test, with the given share of failures and with
+an in memory and a file database. The whole sessions run against a local stand-in server which fails every test, so
+every report is stored.
+Usage: python -m benchmarks.bench_session_store [--tests N] [--failure-rate R] [--spec FILE] [--repeat N]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from kitty.data.data_manager import SessionInfo
+from kitty.data.report import Report
+
+from apifuzzer.session_store import FAILURES, SESSION_STORES, get_data_manager
+from benchmarks.bench_interface import DEFAULT_SPEC
+from benchmarks.stand_in_server import StandInServer
+from fuzzer import Fuzzer
+
+
+def store_cost(session_store, dbname, tests, failure_rate):
+    """
+    :return: time of the store calls per test (milliseconds)
+    """
+    dataman = get_data_manager(session_store, dbname, commit_interval=1.0)
+    dataman.start()
+    info = SessionInfo()
+    failure_every = int(1 / failure_rate) if failure_rate else 0
+    start = time.perf_counter()
+    for test_number in range(tests):
+        info.current_index = test_number
+        failed = failure_every and test_number % failure_every == 0
+        if failed:
+            report = Report('target')
+            report.failed('Return code 500 is not in the expected list')
+            report.add('response', 'x' * 1024)
+            dataman.store_report(report, test_number)
+            info.failure_count += 1
+        if failed or session_store != FAILURES:
+            dataman.set_session_info(info)
+            dataman.set('fuzzer_name', 'OpenApiServerFuzzer')
+            dataman.set('session_file_name', dbname)
+    # the queued writes of the batched store are part of its cost
+    dataman.get_report_list()
+    duration = time.perf_counter() - start
+    dataman.stop()
+    return duration / tests * 1000
+
+
+def session_cost(api_resources, url, session_store, repeat):
+    """
+    :return: duration of the best session per test (milliseconds) and the number of tests
+    """
+    durations = list()
+    num_tests = 0
+    for _ in range(repeat):
+        prog = Fuzzer(api_resources=api_resources, report_dir=tempfile.mkdtemp(), test_level=1, log_level='error',
+                      alternate_url=url, web=False, session_store=session_store)
+        prog.prepare()
+        num_tests = prog.compile_model().num_mutations()
+        start = time.perf_counter()
+        try:
+            prog.run_fuzzer()
+        except SystemExit:
+            pass
+        durations.append(time.perf_counter() - start)
+    return min(durations) / num_tests * 1000, num_tests
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Session store benchmark')
+    parser.add_argument('--tests', type=int, default=5000, help='Number of tests of the store benchmark')
+    parser.add_argument('--failure-rate', type=float, default=0.3, help='Share of the failed tests')
+    parser.add_argument('--spec', type=str, default=DEFAULT_SPEC, help='API definition of the sessions')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of sessions per store, the best is reported')
+    args = parser.parse_args()
+    result = {'tests': args.tests, 'failure_rate': args.failure_rate, 'store_ms_per_test': dict()}
+    for session_store in SESSION_STORES:
+        for database in ('memory', 'file'):
+            dbname = ':memory:'
+            if database == 'file':
+                dbname = os.path.join(tempfile.mkdtemp(), 'session.sqlite')
+            result['store_ms_per_test']['{}/{}'.format(session_store, database)] = \
+                round(store_cost(session_store, dbname, args.tests, args.failure_rate), 4)
+    with open(args.spec, mode='r', encoding='utf-8') as f:
+        api_resources = json.loads(f.read())
+    server = StandInServer(status=500).start()
+    result['session_ms_per_test'] = dict()
+    try:
+        for session_store in SESSION_STORES:
+            cost, result['session_tests'] = session_cost(api_resources, server.url, session_store, args.repeat)
+            result['session_ms_per_test'][session_store] = round(cost, 4)
+    finally:
+        server.stop()
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Fuzzing throughput on synthetic API definitions of increasing size against a local stand-in server. Every size runs
+in its own process, which reports the tests per second, the latency percentiles of the phases of a test and its peak
+RSS. The tests are sampled from the whole model in evenly spread ranges, so big models are measured in a fixed time.
+Usage: python -m benchmarks.bench_throughput [--paths 10 100 1000] [--tests N] [--status CODE] [--output FILE]
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import time
+from functools import wraps
+
+import pycurl
+
+from apifuzzer.fuzzer_target import FuzzerTarget
+from apifuzzer.server_fuzzer import OpenApiServerFuzzer
+from apifuzzer.user_interface import NullInterface
+from benchmarks.stand_in_server import StandInServer
+from fuzzer import Fuzzer
+
+# (class, method, phase): where the time of a test goes in sequential mode
+PHASES = (
+    (OpenApiServerFuzzer, '_next_mutation', 'mutate'),
+    (OpenApiServerFuzzer, '_render_payload', 'render'),
+    (FuzzerTarget, 'prepare_request', 'prepare'),
+    (FuzzerTarget, 'setup_curl', 'format'),
+    (FuzzerTarget, 'process_response', 'process'),
+    (FuzzerTarget, 'post_test', 'report'),
+    (OpenApiServerFuzzer, '_run_sequence', 'test'),
+)
+RANGES = 10
+
+
+def synthetic_spec(paths):
+    """
+    :param paths: number of paths
+    :return: swagger definition, every path has a GET with a path and two query parameters, every second one a POST
+             with two form parameters
+    """
+    spec = {'swagger': '2.0', 'info': {'title': 'Synthetic API'}, 'host': 'localhost', 'schemes': ['http'],
+            'basePath': '/', 'paths': dict()}
+    for index in range(paths):
+        operations = {
+            'get': {'parameters': [
+                {'name': 'id', 'in': 'path', 'required': True, 'type': 'integer'},
+                {'name': 'limit', 'in': 'query', 'type': 'integer'},
+                {'name': 'q', 'in': 'query', 'type': 'string'},
+            ]},
+        }
+        if index % 2:
+            operations['post'] = {'parameters': [
+                {'name': 'name', 'in': 'formData', 'type': 'string'},
+                {'name': 'value', 'in': 'formData', 'type': 'number'},
+            ]}
+        spec['paths']['/resource{}/{{id}}'.format(index)] = operations
+    return spec
+
+
+def spread_test_list(num_mutations, tests):
+    """
+    :return: kitty test list of about `tests` tests in ranges spread evenly over the model
+    """
+    if tests >= num_mutations:
+        return '0-{}'.format(num_mutations - 1)
+    length = max(1, tests // RANGES)
+    stride = num_mutations // RANGES
+    return ','.join('{}-{}'.format(start, start + length - 1) for start in range(0, stride * RANGES, stride))
+
+
+def timed(func, samples):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+def percentiles(samples):
+    """
+    :param samples: durations (seconds)
+    :return: count and the percentiles in milliseconds
+    """
+    if not samples:
+        return {'count': 0}
+    samples = sorted(samples)
+
+    def at(ratio):
+        return round(samples[min(len(samples) - 1, int(len(samples) * ratio))] * 1000, 4)
+    return {'count': len(samples), 'p50': at(0.5), 'p90': at(0.9), 'p99': at(0.99), 'max': at(1)}
+
+
+def instrument():
+    """
+    Wraps the methods of the phases with timers, only in the benchmark process of a size
+    :return: samples by phase
+    """
+    samples = {phase: list() for _, _, phase in PHASES}
+    samples['network'] = list()
+    for cls, name, phase in PHASES:
+        setattr(cls, name, timed(getattr(cls, name), samples[phase]))
+    build_response = FuzzerTarget.build_response
+
+    def build_response_with_network_time(self, _curl, request, resp_buff_hdrs, resp_buff_body):
+        samples['network'].append(_curl.getinfo(pycurl.TOTAL_TIME))
+        return build_response(self, _curl, request, resp_buff_hdrs, resp_buff_body)
+    FuzzerTarget.build_response = build_response_with_network_time
+    return samples
+
+
+def run_size(paths, tests, url, report_format, connection):
+    random.seed(0)
+    samples = instrument()
+    start = time.perf_counter()
+    prog = Fuzzer(api_resources=synthetic_spec(paths), report_dir=tempfile.mkdtemp(), test_level=1,
+                  log_level='critical', alternate_url=url, report_format=report_format, web=False)
+    prog.prepare()
+    num_mutations = prog.compile_model().num_mutations()
+    compile_time = time.perf_counter() - start
+    test_list_str = spread_test_list(num_mutations, tests)
+    start = time.perf_counter()
+    try:
+        prog.run_fuzzer(test_list_str=test_list_str, interface=NullInterface())
+    except SystemExit:
+        pass
+    duration = time.perf_counter() - start
+    tested = len(samples['test'])
+    connection.send({
+        'paths': paths,
+        'mutations': num_mutations,
+        'tests': tested,
+        'compile_s': round(compile_time, 3),
+        'duration_s': round(duration, 3),
+        'tests_per_s': round(tested / duration, 1) if duration else None,
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+        'phases_ms': {phase: percentiles(values) for phase, values in samples.items()},
+    })
+    connection.close()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], stderr=subprocess.DEVNULL)\
+            .decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fuzzing throughput benchmark')
+    parser.add_argument('--paths', type=int, nargs='+', default=[10, 100, 1000], help='Sizes of the API definitions')
+    parser.add_argument('--tests', type=int, default=1000, help='Number of tests per size')
+    parser.add_argument('--status', type=int, default=500,
+                        help='Status code of the stand-in server, failures exercise the report writing')
+    parser.add_argument('--delay', type=float, default=0.0, help='Response time of the stand-in server (seconds)')
+    parser.add_argument('--report-format', type=str, default='files', choices=['files', 'ndjson'])
+    parser.add_argument('--output', type=str, default=None, help='Save the results to this file too')
+    args = parser.parse_args()
+    server = StandInServer(delay=args.delay, status=args.status).start()
+    results = list()
+    context = multiprocessing.get_context('fork')
+    try:
+        for paths in args.paths:
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=run_size, args=(paths, args.tests, server.url, args.report_format,
+                                                             sender))
+            process.start()
+            sender.close()
+            results.append(receiver.recv())
+            process.join()
+    finally:
+        server.stop()
+    output = json.dumps({
+        'benchmark': 'throughput',
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'status': args.status,
+        'delay': args.delay,
+        'report_format': args.report_format,
+        'results': results,
+    })
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
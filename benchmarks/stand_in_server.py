@@ -0,0 +1,69 @@
+"""
+Local HTTP server standing in for the fuzzed API in the benchmarks. It answers every request with a small body and
+keeps the connections alive, so the measurements are dominated by the fuzzer and not by the target.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+from apifuzzer.metrics import ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # the response is sent in one segment, otherwise delayed ACKs add 40ms to every keep-alive request
+    wbufsize = 65536
+    disable_nagle_algorithm = True
+
+    def _answer(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.server.requests += 1
+        body = b'{"status": "ok"}'
+        self.send_response(self.server.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = do_HEAD = do_OPTIONS = _answer
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(object):
+
+    def __init__(self, delay=0.0, status=200, host='127.0.0.1', port=0):
+        """
+        :param delay: response time of every request (seconds)
+        :param status: status code of every response
+        :param port: listening port, a free one is chosen if 0
+        """
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.delay = delay
+        self._server.status = status
+        self._server.requests = 0
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stand-in-server')
+        self._thread.daemon = True
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    @property
+    def requests(self):
+        return self._server.requests
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
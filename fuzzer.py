@@ -2,7 +2,10 @@
 from __future__ import print_function
 
 import argparse
+import hashlib
 import json
+import multiprocessing
+import os
 import sys
 
 from logging import _nameToLevel as levelNames
@@ -10,19 +13,45 @@ import signal
 import tempfile
 
 
-from kitty.interfaces import WebInterface
-from kitty.model import GraphModel
+from kitty.data.data_manager import SessionInfo
 
 from apifuzzer.swagger_template_generator import SwaggerTemplateGenerator
 from apifuzzer.fuzzer_target import FuzzerTarget
 from apifuzzer.server_fuzzer import OpenApiServerFuzzer
+from apifuzzer.checkpoint import Checkpoint, model_fingerprint
+from apifuzzer.corpus import Corpus, CorpusReplayer, export_corpus
+from apifuzzer.distributed import DEFAULT_LEASE_SIZE, DEFAULT_LEASE_TIMEOUT, Coordinator, Worker, parse_address
+from apifuzzer.endpoint_selection import EndpointBudget, EndpointFilter
+from apifuzzer.event_logger import get_event_logger
+from apifuzzer.failure_buckets import FailureBuckets
+from apifuzzer.metrics import get_metrics
+from apifuzzer.minimizer import ReportMinimizer, load_report
+from apifuzzer.mutation_index import IndexedGraphModel
+from apifuzzer.mutation_scheduler import MutationSpace, NoveltyScheduler
+from apifuzzer.rate_control import RateController
+from apifuzzer.replay import ReportReplayer
+from apifuzzer.report_sink import get_report_sink
+from apifuzzer.response_buffer import DEFAULT_MAX_RESPONSE_BYTES
+from apifuzzer.session_store import SESSION_STORES, SQLITE
+from apifuzzer.sharding import merge_shard_results, split_test_range, write_shard_stats
+from apifuzzer.spec_loader import load_spec
+from apifuzzer.template_cache import TemplateCache, spec_digest
+from apifuzzer.time_budget import TimeBudgetSampler
+from apifuzzer.user_interface import NullInterface, get_user_interface
 from apifuzzer.utils import set_logger
 
 
 class Fuzzer(object):
 
-    def __init__(self, api_resources, report_dir, test_level, log_level, basic_output, alternate_url=None, test_result_dst=None,
-                 auth_headers=None):
+    def __init__(self, api_resources, report_dir, test_level, log_level, basic_output=False, alternate_url=None,
+                 test_result_dst=None, auth_headers=None, concurrency=1, curl_pool_size=None, workers=1, event_log=None,
+                 report_format='files', report_compression=None, report_rotate_size=64, max_rps=None,
+                 adaptive_concurrency=False, latency_target=None, web=True, web_port=26000, state_file=None,
+                 checkpoint_interval=30, resume=False, failure_exemplars=None, template_cache=None, spec_hash=None,
+                 endpoint_filter=None, max_tests_per_endpoint=None, max_time_per_endpoint=None,
+                 scheduler='sequential', time_budget=None, seed=0, metrics_port=None, metrics_file=None,
+                 max_response_bytes=DEFAULT_MAX_RESPONSE_BYTES, session_store=SQLITE, session_commit_interval=1.0,
+                 lease_size=DEFAULT_LEASE_SIZE, lease_timeout=DEFAULT_LEASE_TIMEOUT, cluster_token=None):
         self.api_resources = api_resources
         self.base_url = None
         self.alternate_url = alternate_url
@@ -31,29 +60,348 @@ class Fuzzer(object):
         self.report_dir = report_dir
         self.test_result_dst = test_result_dst
         self.auth_headers = auth_headers if auth_headers else {}
+        self.concurrency = concurrency
+        self.curl_pool_size = curl_pool_size if curl_pool_size else concurrency
+        self.workers = workers
+        self.event_log = event_log
+        self.report_format = report_format
+        self.report_compression = report_compression
+        self.report_rotate_size = report_rotate_size
+        self.max_rps = max_rps
+        self.adaptive_concurrency = adaptive_concurrency
+        self.latency_target = latency_target
+        self.web = web
+        self.web_port = web_port
+        self.state_file = state_file
+        self.checkpoint_interval = checkpoint_interval
+        self.resume = resume
+        self.failure_exemplars = failure_exemplars
+        self.template_cache = template_cache
+        self.spec_hash = spec_hash
+        self.template_cache_key = None
+        self.endpoint_filter = endpoint_filter
+        self.max_tests_per_endpoint = max_tests_per_endpoint
+        self.max_time_per_endpoint = max_time_per_endpoint
+        self.scheduler = scheduler
+        self.time_budget = time_budget
+        self.seed = seed
+        self.metrics_port = metrics_port
+        self.metrics_file = metrics_file
+        self.max_response_bytes = max_response_bytes
+        self.session_store = session_store
+        self.session_commit_interval = session_commit_interval
+        self.lease_size = lease_size
+        self.lease_timeout = lease_timeout
+        self.cluster_token = cluster_token
         self.logger = set_logger(log_level, basic_output)
         self.logger.info('APIFuzzer initialized')
 
     def prepare(self):
+        if self.template_cache is not None:
+            self.template_cache_key = self.get_template_cache_key()
+            base_url = self.template_cache.load_base_url(self.template_cache_key)
+            if base_url is not None:
+                # warm start, compile_model loads the cached model
+                self.base_url = base_url
+                return
         # here we will be able to branch the template generator if we will support other than Swagger
-        template_generator = SwaggerTemplateGenerator(self.api_resources, logger=self.logger)
+        template_generator = SwaggerTemplateGenerator(self.api_resources, logger=self.logger,
+                                                      endpoint_filter=self.endpoint_filter)
         template_generator.process_api_resources()
         self.templates = template_generator.templates
         self.base_url = template_generator.compile_base_url(self.alternate_url)
 
-    def run(self):
-        target = FuzzerTarget(name='target', base_url=self.base_url, report_dir=self.report_dir,
-                              auth_headers=self.auth_headers, logger=self.logger)
-        interface = WebInterface()
-        model = GraphModel()
+    def get_template_cache_key(self):
+        """
+        :return: template cache key of the API definition and the options of the template generation
+        :rtype: str
+        """
+        spec_hash = self.spec_hash
+        if spec_hash is None:
+            spec_hash = hashlib.sha256(json.dumps(self.api_resources, sort_keys=True).encode()).hexdigest()
+        return self.template_cache.key(spec_hash, test_level=self.test_level, alternate_url=self.alternate_url,
+                                       endpoint_filter=self.endpoint_filter.options() if self.endpoint_filter
+                                       else None)
+
+    def compile_model(self):
+        if self.templates is None and self.template_cache_key is not None:
+            return self.template_cache.load_model(self.template_cache_key)
+        model = IndexedGraphModel()
         for template in self.templates:
             model.connect(template.compile_template())
-        fuzzer = OpenApiServerFuzzer()
+        if self.template_cache is not None and not self.template_cache.contains(self.template_cache_key):
+            self.template_cache.save(self.template_cache_key, self.base_url, model)
+        return model
+
+    def create_target(self, report_dir=None, event_log=None, max_rps=None, metrics_port=None, metrics_file=None):
+        """
+        :param report_dir: report directory if not the configured one
+        :param event_log: structured event log file if not the configured one
+        :param max_rps: request rate limit if not the configured one
+        :param metrics_port: port of the metrics endpoint if not the configured one
+        :param metrics_file: metrics file if not the configured one
+        :rtype: FuzzerTarget
+        """
+        failure_buckets = None
+        if self.failure_exemplars is not None:
+            failure_buckets = FailureBuckets(report_dir or self.report_dir, exemplars=self.failure_exemplars)
+        return FuzzerTarget(name='target', base_url=self.base_url, report_dir=report_dir or self.report_dir,
+                            auth_headers=self.auth_headers, logger=self.logger,
+                            curl_pool_size=self.curl_pool_size,
+                            event_logger=get_event_logger(event_log or self.event_log),
+                            report_sink=get_report_sink(report_dir or self.report_dir,
+                                                        report_format=self.report_format,
+                                                        compression=self.report_compression,
+                                                        rotate_size=self.report_rotate_size * 1024 * 1024),
+                            rate_controller=RateController(max_concurrency=self.concurrency,
+                                                           max_rps=max_rps or self.max_rps,
+                                                           adaptive=self.adaptive_concurrency,
+                                                           latency_target=self.latency_target),
+                            failure_buckets=failure_buckets,
+                            metrics=get_metrics(port=metrics_port if metrics_port is not None else self.metrics_port,
+                                                path=metrics_file or self.metrics_file),
+                            max_response_bytes=self.max_response_bytes)
+
+    def export_corpus(self, path):
+        """
+        Renders every test of the model into a corpus file
+        :param path: corpus file path
+        :return: number of exported tests
+        """
+        return export_corpus(self.compile_model(), path, self.logger)
+
+    def replay_corpus(self, path):
+        """
+        Sends the tests of a corpus file exported earlier, the kitty model is not built
+        :param path: corpus file path
+        :return: number of tests and failures
+        """
+        if self.base_url is None:
+            self.base_url = SwaggerTemplateGenerator(self.api_resources, logger=self.logger)\
+                .compile_base_url(self.alternate_url)
+        target = self.create_target()
+        corpus = Corpus(path)
+        try:
+            return CorpusReplayer(target, corpus, concurrency=self.concurrency).run()
+        finally:
+            corpus.close()
+            target.teardown()
+
+    def replay_reports(self, path):
+        """
+        Sends the requests of the saved failure reports again and compares their outcomes, the kitty model is not built
+        :param path: report directory of an earlier session
+        :return: summary of the replay
+        :rtype: dict
+        """
+        # the replay saves no reports, the bucket summary of the earlier session is kept too
+        self.failure_exemplars = None
+        target = self.create_target()
+        try:
+            return ReportReplayer(target, path, url=self.alternate_url, concurrency=self.concurrency).run()
+        finally:
+            target.teardown()
+
+    def minimize_report(self, path, test_number=None):
+        """
+        Shrinks the request of a failure report and saves the minimal reproducer to minimized_{test number}.json in the
+        report directory
+        :param path: report file or report directory of an earlier session
+        :param test_number: test number of the report in the report directory
+        :return: report of the minimal request, None if the failure doesn't reproduce
+        :rtype: dict
+        """
+        report = load_report(path, test_number)
+        # the candidates are not reported
+        self.failure_exemplars = None
+        target = self.create_target()
+        try:
+            reproducer = ReportMinimizer(target, report, url=self.alternate_url, concurrency=self.concurrency).run()
+        finally:
+            target.teardown()
+        if reproducer is not None:
+            os.makedirs(self.report_dir, exist_ok=True)
+            reproducer_path = os.path.join(self.report_dir, 'minimized_{}.json'.format(report.get('test_number')))
+            with open(reproducer_path, 'w') as f:
+                f.write(json.dumps(reproducer))
+            self.logger.info('Minimal reproducer is saved to %s', reproducer_path)
+        return reproducer
+
+    def run(self):
+        if self.workers > 1:
+            self.run_workers()
+        else:
+            self.run_fuzzer()
+
+    def run_fuzzer(self, report_dir=None, test_list_str=None, stats_file=None, interface=None, event_log=None,
+                   max_rps=None, state_file=None, metrics_port=None, metrics_file=None):
+        """
+        Runs one fuzzer in the current process
+        :param report_dir: report directory if not the configured one
+        :param test_list_str: kitty test list to run instead of all tests, e.g. '0-99'
+        :param stats_file: file to save the session stats to at the end of the session
+        :param interface: kitty user interface, the configured one if not set
+        :param event_log: structured event log file if not the configured one
+        :param max_rps: request rate limit if not the configured one
+        :param state_file: checkpoint state file if not the configured one
+        :param metrics_port: port of the metrics endpoint if not the configured one
+        :param metrics_file: metrics file if not the configured one
+        """
+        target = self.create_target(report_dir=report_dir, event_log=event_log, max_rps=max_rps,
+                                    metrics_port=metrics_port, metrics_file=metrics_file)
+        if self.scheduler == 'novelty':
+            # the novelty of the passed tests is scored by their response body too
+            target.keep_responses = True
+        interface = interface if interface else get_user_interface(self.web, self.web_port)
+        model = self.compile_model()
+        state_file = state_file or self.state_file
+        checkpoint = Checkpoint(state_file, interval=self.checkpoint_interval) if state_file else None
+        endpoint_budget = None
+        if self.max_tests_per_endpoint or self.max_time_per_endpoint:
+            endpoint_budget = EndpointBudget(model, max_tests=self.max_tests_per_endpoint,
+                                             max_time=self.max_time_per_endpoint)
+        scheduler = None
+        if self.scheduler == 'novelty':
+            scheduler = NoveltyScheduler(MutationSpace(model), test_list_str=test_list_str)
+        elif self.time_budget:
+            scheduler = TimeBudgetSampler(MutationSpace(model), self.time_budget, seed=self.seed,
+                                          test_list_str=test_list_str)
+        fuzzer = OpenApiServerFuzzer(concurrency=self.concurrency, stats_file=stats_file, checkpoint=checkpoint,
+                                     endpoint_budget=endpoint_budget, scheduler=scheduler,
+                                     session_store=self.session_store,
+                                     session_commit_interval=self.session_commit_interval)
+        if test_list_str:
+            fuzzer.set_test_list(test_list_str)
         fuzzer.set_model(model)
         fuzzer.set_target(target)
         fuzzer.set_interface(interface)
+        if self.resume and checkpoint is not None:
+            state = checkpoint.load()
+            if state is None:
+                self.logger.info('No state file found at {}, starting from the first test'.format(state_file))
+            elif not fuzzer.resume(state):
+                self.logger.info('No tests left in the session of {}'.format(state_file))
+                if stats_file:
+                    write_shard_stats(stats_file, SessionInfo.from_dict(state['session_info']), state['tested'])
+                target.teardown()
+                return
         fuzzer.start()
 
+    def run_workers(self):
+        """
+        Splits the tests into disjoint ranges, runs one fuzzer process per range and merges their reports and
+        session stats into the report directory
+        """
+        test_lists = split_test_range(self.compile_model().num_mutations(), self.workers)
+        self.logger.info('Running {} workers on the test ranges: {}'.format(len(test_lists), test_lists))
+        shard_dirs = list()
+        stats_files = list()
+        workers = list()
+        for worker_id, test_list_str in enumerate(test_lists):
+            shard_dir = os.path.join(self.report_dir, 'worker_{}'.format(worker_id))
+            os.makedirs(shard_dir, exist_ok=True)
+            stats_file = os.path.join(self.report_dir, 'worker_{}_stats.json'.format(worker_id))
+            # the workers share the port of the web interface, so they run headless
+            worker = multiprocessing.Process(target=self.run_fuzzer,
+                                             kwargs={'report_dir': shard_dir,
+                                                     'test_list_str': test_list_str,
+                                                     'stats_file': stats_file,
+                                                     'interface': NullInterface(),
+                                                     'event_log': self.worker_event_log(worker_id),
+                                                     'state_file': self.worker_state_file(worker_id),
+                                                     'metrics_port': self.worker_metrics_port(worker_id),
+                                                     'metrics_file': self.worker_metrics_file(worker_id),
+                                                     # the rate limit is shared by the workers
+                                                     'max_rps': self.max_rps / len(test_lists) if self.max_rps
+                                                     else None})
+            worker.start()
+            shard_dirs.append(shard_dir)
+            stats_files.append(stats_file)
+            workers.append(worker)
+        for worker in workers:
+            worker.join()
+            if worker.exitcode:
+                self.logger.error('Worker {} exited with {}'.format(worker.pid, worker.exitcode))
+        report_sink = None
+        if self.failure_exemplars is not None:
+            report_sink = get_report_sink(self.report_dir, report_format=self.report_format,
+                                          compression=self.report_compression,
+                                          rotate_size=self.report_rotate_size * 1024 * 1024)
+        stats = merge_shard_results(shard_dirs, stats_files, self.report_dir, report_sink=report_sink,
+                                    failure_exemplars=self.failure_exemplars)
+        with open(os.path.join(self.report_dir, 'session_stats.json'), 'w') as stats_file:
+            stats_file.write(json.dumps(stats))
+        self.logger.info('Workers finished, session stats: {}'.format(stats))
+        return stats
+
+    def run_coordinator(self, address):
+        """
+        Leases the test ranges to the workers connecting to the address and merges their reports and session stats
+        into the report directory, the coordinator doesn't send requests itself
+        :param address: host:port to listen on
+        :return: merged session stats
+        :rtype: dict
+        """
+        model = self.compile_model()
+        report_sink = get_report_sink(self.report_dir, report_format=self.report_format,
+                                      compression=self.report_compression,
+                                      rotate_size=self.report_rotate_size * 1024 * 1024)
+        coordinator = Coordinator(model.num_mutations(), model_fingerprint(model), report_sink, self.report_dir,
+                                  parse_address(address), lease_size=self.lease_size,
+                                  lease_timeout=self.lease_timeout, token=self.cluster_token,
+                                  failure_exemplars=self.failure_exemplars)
+        return coordinator.serve()
+
+    def run_worker(self, address):
+        """
+        Runs the test ranges leased by the coordinator at the address until the session is over
+        :param address: host:port of the coordinator
+        :return: number of ranges run
+        :rtype: int
+        """
+        fingerprint = model_fingerprint(self.compile_model())
+        return Worker(self, parse_address(address), token=self.cluster_token).run(fingerprint)
+
+    def worker_event_log(self, worker_id):
+        """
+        Every worker writes its own event log, as the lines of concurrent writers could interleave
+        :param worker_id: index of the worker
+        :return: event log file of the worker or None if the event log is switched off
+        """
+        if not self.event_log:
+            return None
+        return '{}.worker_{}'.format(self.event_log, worker_id)
+
+    def worker_state_file(self, worker_id):
+        """
+        Every worker saves the checkpoints of its own test range
+        :param worker_id: index of the worker
+        :return: state file of the worker or None if the checkpoints are switched off
+        """
+        if not self.state_file:
+            return None
+        return '{}.worker_{}'.format(self.state_file, worker_id)
+
+    def worker_metrics_port(self, worker_id):
+        """
+        The workers serve their metrics on consecutive ports from the configured one
+        :param worker_id: index of the worker
+        :return: metrics port of the worker or None if the metrics are not served
+        """
+        if self.metrics_port is None:
+            return None
+        return self.metrics_port + worker_id
+
+    def worker_metrics_file(self, worker_id):
+        """
+        :param worker_id: index of the worker
+        :return: metrics file of the worker or None if the metrics file is switched off
+        """
+        if not self.metrics_file:
+            return None
+        return '{}.worker_{}'.format(self.metrics_file, worker_id)
+
+
 def str2bool(v):
     if isinstance(v, bool):
        return v
@@ -80,8 +428,9 @@ if __name__ == '__main__':
                                      formatter_class=lambda prog: argparse.HelpFormatter(prog, max_help_position=20))
     parser.add_argument('-s', '--src_file',
                         type=str,
-                        required=True,
-                        help='API definition file path. Currently only JSON format is supported',
+                        required=False,
+                        help='API definition file path, JSON or YAML (requires the PyYAML package). Required unless '
+                             '--replay or --minimize is used',
                         dest='src_file')
     parser.add_argument('-r', '--report_dir',
                         type=str,
@@ -127,23 +476,393 @@ if __name__ == '__main__':
                              '{"Auth2": "asd"}]\'',
                         dest='headers',
                         default=None)
+    parser.add_argument('--concurrency',
+                        type=int,
+                        required=False,
+                        help='Number of requests kept in flight, the default 1 sends the tests one by one',
+                        dest='concurrency',
+                        default=1)
+    parser.add_argument('--workers',
+                        type=int,
+                        required=False,
+                        help='Number of fuzzer processes, each one runs a disjoint range of the tests',
+                        dest='workers',
+                        default=1)
+    parser.add_argument('--curl-pool-size',
+                        type=int,
+                        required=False,
+                        help='Number of idle Curl handles (and their keep-alive connections) kept per host. '
+                             'Default is the concurrency',
+                        dest='curl_pool_size',
+                        default=None)
+    parser.add_argument('--event-log',
+                        type=str,
+                        required=False,
+                        help='Write a JSON line per request, response and test result to this file. '
+                             'Switched off by default',
+                        dest='event_log',
+                        default=None)
+    parser.add_argument('--report-format',
+                        type=str,
+                        required=False,
+                        help='files: a JSON file per failed test, ndjson: the reports are appended as JSON lines to '
+                             'a few rotated files',
+                        dest='report_format',
+                        default='files',
+                        choices=['files', 'ndjson'])
+    parser.add_argument('--report-compression',
+                        type=str,
+                        required=False,
+                        help='Compression of the ndjson reports, zstd requires the zstandard package',
+                        dest='report_compression',
+                        default=None,
+                        choices=['gzip', 'zstd'])
+    parser.add_argument('--report-rotate-size',
+                        type=int,
+                        required=False,
+                        help='Maximum size of an ndjson report file in MB (uncompressed). Default is 64',
+                        dest='report_rotate_size',
+                        default=64)
+    parser.add_argument('--max-rps',
+                        type=float,
+                        required=False,
+                        help='Maximum number of requests per second, shared by the workers. Default is unlimited',
+                        dest='max_rps',
+                        default=None)
+    parser.add_argument('--adaptive-concurrency',
+                        action='store_true',
+                        help='Adjust the number of requests in flight between 1 and --concurrency to the latency, '
+                             'timeout and overload (429, 502-504) rate of the target',
+                        dest='adaptive_concurrency',
+                        default=False)
+    parser.add_argument('--latency-target',
+                        type=float,
+                        required=False,
+                        help='Maximum mean response time in seconds at --adaptive-concurrency. Default is the '
+                             'double of the lowest mean response time seen',
+                        dest='latency_target',
+                        default=None)
+    parser.add_argument('--no-web',
+                        action='store_false',
+                        help='Run headless, without the kitty web interface',
+                        dest='web',
+                        default=True)
+    parser.add_argument('--web-port',
+                        type=int,
+                        required=False,
+                        help='Listening port of the kitty web interface. Default is 26000',
+                        dest='web_port',
+                        default=26000)
+    parser.add_argument('--export-corpus',
+                        type=str,
+                        required=False,
+                        help='Save every rendered test to this corpus file instead of fuzzing',
+                        dest='export_corpus',
+                        default=None)
+    parser.add_argument('--corpus',
+                        type=str,
+                        required=False,
+                        help='Replay the tests of a corpus file saved by --export-corpus instead of generating them',
+                        dest='corpus',
+                        default=None)
+    parser.add_argument('--state-file',
+                        type=str,
+                        required=False,
+                        help='Save the progress of the session to this file periodically and at exit, so it can be '
+                             'continued with --resume',
+                        dest='state_file',
+                        default=None)
+    parser.add_argument('--checkpoint-interval',
+                        type=float,
+                        required=False,
+                        help='Seconds between two saves of the --state-file. Default is 30',
+                        dest='checkpoint_interval',
+                        default=30)
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Continue the session saved to the --state-file after its last completed test',
+                        dest='resume',
+                        default=False)
+    parser.add_argument('--failure-exemplars',
+                        type=int,
+                        required=False,
+                        help='Group the failures by the signature of their responses and save only the first N '
+                             'reports of a group, the rest are counted in failure_buckets.json. Default is to save '
+                             'every report',
+                        dest='failure_exemplars',
+                        default=None)
+    parser.add_argument('--template-cache',
+                        type=str,
+                        required=False,
+                        help='Directory to cache the compiled templates in. A later run with the same API definition '
+                             'and options loads them instead of parsing the definition',
+                        dest='template_cache',
+                        default=None)
+    parser.add_argument('--include-path',
+                        type=str,
+                        action='append',
+                        required=False,
+                        help='Fuzz only the paths matching this glob pattern, e.g. \'/pets/*\'. Can be repeated',
+                        dest='include_paths',
+                        default=None)
+    parser.add_argument('--exclude-path',
+                        type=str,
+                        action='append',
+                        required=False,
+                        help='Leave out the paths matching this glob pattern. Can be repeated',
+                        dest='exclude_paths',
+                        default=None)
+    parser.add_argument('--method',
+                        type=str,
+                        action='append',
+                        required=False,
+                        help='Fuzz only the operations of this HTTP method. Can be repeated',
+                        dest='methods',
+                        default=None)
+    parser.add_argument('--include-tag',
+                        type=str,
+                        action='append',
+                        required=False,
+                        help='Fuzz only the operations with this tag. Can be repeated',
+                        dest='include_tags',
+                        default=None)
+    parser.add_argument('--exclude-tag',
+                        type=str,
+                        action='append',
+                        required=False,
+                        help='Leave out the operations with this tag. Can be repeated',
+                        dest='exclude_tags',
+                        default=None)
+    parser.add_argument('--max-tests-per-endpoint',
+                        type=int,
+                        required=False,
+                        help='Run at most N evenly spread tests of every endpoint. Default is every test',
+                        dest='max_tests_per_endpoint',
+                        default=None)
+    parser.add_argument('--max-time-per-endpoint',
+                        type=float,
+                        required=False,
+                        help='Skip the rest of the tests of an endpoint this many seconds after its first test. '
+                             'Default is unlimited',
+                        dest='max_time_per_endpoint',
+                        default=None)
+    parser.add_argument('--scheduler',
+                        type=str,
+                        required=False,
+                        help='sequential: the tests are run in the order of the model, novelty: more tests are given '
+                             'to the endpoints and fields whose responses are new (status code, body, latency). '
+                             'Default is sequential',
+                        dest='scheduler',
+                        default='sequential',
+                        choices=['sequential', 'novelty'])
+    parser.add_argument('--time-budget',
+                        type=float,
+                        required=False,
+                        help='Run a random sample of the tests, spread over every endpoint and parameter, which fits '
+                             'this many seconds. Default is every test',
+                        dest='time_budget',
+                        default=None)
+    parser.add_argument('--seed',
+                        type=int,
+                        required=False,
+                        help='Seed of the sample of --time-budget, the same seed runs the tests in the same order. '
+                             'Default is 0',
+                        dest='seed',
+                        default=0)
+    parser.add_argument('--metrics-port',
+                        type=int,
+                        required=False,
+                        help='Serve the metrics of the requests in the OpenMetrics format on '
+                             'http://127.0.0.1:PORT/metrics, the workers use the next ports. Switched off by default',
+                        dest='metrics_port',
+                        default=None)
+    parser.add_argument('--metrics-file',
+                        type=str,
+                        required=False,
+                        help='Rewrite the metrics in the OpenMetrics format to this file every 5 seconds. '
+                             'Switched off by default',
+                        dest='metrics_file',
+                        default=None)
+    parser.add_argument('--max-response-bytes',
+                        type=int,
+                        required=False,
+                        help='Keep at most this many bytes of a response body, the reports of the longer ones are '
+                             'marked as truncated. 0 keeps every byte. Default is 1048576 (1 MiB)',
+                        dest='max_response_bytes',
+                        default=DEFAULT_MAX_RESPONSE_BYTES)
+    parser.add_argument('--replay',
+                        type=str,
+                        required=False,
+                        help='Send the requests of the failure reports of this report directory again, to the '
+                             '--url if it is set, and print which of them are fixed, still failing or changed. '
+                             'Switched off by default',
+                        dest='replay',
+                        default=None)
+    parser.add_argument('--minimize',
+                        type=str,
+                        required=False,
+                        help='Shrink the request of this failure report, or of a report of this report directory, '
+                             'to a minimal request which fails the same way and save it to the report directory. '
+                             'Switched off by default',
+                        dest='minimize',
+                        default=None)
+    parser.add_argument('--minimize-test',
+                        type=int,
+                        required=False,
+                        help='Test number of the report to minimize if --minimize is a report directory. Default is '
+                             'the first report',
+                        dest='minimize_test',
+                        default=None)
+    parser.add_argument('--session-store',
+                        type=str,
+                        required=False,
+                        help='Storage of the kitty session info and failure reports: sqlite commits every write, '
+                             'batched commits the writes together, memory keeps them in memory only, failures '
+                             'writes the session info only with the failures. Default is sqlite',
+                        dest='session_store',
+                        default=SQLITE,
+                        choices=SESSION_STORES)
+    parser.add_argument('--session-commit-interval',
+                        type=float,
+                        required=False,
+                        help='Minimum time between two commits of the batched session store (seconds). Default is 1',
+                        dest='session_commit_interval',
+                        default=1.0)
+    parser.add_argument('--coordinator',
+                        type=str,
+                        required=False,
+                        help='Listen on this host:port and lease the tests to the --worker processes connecting to '
+                             'it, their reports are saved to the report directory. Switched off by default',
+                        dest='coordinator',
+                        default=None)
+    parser.add_argument('--worker',
+                        type=str,
+                        required=False,
+                        help='Run the tests leased by the --coordinator at this host:port. The worker needs the '
+                             'same API definition and test options. Switched off by default',
+                        dest='worker',
+                        default=None)
+    parser.add_argument('--lease-size',
+                        type=int,
+                        required=False,
+                        help='Number of tests the coordinator leases to a worker at once. Default is {}'.format(
+                            DEFAULT_LEASE_SIZE),
+                        dest='lease_size',
+                        default=DEFAULT_LEASE_SIZE)
+    parser.add_argument('--lease-timeout',
+                        type=float,
+                        required=False,
+                        help='The coordinator leases the tests of a worker again if it doesn\'t hear from it for this '
+                             'long (seconds). Default is {:g}'.format(DEFAULT_LEASE_TIMEOUT),
+                        dest='lease_timeout',
+                        default=DEFAULT_LEASE_TIMEOUT)
+    parser.add_argument('--cluster-token',
+                        type=str,
+                        required=False,
+                        help='Shared secret of the coordinator and its workers. Switched off by default',
+                        dest='cluster_token',
+                        default=None)
     args = parser.parse_args()
-    api_definition_json = dict()
-    try:
-        with open(args.src_file, mode='r', encoding='utf-8') as f:
-            api_definition_json = json.loads(f.read())
-    except Exception as e:
-        print('Failed to parse input file: {}'.format(e))
-        exit()
-    prog = Fuzzer(api_resources=api_definition_json,
+    if not args.src_file and not args.replay and not args.minimize:
+        parser.error('the following arguments are required: -s/--src_file')
+    if args.coordinator and args.worker:
+        parser.error('--coordinator and --worker can\'t be combined')
+    if (args.coordinator or args.worker) and (args.workers > 1 or args.state_file):
+        parser.error('--coordinator and --worker can\'t be combined with --workers or --state-file, the leases of '
+                     'the coordinator replace both')
+    if args.lease_size < 1:
+        parser.error('--lease-size must be at least 1')
+    if args.resume and not args.state_file:
+        parser.error('--resume requires --state-file')
+    if args.scheduler == 'novelty' and args.state_file:
+        parser.error('--scheduler novelty runs the tests out of order, it can\'t be checkpointed with --state-file')
+    if args.scheduler == 'novelty' and (args.max_tests_per_endpoint or args.max_time_per_endpoint):
+        parser.error('--scheduler novelty sets the budget of the endpoints itself')
+    if args.time_budget and (args.scheduler == 'novelty' or args.state_file or args.max_tests_per_endpoint or
+                             args.max_time_per_endpoint):
+        parser.error('--time-budget can\'t be combined with --scheduler novelty, --state-file or the budgets of the '
+                     'endpoints')
+    template_cache = TemplateCache(args.template_cache) if args.template_cache else None
+    endpoint_filter = None
+    if args.include_paths or args.exclude_paths or args.methods or args.include_tags or args.exclude_tags:
+        endpoint_filter = EndpointFilter(include_paths=args.include_paths, exclude_paths=args.exclude_paths,
+                                         methods=args.methods, include_tags=args.include_tags,
+                                         exclude_tags=args.exclude_tags)
+    prog = Fuzzer(api_resources=None,
                   report_dir=args.report_dir,
                   test_level=args.level,
                   alternate_url=args.alternate_url,
                   test_result_dst=args.test_result_dst,
                   log_level=args.log_level,
                   basic_output=args.basic_output,
-                  auth_headers=args.headers
+                  auth_headers=args.headers,
+                  concurrency=args.concurrency,
+                  curl_pool_size=args.curl_pool_size,
+                  workers=args.workers,
+                  event_log=args.event_log,
+                  report_format=args.report_format,
+                  report_compression=args.report_compression,
+                  report_rotate_size=args.report_rotate_size,
+                  max_rps=args.max_rps,
+                  adaptive_concurrency=args.adaptive_concurrency,
+                  latency_target=args.latency_target,
+                  web=args.web,
+                  web_port=args.web_port,
+                  state_file=args.state_file,
+                  checkpoint_interval=args.checkpoint_interval,
+                  resume=args.resume,
+                  failure_exemplars=args.failure_exemplars,
+                  template_cache=template_cache,
+                  endpoint_filter=endpoint_filter,
+                  max_tests_per_endpoint=args.max_tests_per_endpoint,
+                  max_time_per_endpoint=args.max_time_per_endpoint,
+                  scheduler=args.scheduler,
+                  time_budget=args.time_budget,
+                  seed=args.seed,
+                  metrics_port=args.metrics_port,
+                  metrics_file=args.metrics_file,
+                  max_response_bytes=args.max_response_bytes,
+                  session_store=args.session_store,
+                  session_commit_interval=args.session_commit_interval,
+                  lease_size=args.lease_size,
+                  lease_timeout=args.lease_timeout,
+                  cluster_token=args.cluster_token
                   )
-    prog.prepare()
+    if args.replay:
+        summary = prog.replay_reports(args.replay)
+        print(json.dumps(summary))
+        exit(1 if summary['still_failing'] or summary['changed'] else 0)
+    if args.minimize:
+        try:
+            reproducer = prog.minimize_report(args.minimize, args.minimize_test)
+        except (OSError, ValueError) as e:
+            print('Failed to load the report: {}'.format(e))
+            exit(1)
+        if reproducer is None:
+            print('The failure doesn\'t reproduce')
+            exit(1)
+        print(json.dumps(reproducer))
+        exit()
+    try:
+        if template_cache is not None:
+            prog.spec_hash = spec_digest(args.src_file)
+        # the corpus replay needs the definition for the base url only, it doesn't compile the model
+        if template_cache is None or args.corpus or \
+                template_cache.load_base_url(prog.get_template_cache_key()) is None:
+            prog.api_resources = load_spec(args.src_file)
+    except Exception as e:
+        print('Failed to parse input file: {}'.format(e))
+        exit()
     signal.signal(signal.SIGINT, signal_handler)
-    prog.run()
+    if args.corpus:
+        prog.replay_corpus(args.corpus)
+    else:
+        prog.prepare()
+        if args.export_corpus:
+            prog.export_corpus(args.export_corpus)
+        elif args.coordinator:
+            prog.run_coordinator(args.coordinator)
+        elif args.worker:
+            prog.run_worker(args.worker)
+        else:
+            prog.run()
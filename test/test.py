@@ -1,4 +1,5 @@
 #!/usr/bin/env python3 -X utf8
+import copy
 import json
 import os
 import tempfile
@@ -6,6 +7,7 @@ import tempfile
 import pytest
 import requests
 
+from apifuzzer.report_sink import iter_reports
 from fuzzer import Fuzzer
 
 
@@ -42,23 +44,33 @@ class TestClass(object):
         assert _resp.status_code == 200, 'Response headers: {}, response body: {}'.format(_resp.headers, _resp.content)
         return json.loads(_resp.content.decode("utf-8"))
 
-    def fuzz(self, api_resources):
+    def fuzz(self, api_resources, report_dir=None, **kwargs):
         """
         Call APIFuzzer with the given api definition
         :type api_resources: dict
+        :param report_dir: directory of the reports, the class level one if not set
+        :param kwargs: further Fuzzer arguments
         """
         with pytest.raises(SystemExit):
             prog = Fuzzer(api_resources=api_resources,
-                          report_dir=self.report_dir,
+                          report_dir=report_dir or self.report_dir,
                           test_level=1,
                           alternate_url=self.test_app_url,
                           test_result_dst=None,
                           log_level='Debug',
-                          auth_headers={}
+                          auth_headers={},
+                          **kwargs
                           )
             prog.prepare()
             prog.run()
 
+    @staticmethod
+    def get_reports_by_test_number(report_dir):
+        reports = dict()
+        for report in iter_reports(report_dir):
+            reports[report['test_number']] = report
+        return reports
+
     def get_last_report_file(self):
         self.report_files = os.listdir(self.report_dir)
         with open("{}/{}".format(self.report_dir, self.report_files[0]), mode='r', encoding='utf-8') as f:
@@ -86,3 +98,50 @@ class TestClass(object):
             assert field in last_report.keys(), assert_msg
         if last_report.get('parsed_status_code') is not None:
             assert last_report['parsed_status_code'] == 500, assert_msg
+
+    def test_concurrent_transmit_reports(self):
+        api_definition = copy.deepcopy(self.swagger)
+        api_definition['paths'] = {'/exception/{integer_id}': api_definition['paths']['/exception/{integer_id}']}
+        sequential_dir = tempfile.mkdtemp()
+        concurrent_dir = tempfile.mkdtemp()
+        self.fuzz(api_definition, report_dir=sequential_dir)
+        self.fuzz(api_definition, report_dir=concurrent_dir, concurrency=8)
+        sequential_reports = self.get_reports_by_test_number(sequential_dir)
+        concurrent_reports = self.get_reports_by_test_number(concurrent_dir)
+        assert sorted(sequential_reports.keys()) == sorted(concurrent_reports.keys())
+        for test_number, report in sequential_reports.items():
+            for field in ['request_url', 'parsed_status_code', 'response']:
+                assert report.get(field) == concurrent_reports[test_number].get(field), test_number
+
+    def test_ndjson_reports(self):
+        api_definition = copy.deepcopy(self.swagger)
+        api_definition['paths'] = {'/exception/{integer_id}': api_definition['paths']['/exception/{integer_id}']}
+        files_dir = tempfile.mkdtemp()
+        ndjson_dir = tempfile.mkdtemp()
+        self.fuzz(api_definition, report_dir=files_dir)
+        self.fuzz(api_definition, report_dir=ndjson_dir, report_format='ndjson', report_compression='gzip')
+        assert all(f.endswith('.ndjson.gz') for f in os.listdir(ndjson_dir))
+        files_reports = self.get_reports_by_test_number(files_dir)
+        ndjson_reports = self.get_reports_by_test_number(ndjson_dir)
+        assert sorted(files_reports.keys()) == sorted(ndjson_reports.keys())
+        for test_number, report in files_reports.items():
+            for field in ['request_url', 'parsed_status_code', 'response']:
+                assert report.get(field) == ndjson_reports[test_number].get(field), test_number
+
+    def test_json_body(self):
+        api_definition = copy.deepcopy(self.swagger)
+        api_definition['paths'] = {'/pets': {'post': {'parameters': [{'name': 'pet', 'in': 'body', 'schema': {
+            'type': 'object',
+            'properties': {
+                'name': {'type': 'string'},
+                'age': {'type': 'integer'},
+                'owner': {'type': 'object', 'properties': {'id': {'type': 'integer'}}},
+                'tags': {'type': 'array', 'items': {'type': 'string'}},
+            }}}]}}}
+        self.fuzz(api_definition, report_dir=tempfile.mkdtemp())
+        last_call = self.query_last_call()
+        assert last_call['req_headers']['Content-Type'] == 'application/json'
+        # the fuzzed values are spliced into a valid document
+        assert sorted(last_call['req_json'].keys()) == ['age', 'name', 'owner', 'tags']
+        assert list(last_call['req_json']['owner'].keys()) == ['id']
+        assert len(last_call['req_json']['tags']) == 1
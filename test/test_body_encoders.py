@@ -0,0 +1,73 @@
+import json
+import logging
+from urllib.parse import urlencode
+
+from apifuzzer.body_encoders import BodyEncoders, FormEncoder, JsonEncoder, escape_key, parse_path, schema_leaves
+from apifuzzer.spec_loader import RefResolver
+from apifuzzer.swagger_template_generator import SwaggerTemplateGenerator
+from test.test_spec_loader import DEFINITION
+
+PET = {
+    'definitions': {
+        'Owner': {'type': 'object', 'properties': {'id': {'type': 'integer'}, 'a.b|c': {'type': 'string'}}},
+        'Pet': {
+            'allOf': [{'properties': {'name': {'type': 'string', 'example': 'rex'}}}],
+            'properties': {
+                'owner': {'$ref': '#/definitions/Owner'},
+                'tags': {'type': 'array', 'items': {'type': 'string'}},
+                'parent': {'$ref': '#/definitions/Pet'},
+            },
+        },
+    },
+}
+
+
+class CountingJsonEncoder(JsonEncoder):
+    encoded = 0
+
+    def encode_value(self, value):
+        self.encoded += 1
+        return super(CountingJsonEncoder, self).encode_value(value)
+
+
+class TestBodyEncoders(object):
+
+    def test_schema_leaves(self):
+        resolver = RefResolver(PET)
+        leaves = schema_leaves({'$ref': '#/definitions/Pet'}, resolver)
+        assert [path for path, _ in leaves] == ['$.name', '$.owner.id', '$.owner.a~1b~3c', '$.tags[0]', '$.parent']
+        assert leaves[0][1]['example'] == 'rex'
+        assert parse_path('$.owner.a~1b~3c') == ['owner', 'a.b|c']
+        assert parse_path('$.tags[0]') == ['tags', 0]
+        assert escape_key('x/y') == 'x~4y'
+
+    def test_json_values_are_spliced(self):
+        keys = ['$.name', '$.owner.id', '$.tags[0]', '$.owner.a~1b~3c']
+        encoder = CountingJsonEncoder(keys)
+        data = {'$.name': 'rex', '$.owner.id': '12', '$.tags[0]': 'a"b', '$.owner.a~1b~3c': 'true'}
+        assert json.loads(encoder.encode(data)) == {'name': 'rex', 'owner': {'id': 12, 'a.b|c': True},
+                                                    'tags': ['a"b']}
+        data['$.owner.id'] = '\x00\xff'
+        assert json.loads(encoder.encode(data))['owner']['id'] == '\x00\xff'
+        # only the changed value is encoded again
+        assert encoder.encoded == 5
+        assert json.loads(JsonEncoder(['$']).encode({'$': '667.5'})) == 667.5
+
+    def test_form_body_is_urlencoded(self):
+        data = {'a b': 'x&y', 'c': '\x00é'}
+        assert FormEncoder(data.keys()).encode(data) == urlencode(data).encode()
+
+    def test_multipart_body(self):
+        content_type, body = BodyEncoders().encode('upload|post', 'multipart/form-data', {'file': 'abc'})
+        boundary = content_type.split('boundary=')[1]
+        assert body == '--{0}\r\nContent-Disposition: form-data; name="file"\r\n\r\nabc\r\n--{0}--\r\n'.format(
+            boundary).encode()
+
+    def test_body_fields_of_the_templates(self):
+        generator = SwaggerTemplateGenerator(DEFINITION, logger=logging.getLogger(__name__))
+        generator.process_api_resources()
+        post = generator.templates[1]
+        assert post.content_type == 'application/json'
+        # the recursive schema is cut at the first repetition
+        assert [field.get_name() for field in post.data] == ['nodes+{id}|post|body|$.children[0]']
+        assert generator.templates[0].content_type is None
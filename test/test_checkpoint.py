@@ -0,0 +1,94 @@
+import os
+import tempfile
+
+import pytest
+from kitty.data.data_manager import SessionInfo
+from kitty.model import GraphModel, Static
+
+from apifuzzer.checkpoint import Checkpoint, completed_count, model_fingerprint, remaining_test_list
+from apifuzzer.custom_fuzzers import RandomBitsField, SkippableContainer, SkippableTemplate
+from apifuzzer.report_sink import FileReportSink, NdjsonReportSink, iter_reports
+
+
+def create_model():
+    model = GraphModel()
+    for name in ['first', 'second']:
+        model.connect(SkippableTemplate(name=name, fields=[
+            Static(name='url', value='/{}'.format(name)),
+            SkippableContainer(name='params', fields=[RandomBitsField(value='a', name='a'),
+                                                      RandomBitsField(value='b', name='b')]),
+            SkippableContainer(name='headers', fields=[RandomBitsField(value='c', name='c')]),
+        ]))
+    return model
+
+
+def current_test(model):
+    return model.current_index(), model.get_sequence_str(), model.get_sequence()[-1].dst.render().tobytes()
+
+
+class TestCheckpoint(object):
+
+    def test_remaining_test_list(self):
+        assert remaining_test_list(None, 99) == '100-'
+        assert remaining_test_list('0-199', 99) == '100-199'
+        assert remaining_test_list('0-9,50,100-', 49) == '50-50,100-'
+        assert remaining_test_list('0-99', 99) == ''
+        assert completed_count('10-19,30-', 34) == 15
+
+    def test_skip_is_the_same_as_mutating(self):
+        model = create_model()
+        walked = list()
+        while model.mutate():
+            walked.append(current_test(model))
+        assert len(walked) == 480
+        for count in [0, 1, 79, 80, 239, 240, 400, 479]:
+            model = create_model()
+            assert model.skip(count) == count
+            assert model.mutate()
+            assert current_test(model) == walked[count]
+            if count + 1 < len(walked):
+                assert model.mutate()
+                assert current_test(model) == walked[count + 1]
+
+    def test_save_and_load(self):
+        state_file = os.path.join(tempfile.mkdtemp(), 'state.json')
+        checkpoint = Checkpoint(state_file, interval=0)
+        assert checkpoint.load() is None
+        assert checkpoint.due()
+        session_info = SessionInfo()
+        session_info.failure_count = 3
+        checkpoint.save(test_list_str='0-99', last_completed=41, session_info=session_info,
+                        report_sink_position={'time': 1.0}, fingerprint=model_fingerprint(create_model()))
+        state = checkpoint.load()
+        assert state['last_completed'] == 41
+        assert state['tested'] == 42
+        assert state['session_info']['failure_count'] == 3
+        assert state['model_fingerprint'] == model_fingerprint(create_model())
+        assert not state['finished']
+        assert os.listdir(os.path.dirname(state_file)) == ['state.json']
+
+    def test_file_sink_restore_removes_later_reports(self):
+        report_dir = tempfile.mkdtemp()
+        sink = FileReportSink(report_dir)
+        sink.write(1, {'test_number': 1})
+        position = sink.position()
+        sink.write(2, {'test_number': 2})
+        FileReportSink(report_dir).restore(position)
+        assert [r['test_number'] for r in iter_reports(report_dir)] == [1]
+
+    @pytest.mark.parametrize('compression', [None, 'gzip', 'zstd'])
+    def test_ndjson_sink_restore_truncates_after_position(self, compression):
+        if compression == 'zstd':
+            pytest.importorskip('zstandard')
+        report_dir = tempfile.mkdtemp()
+        sink = NdjsonReportSink(report_dir, compression=compression, rotate_size=200)
+        for test_number in range(5):
+            sink.write(test_number, {'test_number': test_number, 'response': 'x' * 100})
+            if test_number == 2:
+                position = sink.position()
+        sink.close()
+        resumed = NdjsonReportSink(report_dir, compression=compression)
+        resumed.restore(position)
+        resumed.write(3, {'test_number': 3})
+        resumed.close()
+        assert sorted(r['test_number'] for r in iter_reports(report_dir)) == [0, 1, 2, 3]
@@ -0,0 +1,48 @@
+import json
+import logging
+import os
+import tempfile
+
+import pytest
+
+from apifuzzer.corpus import Corpus, decode_record, encode_record, export_corpus
+from apifuzzer.server_fuzzer import OpenApiServerFuzzer
+from fuzzer import Fuzzer
+
+SPEC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_swagger_definition.json')
+
+
+class TestCorpus(object):
+
+    @staticmethod
+    def compile_model():
+        with open(SPEC, mode='r', encoding='utf-8') as f:
+            prog = Fuzzer(api_resources=json.loads(f.read()), report_dir=tempfile.mkdtemp(), test_level=1,
+                          log_level='warning', alternate_url='http://127.0.0.1:5000/')
+        prog.prepare()
+        return prog.compile_model()
+
+    def test_record_round_trip(self):
+        payload = {'url': b'/exception/\xff\x00', 'method': b'GET', 'params': {'q': '\x00é'}}
+        assert decode_record(encode_record('path', payload)) == ('path', payload)
+
+    def test_exported_tests_are_the_rendered_mutations(self):
+        logger = logging.getLogger()
+        path = os.path.join(tempfile.mkdtemp(), 'corpus.bin')
+        assert export_corpus(self.compile_model(), path, logger) == self.compile_model().num_mutations()
+        corpus = Corpus(path)
+        model = self.compile_model()
+        for test_number, fuzz_path, payload in corpus:
+            assert model.mutate()
+            assert test_number == model.current_index()
+            assert fuzz_path == model.get_sequence_str()
+            assert payload == OpenApiServerFuzzer.render_payload(model.get_sequence()[-1].dst, logger)
+        assert len(corpus) == model.num_mutations()
+        corpus.close()
+
+    def test_other_files_are_rejected(self):
+        path = os.path.join(tempfile.mkdtemp(), 'corpus.bin')
+        with open(path, 'wb') as f:
+            f.write(b'\x00' * 64)
+        with pytest.raises(ValueError):
+            Corpus(path)
@@ -0,0 +1,29 @@
+from apifuzzer.curl_pool import CurlHandlePool
+
+
+class TestCurlHandlePool(object):
+
+    def test_handle_is_reused_for_the_same_host(self):
+        pool = CurlHandlePool(max_size=2)
+        _curl = pool.acquire('http://127.0.0.1:5000/exception/1')
+        pool.release(_curl)
+        assert pool.acquire('http://127.0.0.1:5000/other_methods?a=b') is _curl
+        assert pool.acquire('https://127.0.0.1:5000/exception/1') is not _curl
+        pool.close()
+
+    def test_broken_handle_is_evicted(self):
+        pool = CurlHandlePool(max_size=2)
+        _curl = pool.acquire('http://127.0.0.1:5000/')
+        pool.release(_curl, broken=True)
+        assert pool.acquire('http://127.0.0.1:5000/') is not _curl
+        pool.close()
+
+    def test_idle_handles_are_limited(self):
+        pool = CurlHandlePool(max_size=1)
+        first = pool.acquire('http://127.0.0.1:5000/')
+        second = pool.acquire('http://127.0.0.1:5000/')
+        pool.release(first)
+        pool.release(second)
+        assert pool.acquire('http://127.0.0.1:5000/') is first
+        assert pool.acquire('http://127.0.0.1:5000/') is not second
+        pool.close()
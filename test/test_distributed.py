@@ -0,0 +1,91 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+
+from apifuzzer.distributed import Coordinator, LeaseTable, receive_message, send_message
+from apifuzzer.failure_buckets import FAILURE_BUCKETS_FILE, FailureBuckets
+from apifuzzer.report_sink import get_report_sink, iter_reports
+from test.test_failure_buckets import failed_report
+
+
+def connect(coordinator, fingerprint='model', token='secret'):
+    connection = socket.create_connection(coordinator.address)
+    stream = connection.makefile('rwb')
+    send_message(stream, {'type': 'hello', 'worker': 'w', 'fingerprint': fingerprint, 'token': token})
+    return connection, stream, receive_message(stream)
+
+
+class TestDistributed(object):
+
+    def test_expired_and_released_leases_are_issued_again(self):
+        leases = LeaseTable(['0-9', '10-19', '20-24'], lease_timeout=10)
+        first = leases.acquire('a', now=0)
+        second = leases.acquire('b', now=0)
+        assert first[1] == '0-9' and second[1] == '10-19'
+        assert leases.renew(first[0], now=5)
+        # b doesn't send a heartbeat
+        assert leases.expire(now=12) == [second[0]]
+        assert not leases.renew(second[0], now=12)
+        third = leases.acquire('a', now=12)
+        assert third[1] == '10-19' and leases.reissued == 1
+        assert leases.acquire('c', now=12)[1] == '20-24'
+        assert leases.acquire('c', now=12) is None
+        leases.release_worker('c')
+        assert leases.progress() == {'done': 0, 'leased': 2, 'pending': 1}
+        assert leases.complete(first[0]) and leases.complete(third[0])
+        # the late worker of the expired lease is not counted twice
+        assert not leases.complete(second[0])
+        assert not leases.finished()
+        assert leases.complete(leases.acquire('a', now=13)[0])
+        assert leases.finished()
+
+    def test_coordinator_merges_the_reports_of_the_workers(self):
+        report_dir = tempfile.mkdtemp()
+        coordinator = Coordinator(10, 'model', get_report_sink(report_dir), report_dir, ('127.0.0.1', 0),
+                                  lease_size=5, lease_timeout=30, token='secret', failure_exemplars=1)
+        result = dict()
+        thread = threading.Thread(target=lambda: result.update(coordinator.serve(poll_interval=0.05)))
+        thread.start()
+        rejected = connect(coordinator, fingerprint='other')
+        assert rejected[2]['type'] == 'error'
+        rejected[0].close()
+        assert connect(coordinator, token='guess')[2]['type'] == 'error'
+        assert connect(coordinator, token='gu\u00e9ss')[2]['type'] == 'error'
+        connection, stream, welcome = connect(coordinator)
+        assert welcome == {'type': 'welcome', 'lease_timeout': 30}
+        for _ in range(2):
+            send_message(stream, {'type': 'lease'})
+            lease = receive_message(stream)
+            start = int(lease['test_list'].split('-')[0])
+            # both workers save the report of the same bucket
+            worker_buckets = FailureBuckets(tempfile.mkdtemp(), exemplars=1)
+            report = failed_report(500, 'error')
+            report.add('test_number', start)
+            worker_buckets.add(start, report)
+            report = report.to_dict()
+            buckets = worker_buckets.summary()
+            # a report sent twice is saved once
+            for message in ({'type': 'heartbeat'}, {'type': 'report', 'report': report},
+                            {'type': 'report', 'report': report}):
+                message['lease_id'] = lease['lease_id']
+                send_message(stream, message)
+            send_message(stream, {'type': 'complete', 'lease_id': lease['lease_id'], 'buckets': buckets,
+                                  'stats': {'test_list_str': lease['test_list'], 'tested': 5, 'failure_count': 1,
+                                            'start_time': 100 + start}})
+            assert receive_message(stream) == {'type': 'ok'}
+        send_message(stream, {'type': 'lease'})
+        assert receive_message(stream) == {'type': 'done'}
+        connection.close()
+        thread.join(10)
+        assert not thread.is_alive()
+        # the report past the cap of the session is dropped
+        assert [report['test_number'] for report in iter_reports(report_dir)] == [0]
+        assert result['tested'] == 10 and result['failure_count'] == 2 and result['start_time'] == 100
+        assert result['test_list_str'] == '0-4,5-9' and result['reissued_leases'] == 0
+        with open(os.path.join(report_dir, 'session_stats.json')) as f:
+            assert json.loads(f.read()) == result
+        with open(os.path.join(report_dir, FAILURE_BUCKETS_FILE)) as f:
+            buckets = json.loads(f.read())
+        assert [(bucket['count'], bucket['exemplars']) for bucket in buckets] == [(2, [0])]
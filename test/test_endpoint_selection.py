@@ -0,0 +1,84 @@
+import logging
+
+from kitty.fuzzers.test_list import RangesList, StartEndList
+
+from apifuzzer.endpoint_selection import EndpointBudget, EndpointFilter, skip_test_list_to
+from apifuzzer.mutation_index import IndexedGraphModel
+from apifuzzer.spec_loader import Operation
+from apifuzzer.swagger_template_generator import SwaggerTemplateGenerator
+from test.test_spec_loader import DEFINITION
+
+
+def operation(path, method, tags=()):
+    return Operation(path=path, method=method, parameters=[], tags=tags, operation_id=None)
+
+
+def compile_model(endpoint_filter=None):
+    generator = SwaggerTemplateGenerator(DEFINITION, logger=logging.getLogger(__name__),
+                                         endpoint_filter=endpoint_filter)
+    generator.process_api_resources()
+    model = IndexedGraphModel()
+    for template in generator.templates:
+        model.connect(template.compile_template())
+    return model
+
+
+class TestEndpointSelection(object):
+
+    def test_filter(self):
+        endpoint_filter = EndpointFilter(include_paths=['/pets*'], exclude_paths=['/pets/admin*'],
+                                         methods=['GET', 'post'], exclude_tags=['internal'])
+        assert endpoint_filter.matches(operation('/pets/{id}', 'get'))
+        assert not endpoint_filter.matches(operation('/users', 'get'))
+        assert not endpoint_filter.matches(operation('/pets/admin/{id}', 'get'))
+        assert not endpoint_filter.matches(operation('/pets', 'delete'))
+        assert not endpoint_filter.matches(operation('/pets', 'post', tags=('internal', 'pets')))
+        assert EndpointFilter(include_tags=['pets']).matches(operation('/x', 'get', tags=('pets',)))
+        assert not EndpointFilter(include_tags=['pets']).matches(operation('/x', 'get'))
+
+    def test_filtered_templates(self):
+        model = compile_model(EndpointFilter(methods=['post']))
+        model.num_mutations()
+        assert [sequence[-1].dst.get_name() for sequence in model._sequences] == ['nodes+{id}|post']
+
+    def test_skip_test_list_to(self):
+        test_list = RangesList('0-9,20-29,40')
+        skip_test_list_to(test_list, 5)
+        assert test_list.current() == 5
+        skip_test_list_to(test_list, 10)
+        assert test_list.current() == 20
+        skip_test_list_to(test_list, 30)
+        assert test_list.current() == 40
+        skip_test_list_to(test_list, 41)
+        assert test_list.current() is None
+        test_list = StartEndList(0, 10)
+        skip_test_list_to(test_list, 4)
+        assert test_list.current() == 4
+        skip_test_list_to(test_list, 12)
+        assert test_list.current() is None
+
+    def test_budget_spreads_the_tests_of_an_endpoint(self):
+        model = compile_model()
+        num_mutations = model.num_mutations()
+        budget = EndpointBudget(model, max_tests=7)
+        index = 0
+        selected = list()
+        while index < num_mutations:
+            index = budget.next_test(index)
+            if index < num_mutations:
+                selected.append(index)
+                budget.started(index)
+                index += 1
+        get_size = model._sequences[0][-1].dst.num_mutations()
+        assert len([i for i in selected if i < get_size]) == 7
+        assert len([i for i in selected if i >= get_size]) == 7
+        assert budget.summary()['tested'] == {'nodes+{id}|get': 7, 'nodes+{id}|post': 7}
+
+    def test_time_budget_stops_the_endpoint(self):
+        model = compile_model()
+        budget = EndpointBudget(model, max_time=0)
+        assert budget.next_test(0) == 0
+        budget.started(0)
+        get_size = model._sequences[0][-1].dst.num_mutations()
+        assert budget.next_test(1) == get_size
+        assert budget.summary()['stopped'] == ['nodes+{id}|get']
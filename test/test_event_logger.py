@@ -0,0 +1,28 @@
+import json
+import os
+import tempfile
+
+from apifuzzer.event_logger import EventLogger, NullEventLogger, get_event_logger
+
+
+class TestEventLogger(object):
+
+    def test_events_are_written_as_json_lines(self):
+        path = os.path.join(tempfile.mkdtemp(), 'events.jsonl')
+        event_logger = get_event_logger(path)
+        assert isinstance(event_logger, EventLogger)
+        event_logger.emit('request', test_number=1, url='http://127.0.0.1:5000/')
+        event_logger.emit('response', test_number=1, status_code=500, body=b'\x00')
+        event_logger.close()
+        with open(path) as f:
+            events = [json.loads(line) for line in f]
+        assert [event['event'] for event in events] == ['request', 'response']
+        assert events[1]['status_code'] == 500
+        assert events[1]['body'] == "b'\\x00'"
+
+    def test_events_can_be_switched_off(self):
+        event_logger = get_event_logger(None)
+        assert isinstance(event_logger, NullEventLogger)
+        assert not event_logger.enabled
+        event_logger.emit('request', test_number=1)
+        event_logger.close()
@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+
+from apifuzzer.apifuzzer_report import Apifuzzer_Report as Report
+from apifuzzer.failure_buckets import FAILURE_BUCKETS_FILE, FailureBuckets, merge_bucket_summaries, normalize_body
+
+
+def failed_report(status_code, response, endpoint='/pets/{id}|get'):
+    report = Report('target')
+    report.add('endpoint', endpoint)
+    report.add('request_method', 'GET')
+    report.add('parsed_status_code', status_code)
+    report.add('response', response)
+    report.add('response_headers', {'content-type': 'text/html', 'date': 'Mon, 17 Oct 2026 10:00:00 GMT'})
+    report.failed('Return code is not in the expected list')
+    return report
+
+
+class TestFailureBuckets(object):
+
+    def test_normalize_body(self):
+        assert normalize_body("invalid literal for int() with base 10: '0\\x00\\x10'") == \
+            'invalid literal for int() with base 0: <str>'
+        assert normalize_body('{"error": "not found", "id": 12}') == '{"error": <str>, "id": 0}'
+        assert normalize_body('order 3f2b6c1e-6d2a-4f7e-9c1b-0a1b2c3d4e5f\x00\xff') == 'order 0'
+        assert normalize_body(None) == ''
+
+    def test_only_the_first_exemplars_are_saved(self):
+        report_dir = tempfile.mkdtemp()
+        buckets = FailureBuckets(report_dir, exemplars=2)
+        saved = [buckets.add(test_number, failed_report(500, "bad id: '{}'".format(test_number)))
+                 for test_number in range(5)]
+        saved.append(buckets.add(5, failed_report(502, 'Bad Gateway')))
+        assert saved == [True, True, False, False, False, True]
+        summary = buckets.summary()
+        assert [(bucket['count'], bucket['exemplars']) for bucket in summary] == [(5, [0, 1]), (1, [5])]
+        buckets.close()
+        with open(os.path.join(report_dir, FAILURE_BUCKETS_FILE), 'r') as f:
+            assert json.loads(f.read()) == summary
+
+    def test_buckets_are_continued_from_the_report_dir(self):
+        report_dir = tempfile.mkdtemp()
+        buckets = FailureBuckets(report_dir, exemplars=1)
+        report = failed_report(500, 'error 1')
+        assert buckets.add(1, report)
+        buckets.close()
+        continued = FailureBuckets(report_dir, exemplars=1)
+        assert not continued.add(2, failed_report(500, 'error 2'))
+        assert continued.summary()[0]['count'] == 2
+        assert continued.summary()[0]['id'] == report.get('failure_bucket')
+
+    def test_endpoints_are_bucketed_apart(self):
+        buckets = FailureBuckets(tempfile.mkdtemp(), exemplars=1)
+        assert buckets.add(1, failed_report(500, 'Internal Server Error'))
+        assert buckets.add(2, failed_report(500, 'Internal Server Error', endpoint='/users|get'))
+        assert not buckets.add(3, failed_report(500, 'Internal Server Error', endpoint='/users|get'))
+        assert sorted((bucket['endpoint'], bucket['count']) for bucket in buckets.summary()) == \
+            [('/pets/{id}|get', 1), ('/users|get', 2)]
+
+    def test_merge_bucket_summaries(self):
+        first = FailureBuckets(tempfile.mkdtemp())
+        second = FailureBuckets(tempfile.mkdtemp())
+        first.add(1, failed_report(500, 'error'))
+        second.add(7, failed_report(500, 'error'))
+        second.add(8, failed_report(503, 'unavailable'))
+        merged = merge_bucket_summaries([first.summary(), second.summary()])
+        assert [(bucket['count'], bucket['exemplars']) for bucket in merged] == [(2, [1, 7]), (1, [8])]
+        assert merge_bucket_summaries([first.summary(), second.summary()], exemplars=1)[0]['exemplars'] == [1]
+
+    def test_saved_reports_of_other_sessions_are_capped(self):
+        workers = [FailureBuckets(tempfile.mkdtemp(), exemplars=2) for _ in range(2)]
+        saved = list()
+        for worker, start in zip(workers, (0, 10)):
+            for test_number in range(start, start + 3):
+                report = failed_report(500, 'error')
+                if worker.add(test_number, report):
+                    saved.append((test_number, report.to_dict()))
+        assert len(saved) == 4
+        merged = FailureBuckets(tempfile.mkdtemp(), exemplars=2)
+        assert [merged.add_saved(test_number, report) for test_number, report in saved] == [True, True, False, False]
+        assert merged.add_saved(20, failed_report(500, 'error').to_dict())
+        merged.merge([worker.summary() for worker in workers])
+        summary = merged.summary()
+        assert len(summary) == 1
+        assert (summary[0]['count'], summary[0]['first_test'], summary[0]['exemplars']) == (6, 0, [0, 1])
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import urllib.request
+
+import pycurl
+
+from apifuzzer.metrics import FuzzerMetrics, Histogram, NullMetrics, get_metrics
+
+
+class FakeCurl(object):
+    timings = {pycurl.NAMELOOKUP_TIME: 0.001, pycurl.CONNECT_TIME: 0.003, pycurl.APPCONNECT_TIME: 0.0,
+               pycurl.STARTTRANSFER_TIME: 0.02, pycurl.TOTAL_TIME: 0.03}
+
+    def getinfo(self, info):
+        return self.timings[info]
+
+
+class TestMetrics(object):
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('latency_seconds', 'Latency', ('endpoint',), buckets=(0.1, 1.0))
+        for value in 0.05, 0.1, 0.5, 2.0:
+            histogram.observe(value, ('a"b',))
+        lines = histogram.render()
+        assert 'latency_seconds_bucket{endpoint="a\\"b",le="0.1"} 2' in lines
+        assert 'latency_seconds_bucket{endpoint="a\\"b",le="1.0"} 3' in lines
+        assert 'latency_seconds_bucket{endpoint="a\\"b",le="+Inf"} 4' in lines
+        assert 'latency_seconds_count{endpoint="a\\"b"} 4' in lines
+        assert histogram.count(('a"b',)) == 4
+
+    def test_request_metrics(self):
+        metrics = FuzzerMetrics()
+        metrics.request_completed('pets|get', FakeCurl(), 404)
+        metrics.request_retried('pets|get')
+        metrics.request_failed('pets|get')
+        text = metrics.render()
+        assert 'apifuzzer_requests_total{endpoint="pets|get"} 2' in text
+        assert 'apifuzzer_responses_total{endpoint="pets|get",code_class="4xx"} 1' in text
+        assert 'apifuzzer_request_retries_total{endpoint="pets|get"} 1' in text
+        assert 'apifuzzer_request_errors_total{endpoint="pets|get"} 1' in text
+        assert metrics.phases.count(('pets|get', 'ttfb')) == 1
+        # no tls on the connection
+        assert metrics.phases.count(('pets|get', 'tls')) == 0
+        assert text.endswith('# EOF\n')
+
+    def test_metrics_file_and_endpoint(self):
+        path = os.path.join(tempfile.mkdtemp(), 'metrics.txt')
+        metrics = get_metrics(port=0, path=path, interval=3600)
+        try:
+            metrics.test_completed('passed')
+            with open(path) as f:
+                assert 'apifuzzer_tests_total{status="passed"} 1' in f.read()
+            metrics.test_completed('failed')
+            url = 'http://127.0.0.1:{}/metrics'.format(metrics._server.server_port)
+            body = urllib.request.urlopen(url).read().decode()
+            assert 'apifuzzer_tests_total{status="failed"} 1' in body
+        finally:
+            metrics.close()
+        with open(path) as f:
+            assert 'apifuzzer_tests_total{status="failed"} 1' in f.read()
+        assert isinstance(get_metrics(), NullMetrics)
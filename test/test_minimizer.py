@@ -0,0 +1,64 @@
+import json
+import logging
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+
+from apifuzzer.fuzzer_target import FuzzerTarget
+from apifuzzer.metrics import ThreadingHTTPServer
+from apifuzzer.minimizer import ReportMinimizer, ddmin
+
+
+class CrashHandler(BaseHTTPRequestHandler):
+    """
+    Fails if the query or the X-Token header has an 'X' and the body has the field 'id'
+    """
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        query = self.path.partition('?')[2]
+        crash = ('X' in query or 'X' in self.headers.get('X-Token', '')) and b'id' in body
+        self.send_response(500 if crash else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestMinimizer(object):
+
+    def test_ddmin_finds_the_failure_inducing_characters(self):
+        def still_fails(candidates):
+            return ['3' in candidate and '7' in candidate for candidate in candidates]
+
+        assert ddmin('0123456789', still_fails) == '37'
+        assert ddmin(list(range(10)), lambda candidates: [5 in c for c in candidates]) == [5]
+        assert ddmin('abc', lambda candidates: [True for _ in candidates]) == ''
+
+    def test_report_is_minimized(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), CrashHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        report = {'status': 'failed', 'test_number': 7, 'request_method': 'POST', 'parsed_status_code': 500,
+                  'request_url': 'http://old/pets?limit=10&q=a%20bXcd&sort=asc',
+                  'request_headers': json.dumps({'Accept': '*/*', 'X-Token': 'garbage',
+                                                 'Content-Type': 'application/json'}),
+                  'request_body': {'$.id': '123456', '$.name': 'rex'}, 'response': 'old'}
+        target = FuzzerTarget(name='target', base_url='', report_dir=tempfile.mkdtemp(), auth_headers={},
+                              logger=logging.getLogger('test'), curl_pool_size=4)
+        try:
+            minimizer = ReportMinimizer(target, report, url='http://127.0.0.1:{}'.format(server.server_port),
+                                        concurrency=4)
+            reproducer = minimizer.run()
+        finally:
+            target.teardown()
+            server.shutdown()
+            server.server_close()
+        # the path doesn't matter either
+        assert reproducer['request_url'] == 'http://127.0.0.1:{}/?q=X'.format(server.server_port)
+        assert reproducer['request_body'] == {'$.id': ''}
+        headers = json.loads(reproducer['request_headers'])
+        assert 'X-Token' not in headers and headers['Accept'] == '*/*'
+        assert reproducer['parsed_status_code'] == 500 and reproducer['test_number'] == 7
+        assert reproducer['minimization']['requests'] == minimizer.requests
+        assert reproducer['minimization']['minimized_size'] < reproducer['minimization']['original_size']
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+from kitty.model import GraphModel
+
+from apifuzzer.mutation_index import MutationIndex
+from apifuzzer.server_fuzzer import OpenApiServerFuzzer
+from test.test_endpoint_selection import compile_model
+
+
+def render(model):
+    return model.get_sequence()[-1].dst.render().tobytes()
+
+
+def walk(model):
+    walked = list()
+    while model.mutate():
+        walked.append(render(model))
+    return walked
+
+
+class TestMutationIndex(object):
+
+    def test_any_index_renders_the_walked_test(self):
+        walked = walk(compile_model())
+        model = compile_model()
+        index = MutationIndex(model)
+        assert index.num_mutations == len(walked)
+        order = list(range(index.num_mutations))
+        random.Random(0).shuffle(order)
+        for mutation_index in order:
+            template = index.apply(mutation_index)
+            assert model.current_index() == mutation_index
+            assert template.render().tobytes() == walked[mutation_index]
+        # the model steps on from a seek as if it was walked there
+        index.seek(5)
+        for mutation_index in range(5, index.num_mutations):
+            assert model.mutate()
+            assert render(model) == walked[mutation_index]
+        assert not model.mutate()
+
+    def test_address_of_an_index(self):
+        model = compile_model()
+        index = MutationIndex(model)
+        address = index.locate(7)
+        assert address.template.get_name() == 'nodes+{id}|get'
+        assert [container.get_name() for container, _, _ in address.path] == ['nodes+{id}|get', 'params']
+        assert address.field.num_mutations() > address.mutation == 7
+        assert address.seed == (address.field._seed << 32) | 7
+        last = index.locate(index.num_mutations - 1)
+        assert last.template_position == 1 and last.mutation == last.field.num_mutations() - 1
+        with pytest.raises(ValueError):
+            index.locate(index.num_mutations)
+
+    def test_a_deep_test_list_is_reached_with_a_seek(self, monkeypatch):
+        walked = walk(compile_model())
+        fuzzer = OpenApiServerFuzzer()
+        fuzzer.set_model(compile_model())
+        fuzzer.set_test_list('{}-{},{}-'.format(len(walked) - 6, len(walked) - 4, len(walked) - 2))
+
+        def step(model, count):
+            raise AssertionError('GraphModel.skip stepped through {} tests'.format(count))
+
+        monkeypatch.setattr(GraphModel, 'skip', step)
+        # the positioning of kitty's start
+        fuzzer._test_list.set_last(fuzzer.model.last_index())
+        fuzzer.model.skip(fuzzer._test_list.current())
+        rendered = list()
+        while fuzzer._next_mutation():
+            rendered.append(render(fuzzer.model))
+        assert rendered == walked[-6:-3] + walked[-2:]
@@ -0,0 +1,61 @@
+from apifuzzer.apifuzzer_report import Apifuzzer_Report
+from apifuzzer.mutation_scheduler import MutationSpace, NoveltyScheduler
+from test.test_endpoint_selection import compile_model
+
+
+def report(status_code, response):
+    test_report = Apifuzzer_Report('test')
+    test_report.add('parsed_status_code', status_code)
+    test_report.add('response', response)
+    return test_report
+
+
+class TestMutationScheduler(object):
+
+    def test_arms_cover_the_model(self):
+        model = compile_model()
+        space = MutationSpace(model)
+        assert space.template_names == ['nodes+{id}|get', 'nodes+{id}|post']
+        assert space.arm_starts[0] == 0
+        assert space.arm_ends[-1] == space.num_mutations
+        assert space.arm_starts[1:] == space.arm_ends[:-1]
+        assert space.arm(space.num_mutations) is None
+        assert [space.arm_templates[arm] for arm in space.arms_of_template(1)] == [1] * len(space.arms_of_template(1))
+
+    def test_every_test_is_scheduled_once(self):
+        space = MutationSpace(compile_model())
+        scheduler = NoveltyScheduler(space)
+        scheduled = list()
+        index = scheduler.next_test()
+        while index is not None:
+            scheduled.append(index)
+            scheduler.observe(index, report(200, 'ok'))
+            index = scheduler.next_test()
+        assert sorted(scheduled) == list(range(space.num_mutations))
+        assert scheduler.exhausted()
+        scheduler = NoveltyScheduler(space, test_list_str='2-5,{}'.format(space.num_mutations - 1))
+        scheduled = list()
+        index = scheduler.next_test()
+        while index is not None:
+            scheduled.append(index)
+            index = scheduler.next_test()
+        assert sorted(scheduled) == [2, 3, 4, 5, space.num_mutations - 1]
+
+    def test_novel_responses_get_more_tests(self):
+        space = MutationSpace(compile_model())
+        post = space.template_names.index('nodes+{id}|post')
+        scheduler = NoveltyScheduler(space, batch=1)
+        counts = [0, 0]
+        for _ in range(200):
+            index = scheduler.next_test()
+            template = space.arm_templates[space.arm(index)]
+            counts[template] += 1
+            if template == post:
+                # every response of the POST endpoint is new
+                scheduler.observe(index, report(index, 'error'))
+            else:
+                scheduler.observe(index, report(200, 'ok'))
+        assert counts[post] > 3 * counts[1 - post]
+        summary = scheduler.summary()
+        assert summary['scheduled'] == 200
+        assert summary['top_templates'][0] == 'nodes+{id}|post'
@@ -0,0 +1,54 @@
+from apifuzzer.rate_control import AimdConcurrencyController, RateController, TokenBucket
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(object):
+
+    def test_rate_is_limited_after_the_burst(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, burst=2, clock=clock)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert abs(bucket.reserve() - 0.1) < 1e-9
+        clock.now = 0.1
+        assert bucket.reserve() == 0
+        clock.now = 10
+        assert [bucket.reserve() for _ in range(3)][:2] == [0, 0]
+
+    def test_unlimited_controller_never_waits(self):
+        controller = RateController(max_concurrency=4)
+        assert controller.reserve() == 0
+        assert controller.concurrency_limit(4) == 4
+
+
+class TestAimdConcurrencyController(object):
+
+    def test_healthy_windows_increase_concurrency(self):
+        aimd = AimdConcurrencyController(max_concurrency=3, min_window=5)
+        for _ in range(50):
+            aimd.record(0.01, 0.001, False)
+        assert aimd.concurrency == 3
+
+    def test_overload_halves_concurrency(self):
+        aimd = AimdConcurrencyController(max_concurrency=64, min_window=5)
+        aimd.concurrency = 40
+        for _ in range(40):
+            aimd.record(0.01, 0.001, True)
+        assert aimd.concurrency == 20
+
+    def test_latency_above_the_baseline_halves_concurrency(self):
+        aimd = AimdConcurrencyController(max_concurrency=64, min_window=10)
+        for _ in range(10):
+            aimd.record(0.01, 0.001, False)
+        assert aimd.concurrency == 2
+        for _ in range(10):
+            aimd.record(0.05, 0.001, False)
+        assert aimd.concurrency == 1
@@ -0,0 +1,72 @@
+import json
+import logging
+import tempfile
+import threading
+from base64 import b64encode
+from http.server import BaseHTTPRequestHandler
+
+from apifuzzer.fuzzer_target import FuzzerTarget
+from apifuzzer.metrics import ThreadingHTTPServer
+from apifuzzer.replay import ReportReplayer, decode_field, rebase_url
+from apifuzzer.report_sink import get_report_sink
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """
+    Responds with the status code of the path, e.g. /500, and records the bodies
+    """
+    bodies = list()
+
+    def do_POST(self):
+        self.bodies.append(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        self.send_response(int(self.path.strip('/').split('/')[0]))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+def saved_report(test_number, url, status_code, headers=None, data=None):
+    return {'status': 'failed', 'test_number': test_number, 'request_url': url, 'request_method': 'POST',
+            'request_headers': b64encode(json.dumps(headers or {}).encode()).decode(), 'request_body': data or {},
+            'parsed_status_code': status_code, 'reason': 'failed'}
+
+
+class TestReplay(object):
+
+    def test_fields_and_urls_are_decoded(self):
+        headers = {'Content-Type': 'application/json'}
+        assert decode_field(b64encode(json.dumps(headers).encode()).decode()) == headers
+        assert decode_field(json.dumps(headers)) == headers
+        assert decode_field('not encoded') == 'not encoded'
+        assert rebase_url('http://old:5000/pets/1?a=b', 'https://new:8443/') == 'https://new:8443/pets/1?a=b'
+        assert rebase_url('http://old:5000/pets', None) == 'http://old:5000/pets'
+
+    def test_reports_are_replayed_and_compared(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StatusHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        report_dir = tempfile.mkdtemp()
+        sink = get_report_sink(report_dir, report_format='ndjson')
+        json_headers = {'Content-Type': 'application/json'}
+        sink.write(1, saved_report(1, 'http://old/200/pets', 500, json_headers, {'$.name': 'rex', '$.age': '3'}))
+        sink.write(2, saved_report(2, 'http://old/500/pets', 500))
+        sink.write(3, saved_report(3, 'http://old/503/pets', 500))
+        sink.write(4, {'status': 'failed', 'test_number': 4, 'reason': 'failed'})
+        sink.close()
+        target = FuzzerTarget(name='target', base_url='', report_dir=report_dir, auth_headers={},
+                              logger=logging.getLogger('test'), curl_pool_size=4)
+        try:
+            summary = ReportReplayer(target, report_dir, url='http://127.0.0.1:{}'.format(server.server_port),
+                                     concurrency=4).run()
+        finally:
+            target.teardown()
+            server.shutdown()
+            server.server_close()
+        assert summary['fixed'] == 1 and summary['still_failing'] == 1 and summary['changed'] == 1
+        assert summary['skipped'] == 1 and summary['replayed'] == 3
+        assert summary['failing_tests'] == [2, 3]
+        assert summary['transitions'] == {'500 -> 200': 1, '500 -> 500': 1, '500 -> 503': 1}
+        assert json.loads(b''.join(StatusHandler.bodies)) == {'name': 'rex', 'age': 3}
@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+import pytest
+
+from apifuzzer.report_sink import FileReportSink, NdjsonReportSink, get_report_sink, iter_reports
+
+
+class TestReportSink(object):
+
+    @staticmethod
+    def write_reports(sink, count):
+        for test_number in range(count):
+            sink.write(test_number, {'test_number': test_number, 'response': 'x' * 100})
+        sink.close()
+
+    def test_file_sink_writes_a_file_per_report(self):
+        report_dir = tempfile.mkdtemp()
+        self.write_reports(get_report_sink(report_dir), 3)
+        assert isinstance(get_report_sink(report_dir), FileReportSink)
+        assert len(os.listdir(report_dir)) == 3
+        assert sorted(r['test_number'] for r in iter_reports(report_dir)) == [0, 1, 2]
+
+    @pytest.mark.parametrize('compression', [None, 'gzip', 'zstd'])
+    def test_ndjson_sink_appends_reports(self, compression):
+        if compression == 'zstd':
+            pytest.importorskip('zstandard')
+        report_dir = tempfile.mkdtemp()
+        self.write_reports(NdjsonReportSink(report_dir, compression=compression, batch_size=7), 50)
+        assert len(os.listdir(report_dir)) == 1
+        assert sorted(r['test_number'] for r in iter_reports(report_dir)) == list(range(50))
+
+    def test_ndjson_sink_rotates_files(self):
+        report_dir = tempfile.mkdtemp()
+        self.write_reports(NdjsonReportSink(report_dir, batch_size=10, rotate_size=2000), 50)
+        assert len(os.listdir(report_dir)) == 5
+        assert sorted(r['test_number'] for r in iter_reports(report_dir)) == list(range(50))
+
+    def test_ndjson_sink_drops_only_the_report_which_is_not_serializable(self):
+        report_dir = tempfile.mkdtemp()
+        sink = NdjsonReportSink(report_dir, batch_size=10)
+        for test_number in range(5):
+            sink.write(test_number, {'test_number': test_number, 'response': b'x' if test_number == 2 else 'x'})
+        sink.close()
+        assert sorted(r['test_number'] for r in iter_reports(report_dir)) == [0, 1, 3, 4]
+
+    def test_unknown_compression_is_rejected(self):
+        with pytest.raises(ValueError):
+            NdjsonReportSink(tempfile.mkdtemp(), compression='lz4')
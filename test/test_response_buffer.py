@@ -0,0 +1,57 @@
+import logging
+import tempfile
+
+from apifuzzer.fuzzer_target import FuzzerTarget, Return
+from apifuzzer.response_buffer import ResponseBuffer, parse_headers
+
+
+def response(status_code, body, max_size=None):
+    buffer = ResponseBuffer(max_size)
+    buffer.write(body)
+    _return = Return()
+    _return.status_code = status_code
+    _return.headers = {}
+    _return.content = buffer.getvalue()
+    _return.content_length = buffer.received
+    _return.truncated = buffer.truncated
+    _return.total_time = 0.01
+    _return.request = Return()
+    _return.request.headers = {}
+    _return.request.body = {}
+    return _return
+
+
+class TestResponseBuffer(object):
+
+    def test_buffer_is_capped_and_reused(self):
+        buffer = ResponseBuffer(8)
+        buffer.write(b'0123')
+        buffer.write(b'456789')
+        assert buffer.getvalue() == b'01234567'
+        assert buffer.received == 10
+        assert buffer.truncated
+        buffer.reset()
+        buffer.write(b'ab')
+        assert buffer.getvalue() == b'ab'
+        assert not buffer.truncated
+        unlimited = ResponseBuffer()
+        unlimited.write(b'x' * 100)
+        assert len(unlimited.getvalue()) == 100
+
+    def test_headers_of_the_last_response(self):
+        raw = b'HTTP/1.1 100 Continue\r\n\r\nHTTP/1.1 500 ERROR\r\nContent-Type: text/plain\r\nX-Id: a:b\r\n\r\n'
+        assert parse_headers(raw) == {'content-type': 'text/plain', 'x-id': 'a:b'}
+
+    def test_body_of_passed_tests_is_dropped(self):
+        target = FuzzerTarget(name='target', base_url='http://localhost', report_dir=tempfile.mkdtemp(),
+                              auth_headers={}, logger=logging.getLogger(__name__))
+        target.pre_test(1)
+        target.process_response(response(200, b'\xff not decoded'))
+        assert target.report.get('response') is None
+        assert target.report.get('parsed_status_code') == 200
+        target.pre_test(2)
+        # the last character is cut in half
+        target.process_response(response(500, 'error é'.encode(), max_size=7))
+        assert target.report.get('response') == 'error '
+        assert target.report.get('response_truncated')
+        assert target.report.get('response_length') == 8
@@ -0,0 +1,32 @@
+import random
+
+import pycurl
+
+from apifuzzer.sanitizer import sanitize_headers, sanitize_query_params, sanitize_url
+
+
+class TestSanitizer(object):
+
+    def test_url_parts_are_chopped_from_the_left(self):
+        assert sanitize_url('http://127.0.0.1:5000/exception/abécd') == 'http://127.0.0.1:5000/exception/cd'
+        assert sanitize_url('http://127.0.0.1:5000/a\x00/é/x') == 'http://127.0.0.1:5000///x'
+
+    def test_query_param_values_are_chopped_from_the_right(self):
+        url = 'http://127.0.0.1:5000/query'
+        assert sanitize_query_params(url, {'t|a': 'abécd', 'b': '\x00x'}) == '?a=ab&b='
+        assert sanitize_query_params(url, {'é': 'x', 'b': 'y'}) == '?é=&b='
+
+    def test_header_values_are_chopped_from_the_left_then_from_the_right(self):
+        assert sanitize_headers({'A': 'ab\x00cd'}) == [b'A: cd']
+        assert sanitize_headers({'A': 'ab\x00cd\x00'}) == [b'A: ab']
+        assert sanitize_headers({'A': 'é'}) == ['A: é'.encode()]
+
+    def test_sanitized_values_are_accepted_by_pycurl(self):
+        rnd = random.Random(1235)
+        _curl = pycurl.Curl()
+        for _ in range(200):
+            value = bytes(rnd.getrandbits(8) for _ in range(rnd.randint(0, 12))).decode(errors='ignore')
+            url = sanitize_url('http://127.0.0.1:5000/{}/x'.format(value))
+            _curl.setopt(pycurl.URL, url + sanitize_query_params(url, {'q': value}))
+            _curl.setopt(pycurl.HTTPHEADER, sanitize_headers({'X-Fuzz': value}))
+        _curl.close()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+import pytest
+from kitty.data.data_manager import DataManager, SessionInfo
+from kitty.data.report import Report
+
+from apifuzzer.session_store import BatchedDataManager, MemoryDataManager, get_data_manager
+
+
+def failed_report(test_number):
+    report = Report('target')
+    report.failed('Return code 500 is not in the expected list')
+    report.add('test_number', test_number)
+    return report
+
+
+class TestSessionStore(object):
+
+    def test_batched_store_commits_every_write_at_the_stop(self):
+        dbname = os.path.join(tempfile.mkdtemp(), 'session.sqlite')
+        dataman = get_data_manager('batched', dbname, commit_interval=3600)
+        assert isinstance(dataman, BatchedDataManager)
+        dataman.start()
+        info = SessionInfo()
+        for test_number in range(10):
+            info.current_index = test_number
+            dataman.set_session_info(info)
+            dataman.store_report(failed_report(test_number), test_number)
+        # the reads wait for the queued writes
+        assert dataman.get_report_test_ids() == list(range(10))
+        assert dataman.get_session_info().current_index == 9
+        dataman.stop()
+        reader = DataManager(dbname)
+        reader.start()
+        try:
+            assert reader.get_report_test_ids() == list(range(10))
+            assert reader.get_report_by_id(3).get('test_number') == 3
+            assert reader.get_session_info().current_index == 9
+        finally:
+            reader.stop()
+
+    def test_memory_store_keeps_the_latest_reports(self):
+        dataman = get_data_manager('memory', ':memory:')
+        assert isinstance(dataman, MemoryDataManager)
+        dataman.max_reports = 3
+        assert dataman.get_session_info() is None
+        info = SessionInfo()
+        dataman.set_session_info(info)
+        info.current_index = 5
+        assert dataman.get_session_info().current_index != 5
+        for test_number in range(5):
+            dataman.store_report(failed_report(test_number), test_number)
+        assert [test_id for test_id, _, _ in dataman.get_report_list()] == list(range(5))
+        assert dataman.get_report_by_id(4).get('test_number') == 4
+        with pytest.raises(KeyError):
+            dataman.get_report_by_id(0)
+        dataman.set('test_info', {'a': 1})
+        assert dataman.get('test_info') == {'a': 1}
+
+    def test_unknown_store_is_rejected(self):
+        with pytest.raises(ValueError):
+            get_data_manager('redis', ':memory:')
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+
+from apifuzzer.failure_buckets import FAILURE_BUCKETS_FILE, FailureBuckets
+from apifuzzer.report_sink import get_report_sink, iter_reports
+from apifuzzer.sharding import merge_shard_results, split_test_range
+from test.test_failure_buckets import failed_report
+
+
+class TestSharding(object):
+
+    def test_split_test_range_covers_every_test_once(self):
+        shards = split_test_range(10, 3)
+        assert shards == ['0-3', '4-6', '7-9']
+        assert split_test_range(2, 4) == ['0-0', '1-1']
+
+    def test_merge_shard_results(self):
+        report_dir = tempfile.mkdtemp()
+        shard_dirs = list()
+        stats_files = list()
+        for shard_id, test_list_str in enumerate(['0-4', '5-9']):
+            shard_dir = os.path.join(report_dir, 'worker_{}'.format(shard_id))
+            os.makedirs(shard_dir)
+            with open(os.path.join(shard_dir, '{}_1.json'.format(shard_id)), 'w') as f:
+                f.write('{}')
+            stats_file = os.path.join(report_dir, 'worker_{}_stats.json'.format(shard_id))
+            with open(stats_file, 'w') as f:
+                f.write(json.dumps({'test_list_str': test_list_str, 'tested': 5, 'failure_count': shard_id,
+                                    'start_time': 10 - shard_id}))
+            shard_dirs.append(shard_dir)
+            stats_files.append(stats_file)
+        stats_files.append(os.path.join(report_dir, 'missing_stats.json'))
+        stats = merge_shard_results(shard_dirs, stats_files, report_dir)
+        assert sorted(os.listdir(report_dir)) == ['0_1.json', '1_1.json']
+        assert stats['tested'] == 10
+        assert stats['failure_count'] == 1
+        assert stats['start_time'] == 9
+        assert stats['test_list_str'] == '0-4,5-9'
+        assert len(stats['failed_shards']) == 1
+
+    def test_failure_buckets_of_the_shards_are_capped(self):
+        report_dir = tempfile.mkdtemp()
+        shard_dirs = list()
+        for shard_id in range(2):
+            shard_dir = os.path.join(report_dir, 'worker_{}'.format(shard_id))
+            os.makedirs(shard_dir)
+            buckets = FailureBuckets(shard_dir, exemplars=2)
+            report_sink = get_report_sink(shard_dir)
+            for test_number in range(shard_id * 5, shard_id * 5 + 3):
+                report = failed_report(500, 'error')
+                report.add('test_number', test_number)
+                if buckets.add(test_number, report):
+                    report_sink.write(test_number, report.to_dict())
+            buckets.close()
+            shard_dirs.append(shard_dir)
+        merge_shard_results(shard_dirs, [], report_dir, report_sink=get_report_sink(report_dir), failure_exemplars=2)
+        assert sorted(report['test_number'] for report in iter_reports(report_dir)) == [0, 1]
+        with open(os.path.join(report_dir, FAILURE_BUCKETS_FILE)) as f:
+            buckets = json.loads(f.read())
+        assert [(bucket['count'], bucket['exemplars']) for bucket in buckets] == [(6, [0, 1])]
+        assert not any(os.path.isdir(shard_dir) for shard_dir in shard_dirs)
@@ -0,0 +1,87 @@
+import json
+import logging
+import os
+import tempfile
+
+import pytest
+
+from apifuzzer.spec_loader import ApiSpec, RefResolver, load_spec
+from apifuzzer.swagger_template_generator import SwaggerTemplateGenerator
+
+DEFINITION = {
+    'swagger': '2.0',
+    'host': 'localhost',
+    'basePath': '/',
+    'schemes': ['http'],
+    'parameters': {
+        'limit': {'name': 'limit', 'in': 'query', 'type': 'integer'},
+        'trace': {'name': 'X-Trace', 'in': 'header', 'type': 'string'},
+        'alias': {'$ref': '#/parameters/limit'},
+    },
+    'definitions': {
+        'Node': {'type': 'object', 'properties': {'children': {'type': 'array',
+                                                               'items': {'$ref': '#/definitions/Node'}}}},
+        'a/b': {'type': 'string'},
+    },
+    'paths': {
+        '/nodes/{id}': {
+            'parameters': [{'$ref': '#/parameters/trace'}, {'name': 'id', 'in': 'path', 'type': 'string'}],
+            'get': {'tags': ['nodes'], 'operationId': 'getNode',
+                    'parameters': [{'name': 'id', 'in': 'path', 'type': 'integer'}, {'$ref': '#/parameters/alias'}]},
+            'post': {'parameters': [{'name': 'body', 'in': 'body', 'schema': {'$ref': '#/definitions/Node'}}]},
+        },
+    },
+}
+
+
+class TestSpecLoader(object):
+
+    def test_resolve(self):
+        resolver = RefResolver(DEFINITION)
+        limit = resolver.resolve({'$ref': '#/parameters/alias'})
+        assert limit is DEFINITION['parameters']['limit']
+        assert resolver.resolve({'$ref': '#/parameters/limit'}) is limit
+        assert resolver.resolve({'$ref': '#/definitions/a~1b'}) == {'type': 'string'}
+        node = resolver.resolve({'$ref': '#/definitions/Node'})
+        assert resolver.resolve(node['properties']['children']['items']) is node
+        assert resolver.resolve('plain') == 'plain'
+
+    @pytest.mark.parametrize('ref', ['#/definitions/Missing', 'other.json#/definitions/Node', '#/loop/a'])
+    def test_invalid_refs(self, ref):
+        resolver = RefResolver({'loop': {'a': {'$ref': '#/loop/b'}, 'b': {'$ref': '#/loop/a'}}})
+        with pytest.raises(ValueError):
+            resolver.resolve({'$ref': ref})
+
+    def test_operations(self):
+        spec = ApiSpec(DEFINITION)
+        assert [(o.path, o.method) for o in spec.operations()] == [('/nodes/{id}', 'get'), ('/nodes/{id}', 'post')]
+        get = spec.operation('/nodes/{id}', 'GET')
+        assert get.tags == ('nodes',) and get.operation_id == 'getNode'
+        assert [(p['name'], p.get('type')) for p in get.parameters] == \
+            [('id', 'integer'), ('limit', 'integer'), ('X-Trace', 'string')]
+        post = spec.operation('/nodes/{id}', 'post')
+        assert spec.parameter_schema(post.parameters[0])['type'] == 'object'
+        assert spec.operation('/nodes/{id}', 'delete') is None
+
+    def test_template_generator_uses_the_shared_parameters(self):
+        generator = SwaggerTemplateGenerator(DEFINITION, logger=logging.getLogger(__name__))
+        generator.process_api_resources()
+        get = generator.templates[0]
+        assert [f.get_name() for f in get.params] == ['nodes+{id}|get|limit']
+        assert [f.get_name() for f in get.headers] == ['nodes+{id}|get|X-Trace']
+        assert len(generator.templates[1].data) == 1
+
+    def test_load_json_and_yaml(self):
+        yaml = pytest.importorskip('yaml')
+        directory = tempfile.mkdtemp()
+        for name, content in [('api.json', json.dumps(DEFINITION)), ('api.yaml', yaml.safe_dump(DEFINITION)),
+                              ('api', yaml.safe_dump(DEFINITION)), ('api.txt', json.dumps(DEFINITION))]:
+            path = os.path.join(directory, name)
+            with open(path, 'w') as f:
+                f.write(content)
+            assert load_spec(path) == DEFINITION
+        path = os.path.join(directory, 'other.json')
+        with open(path, 'w') as f:
+            f.write('[]')
+        with pytest.raises(ValueError):
+            load_spec(path)
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from apifuzzer.checkpoint import model_fingerprint
+from apifuzzer.template_cache import TemplateCache
+from fuzzer import Fuzzer
+from test.test_spec_loader import DEFINITION
+
+
+def create_fuzzer(api_resources, cache_dir):
+    return Fuzzer(api_resources=api_resources, report_dir=tempfile.mkdtemp(), test_level=1, log_level='critical',
+                  web=False, template_cache=TemplateCache(cache_dir), spec_hash='spec')
+
+
+def rendered_tests(model, count):
+    tests = list()
+    while len(tests) < count and model.mutate():
+        tests.append(model.get_sequence()[-1].dst.render().tobytes())
+    return tests
+
+
+class TestTemplateCache(object):
+
+    def test_warm_start_loads_the_same_model(self):
+        cache_dir = tempfile.mkdtemp()
+        cold = create_fuzzer(DEFINITION, cache_dir)
+        cold.prepare()
+        cold_model = cold.compile_model()
+        assert len(os.listdir(cache_dir)) == 1
+        # the definition isn't needed on a warm start
+        warm = create_fuzzer(None, cache_dir)
+        warm.prepare()
+        assert warm.templates is None
+        assert warm.base_url == cold.base_url
+        warm_model = warm.compile_model()
+        assert model_fingerprint(warm_model) == model_fingerprint(cold_model)
+        assert warm_model.num_mutations() == cold_model.num_mutations()
+        assert rendered_tests(warm_model, 100) == rendered_tests(cold_model, 100)
+
+    def test_the_key_depends_on_the_options(self):
+        cache = TemplateCache(tempfile.mkdtemp())
+        assert cache.key('spec', test_level=1) == cache.key('spec', test_level=1)
+        assert cache.key('spec', test_level=1) != cache.key('spec', test_level=2)
+        assert cache.key('spec', test_level=1) != cache.key('other', test_level=1)
+
+    def test_model_is_loaded_with_another_hash_seed(self):
+        cache_dir = tempfile.mkdtemp()
+        fuzzer = create_fuzzer(DEFINITION, cache_dir)
+        fuzzer.prepare()
+        num_mutations = fuzzer.compile_model().num_mutations()
+        script = 'from test.test_template_cache import create_fuzzer\n' \
+                 'fuzzer = create_fuzzer(None, {!r})\n' \
+                 'fuzzer.prepare()\n' \
+                 'print(fuzzer.compile_model().num_mutations())'.format(cache_dir)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=root,
+                                         env=dict(os.environ, PYTHONHASHSEED='1234'))
+        assert int(output) == num_mutations
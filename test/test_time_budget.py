@@ -0,0 +1,53 @@
+from apifuzzer.mutation_scheduler import MutationSpace
+from apifuzzer.time_budget import TimeBudgetSampler
+from test.test_endpoint_selection import compile_model
+from test.test_rate_control import FakeClock
+
+
+def sample(sampler, clock=None, duration=0):
+    tests = list()
+    index = sampler.next_test()
+    while index is not None:
+        tests.append(index)
+        if clock is not None:
+            clock.now += duration
+        sampler.observe(index, None)
+        index = sampler.next_test()
+    return tests
+
+
+class TestTimeBudget(object):
+
+    def test_sample_is_seeded(self):
+        space = MutationSpace(compile_model())
+        tests = sample(TimeBudgetSampler(space, 60, seed=1))
+        assert sorted(tests) == list(range(space.num_mutations))
+        assert sample(TimeBudgetSampler(space, 60, seed=1)) == tests
+        assert sample(TimeBudgetSampler(space, 60, seed=2)) != tests
+
+    def test_every_field_is_tested_first(self):
+        space = MutationSpace(compile_model())
+        tests = sample(TimeBudgetSampler(space, 60))
+        arms = len(space.arm_starts)
+        assert sorted(space.arm(index) for index in tests[:arms]) == list(range(arms))
+        # the templates take turns
+        assert len(set(space.arm_templates[space.arm(index)] for index in tests[:2])) == 2
+
+    def test_test_list(self):
+        space = MutationSpace(compile_model())
+        last = space.num_mutations - 1
+        tests = sample(TimeBudgetSampler(space, 60, test_list_str='3-6,{}'.format(last)))
+        assert sorted(tests) == [3, 4, 5, 6, last]
+
+    def test_budget_stops_the_sample(self):
+        space = MutationSpace(compile_model())
+        clock = FakeClock()
+        sampler = TimeBudgetSampler(space, 2.5, clock=clock)
+        # the 11th test would end after 2.75 seconds
+        tests = sample(sampler, clock=clock, duration=0.25)
+        assert len(tests) == 10
+        summary = sampler.summary()
+        assert summary['scheduled'] == len(tests)
+        assert summary['tests'] == space.num_mutations
+        assert summary['coverage'] < 100
+        assert summary['templates'] == '2/2'
@@ -0,0 +1,17 @@
+from kitty.interfaces import WebInterface
+
+from apifuzzer.user_interface import NullInterface, get_user_interface
+
+
+class TestUserInterface(object):
+
+    def test_web_interface_listens_on_the_given_port(self):
+        interface = get_user_interface(web=True, web_port=26123)
+        assert isinstance(interface, WebInterface)
+        assert '26123' in interface.get_description()
+
+    def test_headless_interface_counts_failures(self):
+        interface = get_user_interface(web=False)
+        assert isinstance(interface, NullInterface)
+        interface.failure_detected()
+        assert interface.failures == 1